@@ -0,0 +1,6 @@
+"""
+Benchmarks for Event Sentinel: seeded log generators (generators.py) and
+a per-stage throughput / memory runner (run.py).
+
+    python -m benchmarks.run --help
+"""
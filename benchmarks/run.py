@@ -0,0 +1,395 @@
+"""
+Benchmark runner: throughput and peak memory per pipeline stage.
+
+    python -m benchmarks.run --events 200000 --output bench.json
+    python -m benchmarks.run --baseline bench.json      # exit 1 on regressions
+
+Synthetic inputs are generated once (see generators.py), then every
+stage runs in its own fresh Python process so its peak RSS isn't hidden
+by earlier stages. Stages:
+- parse:<source> / parse:<source>:compact   streaming parser only
+- detect:<source>                           Detector.run over parsed events
+- detect:<source>:pack                      the same plus a RULE_PACK_SIZE-rule pack
+- dedup:<source>                            Deduplicator (default key) then Detector.run
+                                            on what is left ("kept" events)
+- stream:<source> / stream:<source>:batch   parse -> detect -> running summary of one
+                                            file, an event or a column batch at a time
+                                            (--batch; sources with a batch parser)
+- report:summary                            Reporter.add_events (running summary)
+- report:json / report:csv                  Reporter exports
+- report:jsonl / report:csv-stream          streaming sinks (sinks.py)
+- worst:<rule>                              a rule check on adversarial values
+
+Worst-case stages check the same number of bytes once as short values
+and once as values WORST_CASE_FACTOR times longer. "growth" is how much
+slower the long values were; about 1 means the check is linear in the
+value length, anything near WORST_CASE_FACTOR or above is backtracking.
+
+Reporter stages use the events of all sources together. Each result has
+events/sec for the timed part, the RSS when timing started (setup_rss_mb:
+interpreter + prepared input) and the process peak (peak_rss_mb).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .generators import GENERATORS, WORST_CASES, worst_case_value, write_rule_pack
+
+
+SOURCES = tuple(GENERATORS)
+
+# Sources with a column batch parser (stream:<source>:batch)
+BATCH_SOURCES = ("sysmon", "web")
+
+# Throughput of stages faster than this is too noisy to compare
+MIN_COMPARE_SECONDS = 0.05
+
+# Worst-case stages: long values of this many characters, short ones
+# WORST_CASE_FACTOR times shorter, same total bytes for both
+WORST_CASE_BYTES = 16384
+WORST_CASE_FACTOR = 16
+WORST_CASE_VALUES = 64
+
+# Rules in the generated pack of the detect:<source>:pack stages
+RULE_PACK_SIZE = 500
+
+# growth above this fails a --baseline run no matter what the baseline had
+MAX_GROWTH = 3.0
+
+STAGES = (
+    [f"parse:{name}" for name in SOURCES]
+    + [f"parse:{name}:compact" for name in SOURCES]
+    + [f"detect:{name}" for name in SOURCES]
+    + [f"detect:{name}:pack" for name in SOURCES]
+    + [f"dedup:{name}" for name in SOURCES]
+    + [f"stream:{name}" for name in SOURCES]
+    + [f"stream:{name}:batch" for name in BATCH_SOURCES]
+    + ["report:summary", "report:json", "report:csv", "report:jsonl", "report:csv-stream"]
+    + [f"worst:{rule}" for rule in WORST_CASES]
+)
+
+
+# ------------------------------------------------------------
+# Memory helpers
+# ------------------------------------------------------------
+def current_rss_mb():
+    """Resident set size right now (Linux /proc), or None."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+# ------------------------------------------------------------
+# Stage bodies (run inside the child process)
+# ------------------------------------------------------------
+def _parse(name, path, compact=False):
+    from src.parsers import STREAMING_PARSERS
+    return STREAMING_PARSERS[name](path, compact=compact)
+
+
+def _all_events(data_dir):
+    from src.detector import Detector
+
+    detector = Detector(cache_size=65536)
+    events = []
+    for name in SOURCES:
+        events.extend(detector.run(list(_parse(name, input_path(data_dir, name)))))
+    return events
+
+
+def run_stage(stage, data_dir):
+    """Runs one stage; returns (events, seconds, setup_rss_mb)."""
+    kind, _, rest = stage.partition(":")
+
+    if kind == "parse":
+        name, _, variant = rest.partition(":")
+        path = input_path(data_dir, name)
+        setup = current_rss_mb()
+
+        start = time.perf_counter()
+        count = sum(1 for _ in _parse(name, path, compact=variant == "compact"))
+        return count, time.perf_counter() - start, setup
+
+    if kind == "detect":
+        from src.detector import Detector
+        from src.rulepacks import RulePacks
+
+        name, _, variant = rest.partition(":")
+        events = list(_parse(name, input_path(data_dir, name)))
+        packs = RulePacks([Path(data_dir) / "rules.json"]) if variant == "pack" else None
+        detector = Detector(cache_size=65536, rule_packs=packs)
+        setup = current_rss_mb()
+
+        start = time.perf_counter()
+        detector.run(events)
+        return len(events), time.perf_counter() - start, setup
+
+    if kind == "dedup":
+        from src.dedup import Deduplicator
+        from src.detector import Detector
+
+        events = list(_parse(rest, input_path(data_dir, rest)))
+        detector = Detector(cache_size=65536)
+        setup = current_rss_mb()
+
+        start = time.perf_counter()
+        kept = detector.run(list(Deduplicator().stream(events)))
+        return len(events), time.perf_counter() - start, setup, {"kept": len(kept)}
+
+    if kind == "stream":
+        from src.pipeline import PipelineOptions, process_with
+
+        name, _, variant = rest.partition(":")
+        options = PipelineOptions(keep_events=False, rule_cache=65536, batch=65536 if variant == "batch" else 0)
+        detector = options.make_detector()
+        reporter = options.make_reporter()
+        setup = current_rss_mb()
+
+        start = time.perf_counter()
+        count = process_with(name, input_path(data_dir, name), options, detector, reporter)
+        return count, time.perf_counter() - start, setup
+
+    if kind == "report":
+        from src.reporter import Reporter
+        from src.sinks import SinkSpec
+
+        events = _all_events(data_dir)
+        out_dir = Path(data_dir) / "out"
+        out_dir.mkdir(exist_ok=True)
+
+        reporter = Reporter(keep_events=True)
+        if rest != "summary":
+            reporter.add_events(events)
+
+        if rest in ("jsonl", "csv-stream"):
+            spec = SinkSpec(out_dir, jsonl=rest == "jsonl", csv=rest == "csv-stream")
+            sinks = spec.open()
+
+        setup = current_rss_mb()
+
+        # Exports print a "saved to" line; keep the child's stdout for the result
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+
+            if rest == "summary":
+                reporter.add_events(events)
+            elif rest == "json":
+                reporter.export_json(out_dir / "report.json")
+            elif rest == "csv":
+                reporter.export_csv(out_dir / "report.csv")
+            else:
+                for event in events:
+                    for sink in sinks:
+                        sink.write(event)
+                for sink in sinks:
+                    sink.close()
+
+            elapsed = time.perf_counter() - start
+
+        return len(events), elapsed, setup
+
+    if kind == "worst":
+        from src.rules import RULES
+
+        rule = next(rule for rule in RULES if rule.name == rest)
+        # The value goes into the first field the rule reads, the rest stay empty
+        padding = (None,) * (len(rule.fields) - 1)
+
+        def timed(length, count):
+            args = (worst_case_value(rest, length),) + padding
+            start = time.perf_counter()
+            for _ in range(count):
+                rule.check(*args)
+            return time.perf_counter() - start
+
+        setup = current_rss_mb()
+        short = timed(WORST_CASE_BYTES // WORST_CASE_FACTOR, WORST_CASE_VALUES * WORST_CASE_FACTOR)
+        elapsed = timed(WORST_CASE_BYTES, WORST_CASE_VALUES)
+        growth = round(elapsed / short, 2) if short > 0 else None
+        return WORST_CASE_VALUES, elapsed, setup, {"value_bytes": WORST_CASE_BYTES, "growth": growth}
+
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def input_path(data_dir, name):
+    return Path(data_dir) / f"{name}{GENERATORS[name][1]}"
+
+
+def child_main(stage, data_dir):
+    count, seconds, setup, *extra = run_stage(stage, data_dir)
+    entry = {
+        "stage": stage,
+        "events": count,
+        "seconds": round(seconds, 4),
+        "events_per_sec": round(count / seconds) if seconds > 0 else None,
+        "setup_rss_mb": setup,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    for fields in extra:
+        entry.update(fields)
+    print(json.dumps(entry))
+
+
+# ------------------------------------------------------------
+# Driver
+# ------------------------------------------------------------
+def generate_inputs(data_dir, events, attack_ratio, seed):
+    sizes = {}
+    for name, (generator, _) in GENERATORS.items():
+        path = input_path(data_dir, name)
+        generator(path, events, attack_ratio=attack_ratio, seed=seed)
+        sizes[name] = path.stat().st_size
+    write_rule_pack(Path(data_dir) / "rules.json", RULE_PACK_SIZE, seed=seed)
+    return sizes
+
+
+def run_child(stage, data_dir):
+    repo_root = Path(__file__).resolve().parent.parent
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--child", stage, "--workdir", str(data_dir)],
+        cwd=repo_root, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Stage {stage} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of human-readable regressions against a previous results file."""
+    previous = {entry["stage"]: entry for entry in baseline.get("results", [])}
+    regressions = []
+
+    for entry in results:
+        if entry.get("growth") is not None and entry["growth"] > MAX_GROWTH:
+            regressions.append(f"{entry['stage']}: {entry['growth']}x slower per byte on long values")
+
+        old = previous.get(entry["stage"])
+        if old is None:
+            continue
+
+        timed = min(entry["seconds"], old.get("seconds", 0)) >= MIN_COMPARE_SECONDS
+        if timed and old.get("events_per_sec") and entry.get("events_per_sec") is not None:
+            if entry["events_per_sec"] < old["events_per_sec"] * (1 - tolerance):
+                regressions.append(
+                    f"{entry['stage']}: {entry['events_per_sec']} events/s (was {old['events_per_sec']})")
+
+        if old.get("peak_rss_mb") and entry.get("peak_rss_mb") is not None:
+            if entry["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+                regressions.append(f"{entry['stage']}: peak {entry['peak_rss_mb']} MB (was {old['peak_rss_mb']})")
+
+    return regressions
+
+
+def build_cli():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Measure events/sec and peak RSS for every parser and pipeline stage."
+    )
+    parser.add_argument("-n", "--events", type=int, default=100_000,
+                        help="Records generated per log format (default: 100000).")
+    parser.add_argument("--attack-ratio", type=float, default=0.05,
+                        help="Fraction of records shaped to trigger detections (default: 0.05).")
+    parser.add_argument("--seed", type=int, default=1337, help="Generator seed (default: 1337).")
+    parser.add_argument("--stages", nargs="+", metavar="STAGE",
+                        help="Only run these stages (prefixes work too, e.g. parse or detect:web).")
+    parser.add_argument("-o", "--output", type=Path, default=Path("benchmark_results.json"),
+                        help="Where to write the JSON results (default: ./benchmark_results.json).")
+    parser.add_argument("--baseline", type=Path,
+                        help="Previous results file; exit with status 1 if any stage regressed.")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed slowdown / memory growth vs. the baseline (default: 0.15).")
+    parser.add_argument("--workdir", type=Path,
+                        help="Directory for generated inputs (default: a temporary directory).")
+    parser.add_argument("--child", metavar="STAGE", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = build_cli()
+
+    if args.child:
+        child_main(args.child, args.workdir)
+        return
+
+    stages = [
+        stage for stage in STAGES
+        if not args.stages or any(stage == s or stage.startswith(s + ":") for s in args.stages)
+    ]
+
+    data_dir = args.workdir or Path(tempfile.mkdtemp(prefix="event-sentinel-bench-"))
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        print(f"Generating {args.events} records per format in {data_dir} ...")
+        sizes = generate_inputs(data_dir, args.events, args.attack_ratio, args.seed)
+
+        results = []
+        print(f"\n{'stage':<26}{'events':>10}{'seconds':>10}{'events/s':>12}{'setup MB':>10}{'peak MB':>10}")
+        for stage in stages:
+            entry = run_child(stage, data_dir)
+            results.append(entry)
+            print(f"{stage:<26}{entry['events']:>10}{entry['seconds']:>10.3f}{entry['events_per_sec'] or 0:>12}"
+                  f"{entry['setup_rss_mb'] or 0:>10}{entry['peak_rss_mb'] or 0:>10}"
+                  + (f"  growth {entry['growth']}x" if "growth" in entry else ""))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "events_per_format": args.events,
+            "attack_ratio": args.attack_ratio,
+            "seed": args.seed,
+            "input_bytes": sizes,
+        },
+        "results": results,
+    }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"\n[+] Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+        if regressions:
+            print(f"\n[!] {len(regressions)} regression(s) vs {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+        print(f"[+] No regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
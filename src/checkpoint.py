@@ -0,0 +1,281 @@
+"""
+Checkpoints for incremental re-scans of the same inputs.
+
+The store is a JSON file that remembers, per input path:
+- the file identity seen last time (inode, size, mtime)
+- how many bytes were consumed and a fingerprint of the bytes just
+  before that offset
+- which parser was used
+- the file's own summary: counts, first/last seen, sample events, top
+  values and the counts of its external source IPs (Reporter.to_state())
+
+A run's report merges the summaries of its inputs, so a file read again
+from the start replaces its share and a file no longer among the inputs
+drops out (forget_missing()). Events themselves aren't kept, so event
+outputs (CSV, JSONL, SQLite) only hold what a run reads.
+
+Rarity (--rare-threshold) is decided over the source IP counts of all
+inputs, earlier runs' included, so every tail is read before any is
+settled. Tags of data read in earlier runs stay as decided then.
+
+On the next run each file is either
+- reused: unchanged, its stored summary is merged without reading it
+- resumed: same inode, grown, and the consumed prefix still matches, so
+  only the new tail is parsed and merged onto the stored summary
+  (uncompressed line-oriented formats only, and not CSV files that
+  restate their header further down, see sysmon_parser.has_sections())
+- rescanned from the start (new, replaced, truncated or rewritten)
+
+Only complete lines are consumed, so a line still being written is
+picked up by the next run. A final line without a newline counts as
+complete once the file has been quiet for SETTLE_SECONDS.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from .parsers import SECTION_SCANS
+from .parsers.ranges import last_line_end
+from .parsers.compression import compression_of
+from .pipeline import resolve_parser_name, process_with, run_parallel
+from .reporter import Reporter
+from .rules import rare_sources
+from .sketches import Frequencies
+from .color import color_text, Color
+
+
+STORE_VERSION = 4
+
+# Formats that can be resumed from a byte offset (when not compressed)
+APPENDABLE = ("web", "sysmon")
+
+# Bytes before the consumed offset used to check the prefix didn't change
+FINGERPRINT_BYTES = 4096
+
+# A trailing line without newline is treated as complete after this long
+SETTLE_SECONDS = 60
+
+
+def is_appendable(file_path, parser_name):
+    """Whether a file can be resumed from a byte offset."""
+    return parser_name in APPENDABLE and compression_of(file_path) is None
+
+
+def fingerprint(file_path, offset):
+    """Hash of up to FINGERPRINT_BYTES bytes ending at offset."""
+    start = max(0, offset - FINGERPRINT_BYTES)
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        data = f.read(offset - start)
+    return hashlib.sha1(data).hexdigest()
+
+
+class FileScan:
+    """What to do with one input file in this run."""
+
+    def __init__(self, file_path, stat, parser_name=None, start=0, end=None, previous=None):
+        self.file_path = file_path
+        self.stat = stat
+        self.parser_name = parser_name
+        self.appendable = is_appendable(file_path, parser_name)
+        self.start = start
+        self.end = end
+        # Summary from earlier runs that this scan adds to
+        self.previous = previous
+
+    @property
+    def unchanged(self):
+        return self.end is not None and self.start >= self.end
+
+    def byte_range(self):
+        """(start, end) for line-oriented formats, None to parse the whole file."""
+        if self.appendable:
+            return (self.start, self.end)
+        return None
+
+
+class CheckpointStore:
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+
+        # Whether save() has anything new to write
+        self.changed = False
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == STORE_VERSION:
+                self.files = data.get("files", {})
+
+    def plan(self, file_path, parser_name):
+        """
+        Decides how much of file_path to parse. parser_name is the parser
+        picked for it this run (None if unknown yet).
+        """
+        stat = os.stat(file_path)
+        entry = self.files.get(str(file_path))
+        end = self.consumable_end(file_path, stat, parser_name)
+
+        if entry is None or entry["parser"] != parser_name or entry["inode"] != stat.st_ino:
+            return FileScan(file_path, stat, parser_name, 0, end)
+
+        previous = Reporter.from_state(entry["state"])
+
+        if (entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["offset"] >= end):
+            return FileScan(file_path, stat, parser_name, entry["offset"], entry["offset"], previous)
+
+        offset = entry["offset"]
+        resumable = (
+            is_appendable(file_path, parser_name)
+            and stat.st_size >= offset
+            and fingerprint(file_path, offset) == entry["fingerprint"]
+            and not entry.get("sections")
+        )
+
+        if resumable:
+            return FileScan(file_path, stat, parser_name, offset, max(end, offset), previous)
+
+        return FileScan(file_path, stat, parser_name, 0, end)
+
+    def consumable_end(self, file_path, stat, parser_name):
+        """Offset up to which the file can be consumed now."""
+        if not is_appendable(file_path, parser_name):
+            return stat.st_size
+
+        if time.time() - stat.st_mtime >= SETTLE_SECONDS:
+            return stat.st_size
+
+        return last_line_end(file_path, stat.st_size)
+
+    def record(self, scan, reporter):
+        """Stores the outcome of a scan; reporter holds the file's full summary."""
+        previous = self.files.get(str(scan.file_path))
+        sections = self.has_sections(scan, previous)
+
+        entry = {
+            "inode": scan.stat.st_ino,
+            "size": scan.stat.st_size,
+            "mtime_ns": scan.stat.st_mtime_ns,
+            "offset": scan.end,
+            "fingerprint": fingerprint(scan.file_path, scan.end),
+            "parser": scan.parser_name,
+            "sections": sections,
+            "state": reporter.to_state(),
+        }
+        if entry != previous:
+            self.files[str(scan.file_path)] = entry
+            self.changed = True
+
+    def has_sections(self, scan, entry):
+        """
+        Whether the consumed part of a file restates its header; its tail
+        can't be parsed without reading from the top then. Only the newly
+        consumed bytes are searched.
+        """
+        if not scan.appendable or scan.parser_name not in SECTION_SCANS:
+            return False
+        if scan.start and entry is not None and entry.get("sections"):
+            return True
+        return SECTION_SCANS[scan.parser_name](scan.file_path, scan.start, scan.end)
+
+    def forget_missing(self, input_files):
+        """Drops entries for files that are no longer part of the input."""
+        keep = {str(path) for path in input_files}
+        files = {path: entry for path, entry in self.files.items() if path in keep}
+        if len(files) != len(self.files):
+            self.files = files
+            self.changed = True
+
+    def save(self):
+        """Writes the store atomically (temp file + rename), unless nothing changed."""
+        if not self.changed and os.path.exists(self.path):
+            return
+
+        data = {
+            "version": STORE_VERSION,
+            "files": self.files,
+        }
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, self.path)
+        self.changed = False
+
+
+def scan_inputs(input_files, options, store, detector, workers=1):
+    """
+    Runs an incremental scan of input_files against the checkpoint store.
+
+    Yields (file_path, messages, count, file_reporter) in input order;
+    file_reporter holds the file's complete summary (earlier runs + new
+    data, rarity settled) or is None if the file was skipped. The store
+    is updated but not saved.
+    """
+    plans = []
+    for file_path in input_files:
+        messages = []
+        name = resolve_parser_name(file_path, options.log_type, log=messages.append)
+        scan = store.plan(file_path, name) if name else None
+        plans.append((file_path, scan, messages))
+
+    todo = [scan for _, scan, _ in plans if scan is not None and not scan.unchanged]
+
+    results = None
+    if workers != 1 and todo:
+        ranges = {scan.file_path: (scan.parser_name, scan.byte_range()) for scan in todo if scan.byte_range()}
+        results = run_parallel([scan.file_path for scan in todo], options, workers, scans=ranges)
+
+    # Every tail is read first: rarity needs the counts of all of them
+    tails = {}
+    for scan in todo:
+        if results is not None:
+            _, count, worker_messages, tail = next(results)
+        else:
+            worker_messages = []
+            tail = options.make_partial_reporter()
+            count = process_with(scan.parser_name, scan.file_path, options, detector, tail, scan.byte_range())
+            tail.close_sinks()
+        tails[scan.file_path] = (count, worker_messages, tail)
+
+    rare = None
+    if options.rare_threshold:
+        # Source IPs of all inputs: earlier runs' (per file) and this run's
+        sources = Frequencies()
+        for _, scan, _ in plans:
+            if scan is not None and scan.previous is not None and scan.previous.sources is not None:
+                sources.merge(scan.previous.sources)
+        for _, _, tail in tails.values():
+            if tail is not None and tail.sources is not None:
+                sources.merge(tail.sources)
+        rare = rare_sources(sources, options.rare_threshold)
+
+    for file_path, scan, messages in plans:
+        if scan is None:
+            yield file_path, messages, None, None
+            continue
+
+        tail = None
+        count = 0
+
+        if scan.unchanged:
+            messages.append(color_text("  Unchanged since last run; reusing checkpoint.", Color.CYAN))
+        else:
+            if scan.start:
+                messages.append(color_text(f"  Resuming at byte {scan.start}.", Color.CYAN))
+            count, worker_messages, tail = tails[file_path]
+            messages.extend(worker_messages)
+
+        file_reporter = options.make_reporter()
+        if scan.previous is not None:
+            file_reporter.merge(scan.previous)
+        if tail is not None:
+            tail.settle_rarity(rare)
+            file_reporter.merge(tail)
+
+        store.record(scan, file_reporter)
+        yield file_path, messages, count, file_reporter
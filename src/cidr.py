@@ -0,0 +1,151 @@
+"""
+CIDR classification of IP addresses with a multibit prefix trie.
+
+The trie steps one byte of the address per level (4 levels for IPv4,
+16 for IPv6). Prefixes that don't end on a byte boundary are expanded
+to the byte-aligned prefixes they cover (172.16.0.0/12 -> 16 x /16), so
+a lookup is at most one dict access per byte, however many CIDRs are
+loaded.
+
+NON_EXTERNAL holds the private, loopback, link-local, CGNAT, multicast
+and other reserved ranges; anything outside them (and outside a
+customer allowlist) counts as an external address.
+"""
+
+import functools
+import ipaddress
+
+
+PRIVATE_CIDRS = (
+    "10.0.0.0/8",
+    "172.16.0.0/12",
+    "192.168.0.0/16",
+    "fc00::/7",
+)
+
+RESERVED_CIDRS = (
+    "0.0.0.0/8",
+    "100.64.0.0/10",        # carrier-grade NAT
+    "127.0.0.0/8",
+    "169.254.0.0/16",
+    "192.0.0.0/24",
+    "192.0.2.0/24",         # documentation
+    "198.18.0.0/15",        # benchmarking
+    "198.51.100.0/24",
+    "203.0.113.0/24",
+    "224.0.0.0/4",          # multicast
+    "240.0.0.0/4",
+    "::/128",
+    "::1/128",
+    "fe80::/10",
+    "ff00::/8",
+    "2001:db8::/32",
+)
+
+# Marks a node that is the end of a loaded prefix
+_END = "end"
+
+# Valid IPv4 octets as ipaddress reads them: "0" to "255", no leading
+# zeros, signs, spaces, underscores or non-ASCII digits (which int() takes)
+_OCTETS = {str(byte): byte for byte in range(256)}
+
+
+class CidrTrie:
+    def __init__(self, cidrs=()):
+        self.v4 = {}
+        self.v6 = {}
+        for cidr in cidrs:
+            self.add(cidr)
+
+    def add(self, cidr):
+        network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+        root = self.v4 if network.version == 4 else self.v6
+
+        full, extra = divmod(network.prefixlen, 8)
+        packed = network.network_address.packed
+
+        node = root
+        for byte in packed[:full]:
+            if node.get(_END):
+                return  # already covered by a shorter prefix
+            node = node.setdefault(byte, {})
+
+        if extra == 0:
+            node.clear()
+            node[_END] = True
+            return
+
+        # Expand the partial byte into every value it covers
+        first = packed[full]
+        for byte in range(first, first + (1 << (8 - extra))):
+            child = node.setdefault(byte, {})
+            child.clear()
+            child[_END] = True
+
+    def __contains__(self, address):
+        return self.lookup(address) is True
+
+    def lookup(self, address):
+        """
+        True if address (a string) falls inside a loaded CIDR, False if
+        not, None if it isn't a valid IP address.
+        """
+        if not address:
+            return None
+
+        parts = address.split(".")
+        if len(parts) == 4 and ":" not in address:
+            node = self.v4
+            found = None
+            for part in parts:
+                byte = _OCTETS.get(part)
+                if byte is None:
+                    return None
+                if found is None:
+                    node = node.get(byte)
+                    if node is None:
+                        found = False
+                    elif _END in node:
+                        found = True
+            return bool(found)
+
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return None
+
+        # ::ffff:a.b.c.d is classified as the IPv4 address it wraps
+        if ip.version == 6 and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        packed = ip.packed
+
+        node = self.v4 if len(packed) == 4 else self.v6
+        for byte in packed:
+            node = node.get(byte)
+            if node is None:
+                return False
+            if _END in node:
+                return True
+        return False
+
+
+def non_external(allowlist=()):
+    """
+    Trie of private + reserved ranges, plus any allowlisted CIDRs.
+    Tries are built once per allowlist and shared (they are never
+    modified after construction), so per-file callers don't rebuild them.
+    """
+    return _non_external(tuple(allowlist))
+
+
+@functools.lru_cache(maxsize=16)
+def _non_external(allowlist):
+    return CidrTrie(PRIVATE_CIDRS + RESERVED_CIDRS + allowlist)
+
+
+NON_EXTERNAL = non_external()
+
+
+def is_external(address, trie=NON_EXTERNAL):
+    """True for a valid IP address outside every private/reserved/allowlisted range."""
+    return trie.lookup(address) is False
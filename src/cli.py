@@ -32,12 +32,165 @@ def build_cli():
         help="Log type to parse (default: auto-detection)."
     )
 
+    # ---- PROCESSING OPTIONS ----
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream events through detection and keep only summaries in memory "
+             "(flat memory use on very large inputs)."
+    )
+
+    parser.add_argument(
+        "-F", "--follow",
+        action="store_true",
+        help="Keep web/Sysmon CSV files open and analyze lines as they are appended "
+             "(handles rotation; Ctrl+C stops and writes the report)."
+    )
+
+    parser.add_argument(
+        "--listen",
+        metavar="[HOST:]PORT",
+        help="Receive syslog on PORT (UDP and TCP, RFC 3164/5424, newline or octet framing) and "
+             "analyze web access lines and forwarded Windows <Event> XML as they arrive "
+             "(Ctrl+C stops and writes the report)."
+    )
+
+    parser.add_argument(
+        "--listen-queue",
+        type=int,
+        default=10000,
+        metavar="N",
+        help="Messages buffered between the sockets and the analyzer in --listen mode "
+             "(default: 10000). When full, TCP senders are slowed down and UDP messages are dropped."
+    )
+
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        metavar="FILE",
+        help="Checkpoint file for incremental re-scans: unchanged files are not re-read and "
+             "appended files are parsed from where the last run stopped."
+    )
+
+    parser.add_argument(
+        "--correlate",
+        action="store_true",
+        help="Also run sliding-window correlation rules per file "
+             "(brute_force: many failed logins, web_scan: many probed URLs per source IP)."
+    )
+
+    parser.add_argument(
+        "--dedup",
+        nargs="?",
+        const="",
+        metavar="FIELDS",
+        help="Collapse repeated records of a file before detection into one event with a count and "
+             "last timestamp. Records are duplicates if they agree on FIELDS (comma-separated "
+             "normalized fields; default: all but per-occurrence ones like timestamp)."
+    )
+
+    parser.add_argument(
+        "--dedup-window",
+        type=int,
+        default=60,
+        metavar="SECONDS",
+        help="Duplicates are collapsed within this many seconds of a key's first record (default: 60)."
+    )
+
+    parser.add_argument(
+        "--batch",
+        nargs="?",
+        type=int,
+        const=65536,
+        metavar="ROWS",
+        help="Parse, tag and summarize web and Sysmon logs in column batches of ROWS records "
+             "(default: 65536); only alerting rows become full events unless events are kept."
+    )
+
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        metavar="K",
+        help="Report the K most frequent source IPs, URLs, user agents, process names and "
+             "detection tags, counted in fixed memory (default: 10, 0 = off)."
+    )
+
+    parser.add_argument(
+        "--rare-threshold",
+        type=int,
+        default=5,
+        metavar="N",
+        help="rare_external_ip only tags external IPs seen at most N times in the run "
+             "(so far, in --follow / --listen mode) (default: 5, 0 = tag every external IP)."
+    )
+
+    parser.add_argument(
+        "--allow",
+        action="append",
+        metavar="CIDR",
+        help="Treat this network as internal for rare_external_ip (repeatable)."
+    )
+
+    parser.add_argument(
+        "--allowlist",
+        type=Path,
+        metavar="FILE",
+        help="File of CIDRs (one per line) to treat as internal for rare_external_ip."
+    )
+
+    parser.add_argument(
+        "--rules",
+        action="append",
+        type=Path,
+        metavar="PATH",
+        help="Sigma-style rule pack (YAML/JSON file, or a directory of them) to run next to the "
+             "built-in rules (repeatable). Edited packs are reloaded live in --follow / --listen modes."
+    )
+
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Use slot-based compact events (much lower memory per retained event)."
+    )
+
+    parser.add_argument(
+        "--no-raw",
+        action="store_true",
+        help="Drop raw source fields from retained events; report samples keep them."
+    )
+
+    parser.add_argument(
+        "--rule-cache",
+        type=int,
+        default=65536,
+        metavar="N",
+        help="Max cached results per rule for repeated field values (default: 65536, 0 = off)."
+    )
+
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes used to analyze multiple files in parallel "
+             "(default: 1, 0 = one per CPU core)."
+    )
+
     # ---- OUTPUT OPTIONS ----
     parser.add_argument(
         "-o", "--output",
-        choices=["json", "csv", "both"],
+        choices=["json", "csv", "both", "jsonl", "sqlite", "all"],
         default="json",
-        help="Output report format (default: JSON)."
+        help="Output report format (default: JSON). jsonl streams every event to report.jsonl; "
+             "sqlite writes an indexed report.sqlite for the query command; "
+             "all = json + csv + jsonl + sqlite. With --stream/--follow, CSV is written while "
+             "streaming as one report_<source>.csv per log source."
+    )
+
+    parser.add_argument(
+        "--alerts-only",
+        action="store_true",
+        help="Only write events with detections to report.jsonl."
     )
 
     parser.add_argument(
@@ -54,6 +207,13 @@ def build_cli():
         help="Disable colorized console output."
     )
 
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time every stage, input file and rule; prints a table and writes stats.json "
+             "next to the reports."
+    )
+
     # ---- DEBUG / VERBOSE ----
     parser.add_argument(
         "-v", "--verbose",
@@ -62,3 +222,96 @@ def build_cli():
     )
 
     return parser.parse_args()
+
+
+def build_query_cli(argv=None):
+    """
+    Creates the parser for the `query` command (searching a report.sqlite).
+    Returns the parsed arguments for use in query.py.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="Log Triage & Threat Highlights query",
+        description="Search the report.sqlite of an earlier run (written with --output sqlite)."
+    )
+
+    parser.add_argument(
+        "database",
+        type=Path,
+        help="Path to report.sqlite."
+    )
+
+    # ---- FILTERS ----
+    parser.add_argument(
+        "--since",
+        metavar="TIME",
+        help="Only events at or after TIME: an ISO date/time (2025-01-31, 2025-01-31T08:00) "
+             "or an age like 30d, 12h, 15m."
+    )
+
+    parser.add_argument(
+        "--until",
+        metavar="TIME",
+        help="Only events before TIME (same formats as --since)."
+    )
+
+    parser.add_argument(
+        "--source",
+        choices=["sysmon", "windows_event", "web"],
+        help="Only events of this log source."
+    )
+
+    parser.add_argument(
+        "--ip",
+        help="Only events with this source IP."
+    )
+
+    parser.add_argument(
+        "--user",
+        help="Only events of this user."
+    )
+
+    parser.add_argument(
+        "--tag",
+        help="Only events with this detection tag (e.g. web_attack, brute_force)."
+    )
+
+    parser.add_argument(
+        "--command",
+        metavar="TEXT",
+        help="Full-text search in command lines: every word must occur (case-insensitive). "
+             "Use --command=-enc for text starting with a dash."
+    )
+
+    parser.add_argument(
+        "--url",
+        metavar="TEXT",
+        help="Full-text search in URLs."
+    )
+
+    parser.add_argument(
+        "--text",
+        metavar="TEXT",
+        help="Full-text search in command lines and URLs."
+    )
+
+    # ---- OUTPUT ----
+    parser.add_argument(
+        "--group-by",
+        choices=["src_ip", "user", "source", "process_name", "command_line", "url", "dest_ip", "tag"],
+        help="Count matching events per value (with first/last seen) instead of listing them."
+    )
+
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=20,
+        help="Max rows to print (default: 20)."
+    )
+
+    parser.add_argument(
+        "--sql",
+        help="Run this read-only SQL instead (tables: events, detections, events_fts)."
+    )
+
+    return parser.parse_args(argv)
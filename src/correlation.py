@@ -0,0 +1,169 @@
+"""
+Stateful correlation across events, run after the per-event rules.
+
+Each CorrelationRule keeps a sliding time window per key (e.g. per
+src_ip) over the events its `when` check accepts, and tags every event
+that brings the key over its threshold:
+- count: at least `threshold` matching events within `window` seconds
+- distinct: at least `threshold` different values of a field
+  (e.g. urls) within `window` seconds
+
+Memory is bounded:
+- a key never remembers more than `threshold` timestamps or values,
+  since only the newest `threshold` can decide whether it is over
+- keys idle for longer than their window are evicted, and at most
+  `max_keys` keys are tracked per rule (least recently active go first)
+
+Windows run on event epochs (see timestamps.py); events without a
+parseable timestamp are not correlated. Events are assumed to arrive
+roughly in time order, as they do within one log file.
+
+An event standing for collapsed duplicates (see dedup.py) counts as
+all of its records for count rules: the first at its own timestamp,
+the others at the last record's.
+"""
+
+from collections import OrderedDict, deque, namedtuple
+
+
+# Max tracked keys per rule, whatever the input
+MAX_KEYS = 100_000
+
+
+# --- Event filters ---
+
+def is_failed_login(event):
+    return "failed_login" in event.detections or event.get("event_id") == "4625"
+
+def is_web_probe(event):
+    """Attack-looking or rejected (4xx) web requests."""
+    return "web_attack" in event.detections or str(event.get("status") or "").startswith("4")
+
+
+# --- Correlation table ---
+
+CorrelationRule = namedtuple(
+    "CorrelationRule", ["name", "key", "window", "threshold", "when", "distinct"], defaults=[None]
+)
+
+CORRELATIONS = (
+    # Many failed logins from one address
+    CorrelationRule("brute_force", "src_ip", 120, 50, is_failed_login),
+    # One address probing many different URLs (directory traversal / content scans)
+    CorrelationRule("web_scan", "src_ip", 300, 100, is_web_probe, distinct="url"),
+)
+
+
+class Correlator:
+    def __init__(self, rules=CORRELATIONS, max_keys=MAX_KEYS):
+        self.rules = tuple(rules)
+        self.max_keys = max_keys
+
+        # One key -> window state map per rule, least recently active first
+        self.states = [OrderedDict() for _ in self.rules]
+
+        # Newest epoch seen so far; idle eviction is measured against it
+        self.now = None
+
+    def reset(self):
+        """Forgets all windows (e.g. between unrelated files)."""
+        for states in self.states:
+            states.clear()
+        self.now = None
+
+    def tracked_keys(self):
+        """rule name -> number of keys currently held."""
+        return {rule.name: len(states) for rule, states in zip(self.rules, self.states)}
+
+    def run(self, events):
+        for event in events:
+            self.correlate(event)
+
+        return events
+
+    def stream(self, events):
+        """Generator version of run(): yields each event once it is correlated."""
+        for event in events:
+            self.correlate(event)
+            yield event
+
+    def correlate(self, event):
+        epoch = event.epoch
+        if epoch is None:
+            return event
+
+        # Collapsed duplicates: the other records and when the last one was logged
+        repeat = event.repeat
+        newest = epoch if repeat is None else repeat.last_epoch
+
+        if self.now is None or newest > self.now:
+            self.now = newest
+
+        tags = None
+
+        for rule, states in zip(self.rules, self.states):
+            key = event.get(rule.key)
+            if not key or not rule.when(event):
+                continue
+
+            state = states.get(key)
+            if state is None:
+                # New key: make room first
+                self._evict(rule, states)
+                state = states[key] = OrderedDict() if rule.distinct else deque(maxlen=rule.threshold)
+            else:
+                states.move_to_end(key)
+
+            if rule.distinct:
+                fired = self._add_distinct(rule, state, event.get(rule.distinct), newest)
+            else:
+                state.append(epoch)
+                if repeat is not None:
+                    state.extend([newest] * min(repeat.count - 1, rule.threshold))
+                fired = len(state) == rule.threshold and newest - state[0] <= rule.window
+
+            if fired:
+                if tags is None:
+                    tags = []
+                tags.append(rule.name)
+
+        if tags:
+            # Compact events may hold the shared empty tuple; plain events a list
+            if isinstance(event.detections, list):
+                event.detections.extend(tags)
+            else:
+                event.detections = (*event.detections, *tags)
+
+        return event
+
+    def _add_distinct(self, rule, seen, value, epoch):
+        """
+        seen maps value -> last epoch, most recent last, holding at most
+        threshold values: the key is over threshold exactly when it is full
+        and its oldest entry is still inside the window.
+        """
+        if value is None:
+            return False
+
+        if value in seen:
+            seen.move_to_end(value)
+        elif len(seen) >= rule.threshold:
+            seen.popitem(last=False)
+        seen[value] = epoch
+
+        if len(seen) < rule.threshold:
+            return False
+
+        oldest = next(iter(seen.values()))
+        return epoch - oldest <= rule.window
+
+    def _evict(self, rule, states):
+        """Drops keys idle for longer than the window, then the least active over max_keys."""
+        horizon = self.now - rule.window
+
+        while states:
+            state = next(iter(states.values()))
+            last = next(reversed(state.values())) if rule.distinct else state[-1]
+            if last >= horizon and len(states) < self.max_keys:
+                break
+            states.popitem(last=False)
@@ -0,0 +1,172 @@
+"""
+Collapsing of repeated records before detection.
+
+Health checks, beacons and scheduled tasks log the same record over and
+over. With --dedup, records of a file that agree on a key (by default
+every normalized field except the ones that differ per occurrence, like
+the timestamp) are collapsed within a time window: the first record
+stands for all of them and carries a Repeat with the count and the last
+timestamp (see event.py). Only that event is tagged, reported and
+exported, so detection work and report size shrink with the redundancy
+of the input, while summary counts still add up to every record.
+
+    python main.py --directory /var/log/nginx --dedup
+    python main.py --directory /var/log/nginx --dedup src_ip,url,status --dedup-window 300
+
+Windows are fixed: they open at the first record of a key and close
+`window` seconds later (event time), when the collapsed event moves on
+to detection. Events leave in the order their first record arrived.
+Memory is bounded: at most `max_pending` keys are held, and when more
+arrive the oldest window is closed early. Records without a parseable
+timestamp can't be windowed and pass straight through.
+
+Fields left out of the key are taken from the first record, so rules
+reading them only see that one; the default key leaves out nothing the
+rules look at.
+"""
+
+from collections import OrderedDict
+from operator import itemgetter
+
+from .event import Repeat
+from .parsers import SOURCE_FIELDS
+
+
+# Default window (seconds)
+DEDUP_WINDOW = 60
+
+# Max keys held at once, whatever the input
+MAX_PENDING = 100_000
+
+# Normalized fields that differ between otherwise identical records
+VOLATILE_FIELDS = frozenset(("timestamp", "process_id", "process_guid", "record_id"))
+
+
+def parse_fields(text):
+    """'src_ip, url' -> ('src_ip', 'url'); empty text -> () (the default key)."""
+    return tuple(name.strip() for name in (text or "").split(",") if name.strip())
+
+
+class Deduplicator:
+    def __init__(self, fields=(), window=DEDUP_WINDOW, max_pending=MAX_PENDING):
+        # Key fields; () picks every non-volatile field of each source
+        self.fields = tuple(fields)
+        self.window = window
+        self.max_pending = max_pending
+
+        # key -> [first event, count, last timestamp, last epoch], oldest first
+        self.pending = OrderedDict()
+
+        # source (or EventSchema) -> key function, None if it has no key field
+        self.keys = {}
+
+        # Records folded into an earlier one
+        self.collapsed = 0
+
+    def stream(self, events):
+        """Yields each distinct record once its window has closed (the rest at the end)."""
+        pending = self.pending
+        window = self.window
+        max_pending = self.max_pending
+        key_of = self.key_of
+
+        # First epoch of the oldest pending window, None when nothing is pending
+        oldest = None
+
+        for event in events:
+            epoch = event.epoch
+            key = key_of(event) if epoch is not None else None
+            if key is None:
+                yield event
+                continue
+
+            # Close the windows that ended before this record
+            if oldest is not None and (epoch - window > oldest or len(pending) >= max_pending):
+                horizon = epoch - window
+                while pending:
+                    entry = next(iter(pending.values()))
+                    if entry[0].epoch >= horizon and len(pending) < max_pending:
+                        break
+                    yield self._finish(pending.popitem(last=False)[1])
+                oldest = next(iter(pending.values()))[0].epoch if pending else None
+
+            entry = pending.get(key)
+            if entry is None:
+                pending[key] = [event, 1, None, None]
+                if oldest is None:
+                    oldest = epoch
+                continue
+
+            entry[1] += 1
+            if entry[3] is None or epoch >= entry[3]:
+                entry[2] = event.timestamp
+                entry[3] = epoch
+
+        while pending:
+            yield self._finish(pending.popitem(last=False)[1])
+
+    def _finish(self, entry):
+        event, count, last_timestamp, last_epoch = entry
+        if count > 1:
+            event.repeat = Repeat(count, last_timestamp, last_epoch)
+            self.collapsed += count - 1
+        return event
+
+    def key_of(self, event):
+        """Hashable key of an event, or None if it can't be deduplicated."""
+        schema = event.schema
+        if schema is None:
+            getter = self.keys.get(event.source, False)
+            if getter is False:
+                getter = self.keys[event.source] = self._source_getter(event)
+            row = event.normalized
+        else:
+            getter = self.keys.get(schema, False)
+            if getter is False:
+                getter = self.keys[schema] = self._schema_getter(schema)
+            row = event.values
+
+        if getter is None:
+            return None
+        return (event.source, getter(row))
+
+    def _key_fields(self, available):
+        if self.fields:
+            return [name for name in self.fields if name in available]
+        return [name for name in available if name not in VOLATILE_FIELDS]
+
+    def _schema_getter(self, schema):
+        fields = self._key_fields(schema.fields)
+        if not fields:
+            return None
+        return itemgetter(*(schema.index[name] for name in fields))
+
+    def _source_getter(self, event):
+        available = SOURCE_FIELDS.get(event.source)
+        if available is None:
+            # Unknown source: every field of its records, whichever they have
+            if self.fields:
+                fields = self.fields
+            else:
+                return lambda normalized: tuple(sorted(
+                    (name, value) for name, value in normalized.items() if name not in VOLATILE_FIELDS
+                ))
+        else:
+            fields = self._key_fields(available)
+
+        if not fields:
+            return None
+        return _dict_getter(fields)
+
+
+def _dict_getter(fields):
+    """Key values from a normalized dict; fields it lacks read as None."""
+    values = itemgetter(*fields) if len(fields) > 1 else (lambda row, name=fields[0]: (row[name],))
+
+    def getter(normalized):
+        try:
+            return values(normalized)
+        except KeyError:
+            return tuple([normalized.get(name) for name in fields])
+
+    return getter
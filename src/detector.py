@@ -8,45 +8,180 @@ It enriches events with detection tags such as:
 - base64_command
 - rare_external_ip
 - web_attack
+
+Rules are compiled into a plan once per event source (see
+rules.compile_plan), so e.g. web events never run the process rules.
+CompactEvents get a plan indexed straight into their values tuple.
+
+Rule packs loaded with --rules (see rulepacks.py) run after the
+built-in rules; their tags follow the built-in ones on an event.
+
+run() tags a whole list in place; stream() tags events lazily as they
+are pulled through, so the pipeline never has to hold a full list.
+tag_batch() tags the rows of a ColumnBatch column by column (--batch,
+see rules.matching_rows) without making events of them.
 """
 
 from . import rules
+from .cidr import non_external
+from .event import NO_DETECTIONS
+from .parsers import SOURCE_FIELDS
+from .sketches import Frequencies
 
 
 class Detector:
-    def __init__(self):
-        pass
+    def __init__(self, cache_size=0, counts=None, rare_threshold=0, allowlist=(), profiler=None,
+                 rule_packs=None):
+        rule_table = rules.RULES
+
+        # rare_threshold > 0 limits rare_external_ip to IPs seen at most that
+        # often so far, counted live into counts (follow mode); otherwise it
+        # tags every external IP and the reporter settles rarity at the end
+        self.counts = None
+        if rare_threshold > 0:
+            self.counts = counts if counts is not None else Frequencies()
+
+        if rare_threshold > 0 or allowlist:
+            rule_table = rules.with_rarity(rule_table, self.counts, rare_threshold, non_external(allowlist))
+
+        # cache_size > 0 memoizes the cacheable rules (see rules.with_cache)
+        self.rules, self.caches = rules.with_cache(rule_table, cache_size)
+
+        # --profile: time and count every rule call (the plain table otherwise)
+        self.profiler = profiler
+        if profiler is not None:
+            self.rules = profiler.wrap_rules(self.rules)
+
+        # source (or EventSchema) -> compiled rule plan
+        self.plans = {}
+
+        # rulepacks.RulePacks or None; its rule set may be swapped while running
+        self.rule_packs = rule_packs
+        self.match_packs = None
+        if rule_packs is not None:
+            self.match_packs = self._match_packs
+            if profiler is not None:
+                self.match_packs = profiler.timed_check("rule_packs", self._match_packs)
+
+    def plan_for(self, source):
+        plan = self.plans.get(source)
+        if plan is None:
+            plan = self.plans[source] = rules.compile_plan(SOURCE_FIELDS.get(source), self.rules)
+        return plan
+
+    def plan_for_schema(self, schema):
+        plan = self.plans.get(schema)
+        if plan is None:
+            plan = self.plans[schema] = rules.compile_plan(rules=self.rules, positions=schema.index)
+        return plan
+
+    def _match_packs(self, event, row):
+        """Tags of the rule-pack rules matching an event."""
+        rule_set = self.rule_packs.rules
+        schema = event.schema
+        if schema is None:
+            matcher = rule_set.matcher_for(event.source, SOURCE_FIELDS.get(event.source))
+        else:
+            matcher = rule_set.matcher_for(schema.source, schema.index, schema.index, key=schema)
+        return matcher.match(row)
+
+    def plan_for_batch(self, schema):
+        key = ("batch", schema)
+        plan = self.plans.get(key)
+        if plan is None:
+            plan = self.plans[key] = rules.compile_batch_plan(schema.index, self.rules)
+        return plan
+
+    def reload_rules(self, log=print):
+        """Picks up edited rule packs (follow / listen modes); True if they changed."""
+        return self.rule_packs is not None and self.rule_packs.reload_if_changed(log=log)
+
+    def cache_stats(self):
+        """rule name -> {hits, misses, size, maxsize} for each cached rule."""
+        stats = {}
+        for name, check in self.caches.items():
+            info = check.cache_info()
+            stats[name] = {
+                "hits": info.hits,
+                "misses": info.misses,
+                "size": info.currsize,
+                "maxsize": info.maxsize,
+            }
+        return stats
 
     def run(self, events):
-        
         for event in events:
-            tags = []
+            self.tag(event)
 
-            # 1. Failed logins
-            if rules.failed_login(event):
-                tags.append("failed_login")
+        return events
 
-            # 2. Suspicious parent-child processes
-            if rules.suspicious_process(event):
-                tags.append("suspicious_process")
+    def stream(self, events):
+        """Generator version of run(): yields each event once it is tagged."""
+        for event in events:
+            self.tag(event)
+            yield event
 
-            # 3. Base64 encoded commands
-            if rules.base64_command(event):
-                tags.append("base64_command")
+    def tag_batch(self, batch):
+        """
+        tag() for every row of a ColumnBatch: returns row -> tags for the
+        rows that got any, in row order (tags ordered as tag() would).
+        """
+        rows = len(batch)
+        columns = batch.columns
+        tags = {}
+        # Whether tags is keyed in row order
+        ordered = True
 
-            # 4. Rare external IPs (web logs only)
-            if rules.rare_external_ip(event):
-                tags.append("rare_external_ip")
+        for entry in self.plan_for_batch(batch.schema):
+            name = entry.name
+            matched = rules.matching_rows(entry, columns, rows)
+            if not tags:
+                tags = {row: [name] for row in matched}
+                continue
 
-            # 5. Web attack patterns (SQLi, traversal, RCE)
-            if rules.web_attack(event):
-                tags.append("web_attack")
-            
-            # 6. Suspicious binary
-            if rules.suspicious_binary(event):
-                tags.append("suspicious_binary")
+            for row in matched:
+                found = tags.get(row)
+                if found is None:
+                    tags[row] = [name]
+                    ordered = False
+                else:
+                    found.append(name)
 
-            # Attach tags to event object
-            event.detections = tags
+        if self.rule_packs is not None:
+            schema = batch.schema
+            match = self.rule_packs.rules.matcher_for(schema.source, schema.index, schema.index, key=schema).match
+            if self.profiler is not None:
+                match = self.profiler.timed_check("rule_packs", match)
 
-        return events
+            for row, values in enumerate(zip(*columns)):
+                for tag in match(values):
+                    found = tags.get(row)
+                    if found is None:
+                        tags[row] = [tag]
+                        ordered = False
+                    elif tag not in found:
+                        found.append(tag)
+
+        return tags if ordered else dict(sorted(tags.items()))
+
+    def tag(self, event):
+        """Runs the source's rule plan against a single event and attaches the tags."""
+        schema = event.schema
+
+        if schema is None:
+            row = event.normalized
+            plan = self.plan_for(event.source)
+        else:
+            row = event.values
+            plan = self.plan_for_schema(schema)
+
+        tags = [name for name, getter, check in plan if check(*getter(row))]
+
+        if self.match_packs is not None:
+            for tag in self.match_packs(event, row):
+                if tag not in tags:
+                    tags.append(tag)
+
+        # Compact events share one empty value instead of a list each
+        event.detections = tags if tags or schema is None else NO_DETECTIONS
+        return event
@@ -4,19 +4,101 @@ A normalized representation of a log event.
 All parsers produce an Event object so that the rest of the
 system (rules engine, reports, output) can work consistently
 regardless of log format.
+
+CompactEvent is a slimmer alternative for very large runs: normalized
+values live in a tuple laid out by a per-source EventSchema instead of a
+dict per event, and raw fields are kept as a shared key tuple plus a
+value tuple. It offers the same read API (get, [], property helpers,
+normalized, raw, to_dict), but normalized/raw are built on access and
+are read-only snapshots.
+
+Both kinds carry `epoch`: the timestamp as integer seconds since 1970
+(UTC), or None if it couldn't be parsed. The schema's clock computes it
+once at parse time (see timestamps.py).
+
+ColumnBatch holds many records of one schema column by column, as
+the batch parsers produce them (--batch); rows are turned into events
+one at a time, only where an event is needed (see reporter.py).
+
+An event that stands for several identical records (see dedup.py) has
+`repeat` set to a Repeat: how many records it represents and when the
+last of them was logged. `count`, `last_timestamp` and `last_epoch`
+read the same for any event (1 and its own timestamp when not repeated).
 """
 
+import sys
+from collections import namedtuple
 from dataclasses import dataclass, field
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+
+from .timestamps import to_epoch
+
+
+# count >= 2 records collapsed into one event; the event holds the first
+Repeat = namedtuple("Repeat", ["count", "last_timestamp", "last_epoch"])
+
+
+class EventFieldsMixin:
+    """Property helpers matching normalized keys; relies on self.get()."""
+
+    __slots__ = ()
+
+    @property
+    def count(self):
+        """Number of log records this event stands for."""
+        return 1 if self.repeat is None else self.repeat.count
+
+    @property
+    def last_timestamp(self):
+        return self.timestamp if self.repeat is None else self.repeat.last_timestamp
+
+    @property
+    def last_epoch(self):
+        return self.epoch if self.repeat is None else self.repeat.last_epoch
+
+    @property
+    def message(self):
+        return self.get("message")
+
+    @property
+    def description(self):
+        return self.get("description")
+
+    @property
+    def process(self):
+        return self.get("process_name")
+
+    @property
+    def parent(self):
+        return self.get("parent_process")
+
+    @property
+    def command(self):
+        return self.get("command_line")
+
+    @property
+    def source_ip(self):
+        return self.get("src_ip")
+
+    @property
+    def request(self):
+        return self.get("request")
 
 
 @dataclass
-class Event:
+class Event(EventFieldsMixin):
     timestamp: str
     source: str                  
     raw: Dict[str, Any]          
     normalized: Dict[str, Any] = field(default_factory=dict)
     detections: List[str] = field(default_factory=list)
+    epoch: Optional[int] = None
+
+    # Plain dict-backed events have no fixed schema (see CompactEvent)
+    schema = None
+
+    # Set to a Repeat when duplicates were collapsed into this event
+    repeat = None
 
     def get(self, key: str, default: Optional[Any] = None) -> Any:
         """Safe dict-like access into normalized fields."""
@@ -27,40 +109,192 @@ class Event:
         return self.normalized.get(key)
     
     def to_dict(self):
-        return {
+        data = {
             "timestamp": self.timestamp,
             "source": self.source,
             "raw": self.raw,
             "normalized": self.normalized,
             "detections": self.detections
         }
+        if self.repeat is not None:
+            data["count"] = self.repeat.count
+            data["last_timestamp"] = self.repeat.last_timestamp
+        return data
 
+    def drop_raw(self):
+        """Releases the raw source fields (to_dict() then reports raw as {})."""
+        self.raw = {}
 
-     # --- Property helpers matching normalized keys ---
-    @property
-    def message(self):
-        return self.normalized.get("message")
 
-    @property
-    def description(self):
-        return self.normalized.get("description")
+class EventSchema:
+    """
+    Fixed layout of normalized fields for one source.
+    One instance is shared by every CompactEvent of that source.
+    """
 
-    @property
-    def process(self):
-        return self.normalized.get("process_name")
+    __slots__ = ("source", "fields", "index", "interned", "raw_interned", "intern_timestamp",
+                 "clock", "_raw_layouts")
 
-    @property
-    def parent(self):
-        return self.normalized.get("parent_process")
+    def __init__(self, source: str, fields: Tuple[str, ...], interned: Tuple[str, ...] = (),
+                 raw_interned: Tuple[str, ...] = (), intern_timestamp: bool = False,
+                 clock: Callable[[str], Optional[int]] = to_epoch):
+        self.source = source
+        self.fields = tuple(fields)
+        self.index = {name: i for i, name in enumerate(self.fields)}
+
+        # Low-cardinality fields whose strings are shared between events
+        self.interned = tuple(self.index[name] for name in interned)
+        self.raw_interned = frozenset(raw_interned)
+        self.intern_timestamp = intern_timestamp
+
+        # Timestamp string -> epoch seconds, specialized for the source's format
+        self.clock = clock
+
+        # raw key tuple -> positions of raw_interned keys in it
+        self._raw_layouts = {}
+
+    def __getstate__(self):
+        return (self.source, self.fields, tuple(self.fields[i] for i in self.interned),
+                tuple(self.raw_interned), self.intern_timestamp, self.clock)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def _intern(self, values, positions):
+        values = list(values)
+        for i in positions:
+            if i < len(values) and type(values[i]) is str:
+                values[i] = sys.intern(values[i])
+        return tuple(values)
+
+    def make(self, timestamp, values, raw_keys, raw_values, compact=False):
+        """Builds an Event (or CompactEvent) from values laid out in field order."""
+        epoch = self.clock(timestamp)
+
+        if not compact:
+            return Event(
+                timestamp=timestamp,
+                source=self.source,
+                raw=dict(zip(raw_keys, raw_values)),
+                normalized=dict(zip(self.fields, values)),
+                epoch=epoch
+            )
+
+        # Interned fields must be interned in both tuples (they often share
+        # the same string objects), otherwise nothing is saved
+        values = self._intern(values, self.interned)
+        if self.intern_timestamp and type(timestamp) is str:
+            timestamp = sys.intern(timestamp)
+
+        positions = self._raw_layouts.get(raw_keys)
+        if positions is None:
+            positions = self._raw_layouts[raw_keys] = tuple(
+                i for i, key in enumerate(raw_keys) if key in self.raw_interned
+            )
+
+        return CompactEvent(self, timestamp, values, raw_keys, self._intern(raw_values, positions), epoch)
+
+
+# Shared "no detections" value for compact events
+NO_DETECTIONS = ()
+
+# Default rows per ColumnBatch
+BATCH_ROWS = 65536
+
+
+class CompactEvent(EventFieldsMixin):
+    __slots__ = ("timestamp", "epoch", "schema", "values", "raw_keys", "raw_values", "detections", "repeat")
+
+    def __init__(self, schema: EventSchema, timestamp: str, values: tuple,
+                 raw_keys: tuple = (), raw_values: tuple = (), epoch: Optional[int] = None):
+        self.timestamp = timestamp
+        self.epoch = epoch
+        self.schema = schema
+        self.values = values
+        self.raw_keys = raw_keys
+        self.raw_values = raw_values
+        self.detections = NO_DETECTIONS
+        self.repeat = None
 
     @property
-    def command(self):
-        return self.normalized.get("command_line")
+    def source(self):
+        return self.schema.source
 
     @property
-    def source_ip(self):
-        return self.normalized.get("src_ip")
+    def normalized(self) -> Dict[str, Any]:
+        return dict(zip(self.schema.fields, self.values))
 
     @property
-    def request(self):
-        return self.normalized.get("request")
\ No newline at end of file
+    def raw(self) -> Dict[str, Any]:
+        return dict(zip(self.raw_keys, self.raw_values))
+
+    def get(self, key: str, default: Optional[Any] = None) -> Any:
+        """Safe dict-like access into normalized fields."""
+        i = self.schema.index.get(key)
+        return default if i is None else self.values[i]
+
+    def __getitem__(self, key: str) -> Any:
+        """event['process_name'] style access."""
+        return self.get(key)
+
+    def to_dict(self):
+        data = {
+            "timestamp": self.timestamp,
+            "source": self.source,
+            "raw": self.raw,
+            "normalized": self.normalized,
+            "detections": list(self.detections)
+        }
+        if self.repeat is not None:
+            data["count"] = self.repeat.count
+            data["last_timestamp"] = self.repeat.last_timestamp
+        return data
+
+    def drop_raw(self):
+        """Releases the raw source fields (to_dict() then reports raw as {})."""
+        self.raw_keys = self.raw_values = ()
+
+
+class ColumnBatch:
+    """
+    Consecutive records of one source, by column: columns[i] holds
+    schema.fields[i] of every row, rows numbered in input order.
+    raw_keys / raw_rows are each row's raw field names and values.
+    """
+
+    __slots__ = ("schema", "timestamps", "epochs", "columns", "raw_keys", "raw_rows")
+
+    def __init__(self, schema: EventSchema, timestamps: Sequence[str], columns: Sequence[Sequence[Any]],
+                 raw_keys: Sequence[tuple], raw_rows: Sequence[Sequence[Any]]):
+        self.schema = schema
+        self.timestamps = timestamps
+        # The clock runs once per distinct timestamp
+        clock = schema.clock
+        epochs = {timestamp: clock(timestamp) for timestamp in set(timestamps)}
+        self.epochs = list(map(epochs.__getitem__, timestamps))
+        self.columns = columns
+        self.raw_keys = raw_keys
+        self.raw_rows = raw_rows
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def column(self, name: str) -> Optional[Sequence[Any]]:
+        """A normalized field's values, or None if the schema lacks it."""
+        i = self.schema.index.get(name)
+        return None if i is None else self.columns[i]
+
+    def event(self, row: int, detections: Optional[List[str]] = None, compact: bool = False):
+        """Row as an Event (a CompactEvent with compact=True) tagged with detections."""
+        event = self.schema.make(
+            self.timestamps[row], [column[row] for column in self.columns],
+            self.raw_keys[row], self.raw_rows[row], compact,
+        )
+        if detections:
+            event.detections = detections
+        return event
+
+    def events(self, tags, compact: bool = False):
+        """Every row as an event; tags maps row -> detections (see Detector.tag_batch)."""
+        get = tags.get
+        return [self.event(row, get(row), compact) for row in range(len(self))]
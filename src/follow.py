@@ -0,0 +1,229 @@
+"""
+Follow mode: keep log files open and analyze lines as they are appended.
+
+Each followed file is polled for new data a few times per second. Only
+complete lines are parsed; a partial last line waits for its newline.
+Existing content is processed first, in bounded chunks.
+Rotation is handled like `tail -F`:
+- the path now points to a different inode -> finish the old file, then
+  start reading the new one from the beginning
+- the file got smaller than what was already read -> it was truncated,
+  start over from the beginning
+
+Between polls the process just sleeps, so an idle follower uses almost
+no CPU. Supported formats are the line-oriented ones (web access logs
+and Sysmon CSV), uncompressed.
+"""
+
+import os
+import signal
+import time
+
+from .parsers.web_parser import iter_web_lines
+from .parsers.sysmon_parser import HEADER_MARKER, is_header_row, iter_sysmon_lines, parse_header
+from .parsers.compression import compression_of
+from .pipeline import resolve_parser_name
+from .color import color_text, Color
+
+
+# Seconds between polls; detections show up at most this long after a write
+POLL_INTERVAL = 0.5
+
+# Max bytes read from one file per poll
+READ_CHUNK = 1024 * 1024
+
+FOLLOWABLE = ("web", "sysmon")
+
+
+class FollowedFile:
+    """Read position and rotation state for one followed path."""
+
+    def __init__(self, path, parser_name):
+        self.path = path
+        self.parser_name = parser_name
+        self.handle = None
+        self.inode = None
+        self.position = 0
+        self.pending = b""
+        self.fieldnames = None  # Sysmon CSV header
+
+    def _open(self):
+        try:
+            handle = open(self.path, "rb")
+        except OSError:
+            return False
+
+        self.close()
+        self.handle = handle
+        self.inode = os.fstat(handle.fileno()).st_ino
+        self.position = 0
+        self.pending = b""
+        self.fieldnames = None
+        return True
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+    def _read_lines(self):
+        """
+        Reads up to READ_CHUNK new bytes. Returns the complete lines in
+        them, or None at end of file.
+        """
+        data = self.handle.read(READ_CHUNK)
+        if not data:
+            return None
+
+        self.position += len(data)
+        chunks = (self.pending + data).split(b"\n")
+        self.pending = chunks.pop()
+
+        return [chunk.decode("utf-8", errors="replace") + "\n" for chunk in chunks]
+
+    def poll(self, compact=False):
+        """
+        Yields events parsed from newly appended lines, at most one
+        READ_CHUNK per call (plus the rest of a rotated-away file).
+        """
+        if self.handle is None and not self._open():
+            return
+
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # Rotated away and not recreated yet: keep reading the old handle
+            stat = None
+
+        if stat is not None and stat.st_ino != self.inode:
+            # Rotated: finish the old file with its own header, then switch
+            while True:
+                lines = self._read_lines()
+                if lines is None:
+                    break
+                yield from self.parse(lines, compact)
+
+            if self.pending:
+                yield from self.parse([self.pending.decode("utf-8", errors="replace")], compact)
+
+            self._open()
+
+        elif stat is not None and stat.st_size < self.position:
+            # Truncated in place: start over
+            self.handle.seek(0)
+            self.position = 0
+            self.pending = b""
+            self.fieldnames = None
+
+        lines = self._read_lines()
+        if lines:
+            yield from self.parse(lines, compact)
+
+    def parse(self, lines, compact=False):
+        """Turns new lines into events with the file's parser."""
+        if self.parser_name == "web":
+            return iter_web_lines(lines, compact)
+
+        # Sysmon CSV: the first line after (re)opening is the header
+        if self.fieldnames is None and lines:
+            self.fieldnames = parse_header(lines[0])
+            lines = lines[1:]
+
+        events = iter_sysmon_lines(lines, self.fieldnames or [], compact)
+
+        # A header line further down is in force for the next lines too
+        for line in reversed(lines):
+            if HEADER_MARKER in line:
+                row = parse_header(line)
+                if is_header_row(row):
+                    self.fieldnames = row
+                    break
+
+        return events
+
+
+def prepare(input_files, log_type, log=print):
+    """Creates a FollowedFile for every input whose format can be followed."""
+    followed = []
+
+    for file_path in input_files:
+        name = resolve_parser_name(file_path, log_type, log=log)
+        if name is None:
+            continue
+
+        if name not in FOLLOWABLE:
+            log(color_text(f"[!] {file_path}: {name} logs can't be followed; skipping.", Color.YELLOW))
+            continue
+
+        if compression_of(file_path) is not None:
+            log(color_text(f"[!] {file_path}: compressed files can't be followed; skipping.", Color.YELLOW))
+            continue
+
+        followed.append(FollowedFile(file_path, name))
+
+    return followed
+
+
+def describe(event):
+    """One-line alert text for a detected event."""
+    what = (
+        event.get("url")
+        or event.get("command_line")
+        or event.get("process_name")
+        or ""
+    )
+    tags = ", ".join(event.detections)
+    return f"[ALERT] {event.timestamp} {event.source} {event.get('src_ip') or '-'} {what} -> {tags}"
+
+
+def follow(followed, options, detector, reporter, interval=POLL_INTERVAL, should_stop=None):
+    """
+    Polls the followed files until interrupted (Ctrl+C / SIGTERM) or
+    should_stop() returns True, printing an alert line for every event
+    with detections. Returns the number of events processed.
+    """
+    total = 0
+    correlator = options.make_correlator()
+    previous_handler = signal.signal(signal.SIGTERM, _stop_on_signal)
+
+    try:
+        while should_stop is None or not should_stop():
+            busy = False
+            # Edited rule packs take effect between polls
+            detector.reload_rules()
+
+            for state in followed:
+                position = state.position
+
+                events = detector.stream(state.poll(options.compact))
+                if correlator is not None:
+                    events = correlator.stream(events)
+
+                for event in events:
+                    reporter.add_event(event)
+                    total += 1
+
+                    if event.detections:
+                        print(color_text(describe(event), Color.RED), flush=True)
+
+                busy = busy or state.position != position
+
+            if busy:
+                reporter.flush_sinks()
+
+            if not busy:
+                time.sleep(interval)
+
+    except KeyboardInterrupt:
+        print(color_text("\n[+] Follow mode stopped.", Color.BRIGHT_BLUE))
+
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        for state in followed:
+            state.close()
+
+    return total
+
+
+def _stop_on_signal(signum, frame):
+    raise KeyboardInterrupt
@@ -0,0 +1,416 @@
+"""
+Listen mode: receive syslog over the network and analyze it live.
+
+    python main.py --listen 5514
+    # rsyslog:  *.* @127.0.0.1:5514       (UDP)   or @@127.0.0.1:5514 (TCP)
+    # nginx:    access_log syslog:server=127.0.0.1:5514 combined;
+
+One asyncio loop serves UDP and TCP on the same port. Messages may use
+RFC 3164 or RFC 5424 headers (stripped before parsing) or no header at
+all; TCP streams may be newline-delimited or octet-counted (RFC 6587).
+A message carrying an <Event> XML document is a forwarded Windows event,
+anything else is treated as an access-log line.
+
+Received messages go into one bounded queue; a consumer takes them in
+batches of up to BATCH_SIZE and runs them through the usual parsers,
+Detector (and Correlator) into the Reporter. When the queue is full,
+TCP connections stop being read, which pushes back on the sender
+through TCP flow control. UDP can't push back, so datagrams arriving
+at a full queue are dropped and counted (ListenerStats.dropped).
+A TCP line that runs past MAX_FRAME bytes without a newline is dropped
+and counted too (ListenerStats.oversized), so no sender can make a
+connection buffer grow without bound.
+"""
+
+import asyncio
+import os
+import re
+import signal
+import socket
+import time
+
+from .parsers.web_parser import iter_web_lines
+from .parsers.wevt_parser import iter_wevt_messages
+from .follow import describe
+from .color import color_text, Color
+
+
+# Messages parsed per batch
+BATCH_SIZE = 128
+
+# Default queue bound (messages)
+QUEUE_SIZE = 10000
+
+# Kernel receive buffer asked for on the UDP socket
+UDP_RCVBUF = 4 * 1024 * 1024
+
+# Bytes read from a TCP connection at a time
+TCP_READ = 64 * 1024
+
+# Datagrams read per wakeup (asyncio's own datagram transport reads one)
+UDP_BURST = 256
+
+# Seconds between status lines in verbose mode
+STATUS_INTERVAL = 10.0
+
+# Octet-counted TCP frame: "<length> <PRI>..."; longer claims fall back to newlines
+OCTET_FRAME = re.compile(rb"(\d{1,7}) <")
+MAX_FRAME = 1024 * 1024
+
+# Longest incomplete frame a connection may hold: an octet-counted one
+# (length, space, MAX_FRAME bytes); a newline-framed line past it is dropped
+MAX_PENDING = MAX_FRAME + 8
+
+# RFC 3164 timestamp ("Jan  3 14:00:00 ") and TAG ("nginx: ", "sshd[42]: ")
+BSD_TIMESTAMP = re.compile(r"[A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d ")
+BSD_TAG = re.compile(r"[^\s:\[\]]{1,48}(?:\[[^\]\s]*\])?: ")
+
+
+def parse_address(text):
+    """'[host:]port' -> (host, port); the host defaults to all interfaces."""
+    host, _, port = text.rpartition(":")
+    return host.strip("[]") or "0.0.0.0", int(port)
+
+
+def syslog_message(line):
+    """Returns the MSG part of an RFC 3164 / 5424 syslog line (the line itself if it has no header)."""
+    if line[:1] != "<":
+        return line
+
+    close = line.find(">", 1, 5)
+    if close == -1 or not line[1:close].isdigit():
+        return line
+    rest = line[close + 1:]
+
+    # RFC 5424: VERSION TIMESTAMP HOSTNAME APP-NAME PROCID MSGID SD [MSG]
+    if rest[:1].isdigit() and rest[1:2] == " ":
+        fields = rest.split(" ", 6)
+        if len(fields) < 7:
+            return ""
+        return _skip_structured_data(fields[6])
+
+    # RFC 3164: TIMESTAMP HOSTNAME TAG MSG (all optional in practice)
+    if BSD_TIMESTAMP.match(rest):
+        rest = rest[16:]
+        host, space, after = rest.partition(" ")
+        if space and not host.endswith(":"):
+            rest = after
+
+    tag = BSD_TAG.match(rest)
+    return rest[tag.end():] if tag else rest
+
+
+def _skip_structured_data(text):
+    """'- msg' / '[id k="v"][...] msg' -> 'msg' (also drops a UTF-8 BOM)."""
+    if text[:1] == "-":
+        position = 1
+    else:
+        position = 0
+        while text[position:position + 1] == "[":
+            position += 1
+            quoted = False
+            while position < len(text):
+                char = text[position]
+                if char == "\\":
+                    position += 2
+                    continue
+                position += 1
+                if char == '"':
+                    quoted = not quoted
+                elif char == "]" and not quoted:
+                    break
+
+    message = text[position + 1:] if text[position:position + 1] == " " else text[position:]
+    return message[1:] if message[:1] == "\ufeff" else message
+
+
+def parse_batch(lines, compact=False):
+    """Yields the events of a batch of syslog lines, in arrival order."""
+    web = []
+
+    for line in lines:
+        message = syslog_message(line)
+        start = message.find("<Event")
+
+        if start == -1:
+            web.append(message)
+            continue
+
+        if web:
+            yield from iter_web_lines(web, compact)
+            web = []
+        yield from iter_wevt_messages([message[start:message.rfind(">") + 1]], compact)
+
+    if web:
+        yield from iter_web_lines(web, compact)
+
+
+class ListenerStats:
+    """Counters for one listen session."""
+
+    def __init__(self):
+        self.received = 0
+        self.dropped = 0
+        # TCP lines longer than MAX_FRAME, discarded up to their newline
+        self.oversized = 0
+        self.events = 0
+        self.connections = 0
+        # Datagrams the kernel discarded because its socket buffer was full
+        self.kernel_dropped = None
+
+    def summary(self):
+        text = f"{self.received} messages received, {self.dropped} dropped (queue full)"
+        if self.kernel_dropped:
+            text += f", {self.kernel_dropped} UDP datagrams dropped by the kernel"
+        if self.oversized:
+            text += f", {self.oversized} oversized TCP lines dropped"
+        return text + f", {self.events} events"
+
+
+class Listener:
+    def __init__(self, options, detector, reporter, queue_size=QUEUE_SIZE, verbose=False):
+        self.options = options
+        self.detector = detector
+        self.reporter = reporter
+        self.correlator = options.make_correlator()
+        self.queue_size = queue_size
+        self.verbose = verbose
+        self.stats = ListenerStats()
+        self.queue = None
+
+    # ------------------------------------------------------------
+    # Receiving
+    # ------------------------------------------------------------
+    def offer(self, line):
+        """Queues a message without waiting; drops it if the queue is full."""
+        self.stats.received += 1
+        try:
+            self.queue.put_nowait(line)
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+
+    def _read_datagrams(self, sock):
+        """Reads what the UDP socket has queued, up to UDP_BURST datagrams."""
+        for _ in range(UDP_BURST):
+            try:
+                data = sock.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+
+            # One message per datagram, though some senders batch lines
+            for line in data.decode("utf-8", errors="replace").splitlines():
+                if line:
+                    self.offer(line)
+
+    async def _handle_tcp(self, reader, writer):
+        self.stats.connections += 1
+        queue = self.queue
+        buffer = b""
+        # Inside an oversized line: skip to its newline
+        discarding = False
+
+        try:
+            while True:
+                data = await reader.read(TCP_READ)
+                if not data:
+                    break
+
+                if discarding:
+                    end = data.find(b"\n")
+                    if end == -1:
+                        continue
+                    data = data[end + 1:]
+                    discarding = False
+                buffer += data
+
+                lines, buffer = _split_frames(buffer)
+                if len(buffer) > MAX_PENDING:
+                    # No newline within MAX_FRAME bytes: drop the line, resync at the next one
+                    self.stats.oversized += 1
+                    buffer = b""
+                    discarding = True
+
+                for line in lines:
+                    self.stats.received += 1
+                    if queue.full():
+                        # Stop reading until the consumer catches up
+                        await queue.put(line)
+                    else:
+                        queue.put_nowait(line)
+
+            if buffer.strip():
+                self.stats.received += 1
+                await queue.put(buffer.decode("utf-8", errors="replace").rstrip("\r\n"))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # ------------------------------------------------------------
+    # Processing
+    # ------------------------------------------------------------
+    def process(self, batch):
+        events = self.detector.stream(parse_batch(batch, self.options.compact))
+        if self.correlator is not None:
+            events = self.correlator.stream(events)
+
+        reporter = self.reporter
+        count = 0
+        for event in events:
+            reporter.add_event(event)
+            count += 1
+            if event.detections:
+                print(color_text(describe(event), Color.RED), flush=True)
+
+        self.stats.events += count
+        reporter.flush_sinks()
+
+    def _take_batch(self, first):
+        queue = self.queue
+        batch = [first]
+        while len(batch) < BATCH_SIZE and not queue.empty():
+            batch.append(queue.get_nowait())
+        return batch
+
+    async def _consume(self):
+        while True:
+            batch = self._take_batch(await self.queue.get())
+            # Edited rule packs take effect between batches
+            self.detector.reload_rules()
+            self.process(batch)
+            # Let the sockets be read between batches
+            await asyncio.sleep(0)
+
+    async def _report_status(self):
+        stats = self.stats
+        previous = 0
+        while True:
+            await asyncio.sleep(STATUS_INTERVAL)
+            rate = (stats.received - previous) / STATUS_INTERVAL
+            previous = stats.received
+            print(color_text(f"  {stats.summary()}; {rate:,.0f} msg/s, queue {self.queue.qsize()}",
+                             Color.CYAN), flush=True)
+
+    # ------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------
+    async def serve(self, host, port, ready=None, stop=None):
+        """
+        Serves until stop (an asyncio.Event) is set or SIGINT / SIGTERM
+        arrives, then processes what is still queued. ready, if given, is
+        called with the bound (host, port) once both sockets listen.
+        """
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        stop = stop or asyncio.Event()
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        server = await asyncio.start_server(self._handle_tcp, host, port, reuse_address=True)
+        bound_port = server.sockets[0].getsockname()[1]
+
+        udp = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            udp.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RCVBUF)
+        except OSError:
+            pass
+        udp.bind((host, bound_port))
+        udp.setblocking(False)
+        loop.add_reader(udp.fileno(), self._read_datagrams, udp)
+
+        tasks = [asyncio.create_task(self._consume())]
+        if self.verbose:
+            tasks.append(asyncio.create_task(self._report_status()))
+
+        if ready is not None:
+            ready(host, bound_port)
+
+        try:
+            await stop.wait()
+        finally:
+            self.stats.kernel_dropped = _kernel_drops(udp)
+            server.close()
+            loop.remove_reader(udp.fileno())
+            udp.close()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.remove_signal_handler(signum)
+                except (NotImplementedError, RuntimeError):
+                    pass
+
+        # Whatever was accepted is still analyzed
+        while not self.queue.empty():
+            self.process(self._take_batch(self.queue.get_nowait()))
+
+        return self.stats
+
+
+def _split_frames(buffer):
+    """Splits complete TCP syslog frames off buffer; returns (lines, rest)."""
+    lines = []
+    position = 0
+    size = len(buffer)
+
+    while position < size:
+        octets = OCTET_FRAME.match(buffer, position)
+        if octets and int(octets.group(1)) <= MAX_FRAME:
+            start = octets.end() - 1
+            end = start + int(octets.group(1))
+            if end > size:
+                break
+            frame = buffer[start:end]
+            position = end
+        else:
+            end = buffer.find(b"\n", position)
+            if end == -1:
+                break
+            frame = buffer[position:end]
+            position = end + 1
+
+        frame = frame.rstrip(b"\r\n")
+        if frame:
+            lines.append(frame.decode("utf-8", errors="replace"))
+
+    return lines, buffer[position:]
+
+
+def _kernel_drops(sock):
+    """Drop counter of a UDP socket from /proc/net/udp (Linux only, else None)."""
+    try:
+        inode = str(os.fstat(sock.fileno()).st_ino)
+        for table in ("/proc/net/udp", "/proc/net/udp6"):
+            with open(table) as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 12 and fields[9] == inode:
+                        return int(fields[12])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def listen(address, options, detector, reporter, queue_size=QUEUE_SIZE, verbose=False):
+    """Runs a Listener on address ('[host:]port') until interrupted; returns its stats."""
+    host, port = parse_address(address)
+    listener = Listener(options, detector, reporter, queue_size, verbose)
+
+    def ready(host, port):
+        print(color_text(f"\n[+] Listening for syslog on {host}:{port} (UDP and TCP); press Ctrl+C to stop.",
+                         Color.BRIGHT_BLUE), flush=True)
+
+    started = time.perf_counter()
+    stats = asyncio.run(listener.serve(host, port, ready))
+
+    elapsed = time.perf_counter() - started
+    print(color_text(f"\n[+] Listener stopped: {stats.summary()} in {elapsed:.1f}s.", Color.BRIGHT_BLUE))
+    return stats
@@ -10,62 +10,33 @@ Steps:
 6. Generate report (console + json/csv)
 """
 
-from pathlib import Path
-from .cli import build_cli
-from .parsers import PARSERS
-from .detector import Detector
-from .reporter import Reporter
+import sys
+from time import perf_counter
+
+from .cli import build_cli, build_query_cli
+# choose_parser/read_file_lines live in pipeline.py; still importable from here
+from .pipeline import choose_parser, read_file_lines, process_file, run_parallel, PipelineOptions
+from .checkpoint import CheckpointStore, scan_inputs
+from .rulepacks import RulePackError
 from .color import color_text, Color
-
-
-# ------------------------------------------------------------
-# Helper: load the right parser
-# ------------------------------------------------------------
-def choose_parser(log_type, sample_line=None):
-    """
-    Selects the correct parser based on CLI choice or sample content.
-    """
-
-    if log_type != "auto":
-        return PARSERS.get(log_type)
-
-    # Auto-detect from content
-    if sample_line:
-        s = sample_line.lower()
-
-        if "sysmon" in s:
-            return PARSERS["sysmon"]
-
-        if "eventlog" in s or "<event" in s:
-            return PARSERS["windows"]
-
-        if "http" in s or "GET " in s or "POST " in s:
-            return PARSERS["web"]
-
-    return None
-
-
-# ------------------------------------------------------------
-# Helper: read file lines
-# ------------------------------------------------------------
-def read_file_lines(path: Path):
-    try:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.readlines()
-    except Exception as e:
-        print(color_text(f"[ERROR] Could not read file: {path} ({e})", Color.RED))
-        return []
+# follow, listener (asyncio) and query are imported only when their mode is used
 
 
 # ------------------------------------------------------------
 # Main execution
 # ------------------------------------------------------------
 def main():
+    # `query` subcommand: search a report.sqlite from an earlier run
+    if sys.argv[1:2] == ["query"]:
+        from . import query
+        query.run(build_query_cli(sys.argv[2:]))
+        return
+
     args = build_cli()
 
     # Validate input
-    if not args.file and not args.directory:
-        print(color_text("[ERROR] You must supply --file or --directory", Color.RED))
+    if not args.file and not args.directory and not args.listen:
+        print(color_text("[ERROR] You must supply --file, --directory or --listen", Color.RED))
         return
 
     # Gather all files into a list
@@ -75,42 +46,136 @@ def main():
         input_files.append(args.file)
 
     if args.directory:
-        for ext in ("*.log", "*.txt", "*.json", "*.csv", "*.xml"):
-            input_files.extend(args.directory.glob(ext))
+        for ext in ("*.log", "*.txt", "*.json", "*.csv", "*.xml", "*.gz", "*.bz2", "*.xz"):
+            input_files.extend(sorted(args.directory.glob(ext)))
 
-    if not input_files:
+    if not input_files and not args.listen:
         print(color_text("[ERROR] No log files found.", Color.RED))
         return
 
-    reporter = Reporter()
-    detector = Detector()
+    options = PipelineOptions.from_args(args)
+    reporter = options.make_reporter()
+
+    try:
+        detector = options.make_detector(reporter.profiler)
+    except RulePackError as e:
+        print(color_text(f"[ERROR] Could not load rule packs: {e}", Color.RED))
+        return
+
+    if detector.rule_packs is not None:
+        print(color_text(f"[+] Loaded {len(detector.rule_packs.rules)} rule(s) from rule packs", Color.BRIGHT_BLUE))
+
+    # Streaming sinks write while events are processed
+    args.output_path.mkdir(parents=True, exist_ok=True)
+    if options.sinks:
+        reporter.open_sinks(options.sinks)
+
+    if options.dedup is not None and (args.follow or args.listen):
+        # Windows would hold back alerts until they close
+        print(color_text("[!] --dedup applies to file analysis; ignored in --follow / --listen mode.", Color.YELLOW))
+
+    if options.batch and (options.dedup is not None or args.follow or args.listen):
+        print(color_text("[!] --batch applies to file analysis without --dedup; ignored here.", Color.YELLOW))
 
     # ------------------------------------------------------------
     # Process each file
     # ------------------------------------------------------------
-    for file_path in input_files:
+    if args.follow:
+        # Runs until Ctrl+C; events are never retained in this mode
+        reporter.keep_events = False
+        from . import follow
+        followed = follow.prepare(input_files, args.type)
+
+        if not followed:
+            print(color_text("[ERROR] None of the inputs can be followed.", Color.RED))
+            return
+
+        print(color_text(f"\n[+] Following {len(followed)} file(s); press Ctrl+C to stop.", Color.BRIGHT_BLUE))
+        count = follow.follow(followed, options, detector, reporter)
+
+        if args.verbose:
+            print(color_text(f"  Processed {count} events", Color.CYAN))
+
+    elif args.listen:
+        # Runs until Ctrl+C, like follow mode
+        reporter.keep_events = False
+        from . import listener
+        try:
+            listener.listen(args.listen, options, detector, reporter, args.listen_queue, args.verbose)
+        except (OSError, ValueError) as e:
+            print(color_text(f"[ERROR] Can't listen on {args.listen}: {e}", Color.RED))
+            return
+
+    elif args.checkpoint:
+        # Only new files and new tails of appended files are parsed
+        store = CheckpointStore(args.checkpoint)
+
+        for file_path, messages, count, partial in scan_inputs(input_files, options, store, detector, args.workers):
+            print(color_text(f"\n[+] Processing {file_path}", Color.BRIGHT_BLUE))
+            for message in messages:
+                print(message)
+
+            if count is None:
+                continue
+
+            if args.verbose:
+                print(color_text(f"  Parsed {count} events", Color.CYAN))
+
+            reporter.merge(partial)
+
+        store.forget_missing(input_files)
+        store.save()
 
-        print(color_text(f"\n[+] Processing {file_path}", Color.BRIGHT_BLUE))
+        if args.output != "json":
+            print(color_text("[!] With --checkpoint, event outputs (CSV, JSONL, SQLite) only contain events "
+                             "read in this run; the summary covers all checkpointed data.", Color.YELLOW))
 
-        lines = read_file_lines(file_path)
-        if not lines:
-            continue
+    elif args.workers != 1:
+        # Workers fill partial reporters; merge them back in input order
+        results = run_parallel(input_files, options, args.workers)
 
-        # Choose parser (explicit or auto)
-        parser_func = choose_parser(args.type, sample_line=lines[0])
+        for file_path, count, messages, partial in results:
+            print(color_text(f"\n[+] Processing {file_path}", Color.BRIGHT_BLUE))
+            for message in messages:
+                print(message)
 
-        if parser_func is None:
-            print(color_text("[!] Unknown log type; skipping file.", Color.YELLOW))
-            continue
+            if count is None:
+                continue
 
-        # Directly call the parsing function
-        events = parser_func(file_path)
+            if args.verbose:
+                print(color_text(f"  Parsed {count} events", Color.CYAN))
+
+            reporter.merge(partial)
+    else:
+        for file_path in input_files:
+
+            print(color_text(f"\n[+] Processing {file_path}", Color.BRIGHT_BLUE))
+
+            count = process_file(file_path, options, detector, reporter)
+            if count is None:
+                continue
+
+            if args.verbose:
+                print(color_text(f"  Parsed {count} events", Color.CYAN))
 
         if args.verbose:
-            print(color_text(f"  Parsed {len(events)} events", Color.CYAN))
+            for name, stats in detector.cache_stats().items():
+                if stats["hits"] or stats["misses"]:
+                    print(color_text(
+                        f"  Rule cache {name}: {stats['hits']} hits, {stats['misses']} misses "
+                        f"({stats['size']}/{stats['maxsize']} entries)", Color.CYAN))
+
+    if reporter.collapsed:
+        print(color_text(f"\n[+] Deduplication collapsed {reporter.collapsed} repeated record(s).", Color.BRIGHT_BLUE))
 
-        events = detector.run(events)
-        reporter.add_events(events)
+    # Rare external IPs are only known now that everything was counted
+    reporter.settle_rarity()
+
+    # Source IP counts behind rarity (counted live in follow / listen mode)
+    sources = detector.counts if detector.counts is not None else reporter.sources
+    if args.verbose and sources is not None:
+        for ip, count in sources.most_common(5):
+            print(color_text(f"  Frequent external source: {ip} (~{count} events)", Color.CYAN))
 
     # ------------------------------------------------------------
     # Output summary to console
@@ -121,18 +186,38 @@ def main():
         # Simple non-colorized output
         for key, data in reporter.summarize_events().items():
             print(f"{key}: {data}")
+        for name, data in reporter.top_values().items():
+            print(f"top {name}: {data}")
 
     # ------------------------------------------------------------
     # Export reports
     # ------------------------------------------------------------
-    args.output_path.mkdir(parents=True, exist_ok=True)
+    start = perf_counter()
+
+    for path in reporter.close_sinks():
+        print(color_text(f"[+] Streaming report saved to {path}", Color.GREEN))
 
-    if args.output in ("json", "both"):
+    if args.output in ("json", "both", "all"):
         reporter.export_json(args.output_path / "report.json")
+        reporter.export_top(args.output_path / "top.json")
 
-    if args.output in ("csv", "both"):
+    if args.output in ("csv", "both", "all") and not options.sinks.csv:
         reporter.export_csv(args.output_path / "report.csv")
 
+    # ------------------------------------------------------------
+    # Profile (--profile)
+    # ------------------------------------------------------------
+    if reporter.profiler is not None:
+        reporter.profiler.add("export", perf_counter() - start)
+        reporter.profiler.print_table()
+
+        # Worker processes keep their own caches; only report the ones used here
+        cache_stats = {
+            name: stats for name, stats in detector.cache_stats().items()
+            if stats["hits"] or stats["misses"]
+        }
+        reporter.export_stats(args.output_path / "stats.json", cache_stats)
+
 
 # ------------------------------------------------------------
 
@@ -1,9 +1,94 @@
-from .sysmon_parser import parse_sysmon_csv
-from .web_parser import parse_web_logs
-from .wevt_parser import parse_wevt_xml
-
-PARSERS = {
-    "sysmon": parse_sysmon_csv,
-    "web": parse_web_logs,
-    "windows": parse_wevt_xml,
+"""
+Parser registry.
+
+Parser modules are imported the first time one of their entries is
+looked up, i.e. when a run first meets their format, so starting the
+tool (or analyzing only web logs) doesn't pay for the CSV and XML
+machinery. The registries below are read-only mappings.
+"""
+
+import importlib
+from collections.abc import Mapping
+
+
+class LazyRegistry(Mapping):
+    """key -> attribute of a parser module, imported on first lookup."""
+
+    def __init__(self, entries):
+        # key -> (module name, attribute)
+        self.entries = entries
+        self.loaded = {}
+
+    def __getitem__(self, key):
+        try:
+            return self.loaded[key]
+        except KeyError:
+            pass
+
+        module, attribute = self.entries[key]
+        value = self.loaded[key] = getattr(importlib.import_module(f".{module}", __name__), attribute)
+        return value
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+PARSERS = LazyRegistry({
+    "sysmon": ("sysmon_parser", "parse_sysmon_csv"),
+    "web": ("web_parser", "parse_web_logs"),
+    "windows": ("wevt_parser", "parse_wevt_xml"),
+})
+
+# Generator versions of the parsers above, used by the streaming pipeline.
+STREAMING_PARSERS = LazyRegistry({
+    "sysmon": ("sysmon_parser", "iter_sysmon_csv"),
+    "web": ("web_parser", "iter_web_logs"),
+    "windows": ("wevt_parser", "iter_wevt_xml"),
+})
+
+# Column-batch versions (--batch); formats without one use the streaming parser
+BATCH_PARSERS = LazyRegistry({
+    "sysmon": ("sysmon_parser", "iter_sysmon_batches"),
+    "web": ("web_parser", "iter_web_batches"),
+})
+
+# file_path, start=0, end=None -> whether a line past the header names the
+# columns again; byte ranges of such files can't be parsed on their own
+SECTION_SCANS = LazyRegistry({
+    "sysmon": ("sysmon_parser", "has_sections"),
+})
+
+# file_path, start, end -> whether that byte range can be parsed on its
+# own; formats listed here are only split if every range passes
+RANGE_CHECKS = LazyRegistry({
+    "sysmon": ("sysmon_parser", "is_self_contained"),
+})
+
+# Normalized fields produced for each Event.source value
+SOURCE_FIELDS = LazyRegistry({
+    "sysmon": ("sysmon_parser", "FIELDS"),
+    "web": ("web_parser", "FIELDS"),
+    "windows_event": ("wevt_parser", "FIELDS"),
+})
+
+# Parser functions that used to be imported here eagerly
+_FUNCTIONS = {
+    "parse_sysmon_csv": ("sysmon_parser", "parse_sysmon_csv"),
+    "iter_sysmon_csv": ("sysmon_parser", "iter_sysmon_csv"),
+    "parse_web_logs": ("web_parser", "parse_web_logs"),
+    "iter_web_logs": ("web_parser", "iter_web_logs"),
+    "parse_wevt_xml": ("wevt_parser", "parse_wevt_xml"),
+    "iter_wevt_xml": ("wevt_parser", "iter_wevt_xml"),
 }
+
+
+def __getattr__(name):
+    if name in _FUNCTIONS:
+        module, attribute = _FUNCTIONS[name]
+        return getattr(importlib.import_module(f".{module}", __name__), attribute)
+    if name in ("sysmon_parser", "web_parser", "wevt_parser"):
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,232 @@
+"""
+Transparent streaming decompression of gzip, bzip2 and xz inputs.
+
+Compression is recognised from a file's first bytes, not its name, so
+rotated logs like access.log.2.gz (or compressed files without a
+suffix) work the same. iter_stream_lines() decompresses a file block by
+block and yields its lines, close to the decompressor's own speed;
+open_binary() / open_text() give a file object for the readers that
+need one (content sniffing, CSV headers, XML). Nothing is ever
+decompressed to disk.
+
+A gzip file can consist of several members (concatenated .gz files,
+bgzip output, ...), each decompressible on its own. member_ranges()
+cuts such a file at member starts so workers can take a range each.
+Ranges are in compressed bytes, and members don't have to end on a line
+boundary: a range skips the partial line it starts with and reads on
+into the next member to finish its own last line, so every line is
+read by exactly one range.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+
+# Buffer of the file objects returned by open_binary()
+READ_BUFFER = 1024 * 1024
+
+# Compressed bytes fed to the decompressor at a time. Logs compress
+# 5-20x, so output chunks stay around a megabyte
+INFLATE_BLOCK = 64 * 1024
+
+# Leading bytes of each supported format
+MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+}
+
+OPENERS = {
+    "gzip": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+
+# One decompressor per member / stream
+DECOMPRESSORS = {
+    "gzip": lambda: zlib.decompressobj(31),
+    "bz2": bz2.BZ2Decompressor,
+    "xz": lzma.LZMADecompressor,
+}
+
+# gzip member header: magic + deflate method
+GZIP_HEADER = b"\x1f\x8b\x08"
+
+# Compressed bytes inflated to confirm a header candidate is a real member
+MEMBER_PROBE = 64 * 1024
+
+
+def magic_compression(head: bytes) -> Optional[str]:
+    """Compression format for a file's leading bytes (see compression_of)."""
+    for kind, magic in MAGIC.items():
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def compression_of(file_path) -> Optional[str]:
+    """"gzip", "bz2", "xz" or None for an uncompressed file."""
+    with open(file_path, "rb") as f:
+        return magic_compression(f.read(6))
+
+
+def open_binary(file_path):
+    """Opens a file for reading bytes, decompressing it on the fly if needed."""
+    kind = compression_of(file_path)
+    if kind is None:
+        return open(file_path, "rb", buffering=READ_BUFFER)
+    return io.BufferedReader(OPENERS[kind](file_path, "rb"), buffer_size=READ_BUFFER)
+
+
+def open_text(file_path, encoding: str = "utf-8", errors: str = "replace"):
+    """Text-mode counterpart of open_binary()."""
+    if compression_of(file_path) is None:
+        return open(file_path, "r", encoding=encoding, errors=errors)
+    return io.TextIOWrapper(open_binary(file_path), encoding=encoding, errors=errors)
+
+
+# ------------------------------------------------------------
+# Multi-member gzip
+# ------------------------------------------------------------
+def _is_member_start(f, offset) -> bool:
+    """Whether a gzip member really starts at offset (inflates cleanly for a while)."""
+    f.seek(offset)
+    data = f.read(MEMBER_PROBE)
+
+    # FLG reserved bits must be clear
+    if len(data) < 10 or data[3] & 0xE0:
+        return False
+
+    try:
+        zlib.decompressobj(31).decompress(data, MEMBER_PROBE)
+    except zlib.error:
+        return False
+    return True
+
+
+def _next_member(f, offset, end) -> Optional[int]:
+    """Offset of the first member start in [offset, end), or None."""
+    while offset < end:
+        f.seek(offset)
+        data = f.read(min(READ_BUFFER, end - offset) + len(GZIP_HEADER) - 1)
+
+        found = data.find(GZIP_HEADER)
+        while found != -1 and offset + found < end:
+            if _is_member_start(f, offset + found):
+                return offset + found
+            found = data.find(GZIP_HEADER, found + 1)
+
+        offset += READ_BUFFER
+    return None
+
+
+def member_ranges(file_path, shards: int, start: int = 0,
+                  end: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Splits a gzip file into at most `shards` ranges that begin at member
+    starts. A single-member file comes back as one range.
+    """
+    size = os.path.getsize(file_path) if end is None else end
+    if shards <= 1 or size <= start:
+        return [(start, size)]
+
+    step = (size - start) // shards
+    bounds = [start]
+
+    with open(file_path, "rb") as f:
+        for i in range(1, shards):
+            cut = _next_member(f, max(start + i * step, bounds[-1] + 1), size)
+            if cut is None:
+                break
+            if cut > bounds[-1]:
+                bounds.append(cut)
+
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+
+def _decompress(f, kind, offset) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yields (offset of the member, decompressed bytes) from the member
+    (or stream) at offset to the end of the file.
+    """
+    magic = MAGIC[kind]
+    f.seek(offset)
+    member = offset
+    decompressor = None
+
+    while True:
+        data = f.read(INFLATE_BLOCK)
+        if not data:
+            break
+        offset += len(data)
+
+        while data:
+            if decompressor is None:
+                # Trailing zero padding (or garbage) ends the file, as in gzip
+                if not magic.startswith(data[:len(magic)]):
+                    return
+                member = offset - len(data)
+                decompressor = DECOMPRESSORS[kind]()
+
+            output = decompressor.decompress(data)
+            if output:
+                yield member, output
+            if not decompressor.eof:
+                break
+
+            # The member ended; whatever is left starts the next one
+            data = decompressor.unused_data
+            decompressor = None
+
+    if decompressor is not None:
+        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+
+def iter_stream_lines(file_path, kind: str, start: int = 0, end: Optional[int] = None,
+                      encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Yields the decoded lines of a compressed file, or with start/end
+    only those of the members starting in [start, end) (see the module
+    docstring).
+    """
+    if end is None:
+        end = os.path.getsize(file_path)
+
+    pending = b""
+    skipping = start > 0
+
+    with open(file_path, "rb") as f:
+        for member, data in _decompress(f, kind, start):
+            if member >= end:
+                if skipping:
+                    return
+                # Finish the last line in the next range's first member
+                cut = data.find(b"\n")
+                if cut == -1:
+                    pending += data
+                    continue
+                yield (pending + data[:cut + 1]).decode(encoding, errors="replace")
+                return
+
+            if skipping:
+                cut = data.find(b"\n")
+                if cut == -1:
+                    continue
+                data = data[cut + 1:]
+                skipping = False
+
+            data = pending + data
+            cut = data.rfind(b"\n") + 1
+            pending = data[cut:]
+
+            for line in io.BytesIO(data[:cut]):
+                yield line.decode(encoding, errors="replace")
+
+    if pending and not skipping:
+        yield pending.decode(encoding, errors="replace")
@@ -0,0 +1,129 @@
+"""
+Byte-range helpers for line-oriented log files.
+
+A large file can be cut into ranges whose boundaries sit right after a
+newline, so every line belongs to exactly one range. Each range can then
+be parsed independently (e.g. in a separate worker) and the results
+merged in range order.
+
+Compressed inputs are read through compression.py. Byte ranges of a
+gzip file are offsets of its members instead (see member_ranges());
+other compressed files are always read whole.
+"""
+
+import os
+from typing import Iterator, List, Optional, Tuple
+
+from .compression import compression_of, open_binary, member_ranges, iter_stream_lines
+
+
+READ_BUFFER = 1024 * 1024
+
+
+def iter_lines(file_path, start: int = 0, end: Optional[int] = None,
+               encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Yields decoded lines whose first byte lies in [start, end).
+    start must be a line boundary (0 or right after a newline).
+    Compressed files are decompressed on the fly; for them start/end are
+    member offsets (see compression.iter_stream_lines()).
+    """
+    kind = compression_of(file_path)
+    if kind is not None:
+        yield from iter_stream_lines(file_path, kind, start, end, encoding)
+        return
+
+    with open(file_path, "rb", buffering=READ_BUFFER) as f:
+        if start:
+            f.seek(start)
+
+        if end is None:
+            for line in f:
+                yield line.decode(encoding, errors="replace")
+            return
+
+        pos = start
+        for line in f:
+            if pos >= end:
+                break
+            pos += len(line)
+            yield line.decode(encoding, errors="replace")
+
+
+def align_to_line(f, offset: int) -> int:
+    """Returns the first line boundary at or after offset."""
+    if offset <= 0:
+        return 0
+
+    f.seek(offset - 1)
+    f.readline()
+    return f.tell()
+
+
+def split_ranges(file_path, shards: int, start: int = 0,
+                 end: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Splits [start, end) (end defaults to EOF) into at most `shards`
+    newline-aligned byte ranges. Empty ranges are dropped, so fewer may
+    be returned.
+    """
+    kind = compression_of(file_path)
+    if kind == "gzip":
+        return member_ranges(file_path, shards, start, end)
+
+    size = os.path.getsize(file_path) if end is None else end
+    if shards <= 1 or size <= start or kind is not None:
+        return [(start, size)]
+
+    step = (size - start) // shards
+    bounds = [start]
+
+    with open(file_path, "rb") as f:
+        for i in range(1, shards):
+            cut = align_to_line(f, start + i * step)
+            if bounds[-1] < cut < size:
+                bounds.append(cut)
+
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+
+def last_line_end(file_path, size: int) -> int:
+    """Offset just past the last newline in the first `size` bytes (0 if none)."""
+    block = 64 * 1024
+    with open(file_path, "rb") as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            data = f.read(pos - start)
+            cut = data.rfind(b"\n")
+            if cut != -1:
+                return start + cut + 1
+            pos = start
+    return 0
+
+
+def read_header(file_path, encoding: str = "utf-8") -> Tuple[str, int]:
+    """
+    Returns the first line (e.g. a CSV header) and the offset just past
+    it (in decompressed bytes for compressed files).
+    """
+    with open_binary(file_path) as f:
+        line = f.readline()
+        return line.decode(encoding, errors="replace"), f.tell()
+
+
+def has_multiline_fields(file_path, probe_bytes: int = 64 * 1024) -> bool:
+    """
+    Heuristic for CSV: a line with an odd number of quotes means a quoted
+    field spans lines, so the file cannot safely be cut at newlines.
+    """
+    with open_binary(file_path) as f:
+        head = f.read(probe_bytes)
+
+    lines = head.split(b"\n")
+    if len(lines) > 1:
+        lines = lines[:-1]  # last one is probably cut off
+
+    return any(line.count(b'"') % 2 for line in lines)
@@ -0,0 +1,126 @@
+"""
+Content sniffing: which parser a file needs, from its first few KB.
+
+Only a bounded prefix (SNIFF_BYTES) is read, decompressed first if the
+file is gzip/bzip2/xz, and recognised by shape:
+- XML whose root (after any declaration / comments) is <Events> or
+  <Event> -> "windows"
+- a CSV header naming Sysmon columns (UtcTime, EventID, Image, ...)
+  -> "sysmon"
+- a Common / Combined Log Format first line -> "web"
+Only if none of these shapes fits do looser keywords on the first line
+decide ("sysmon", "<event" / "eventlog", "http" / "get " / "post ").
+UTF-16 exports (as saved by Event Viewer) are recognised by their BOM.
+
+Verdicts are cached by file identity and version (device, inode, size,
+mtime), so the several places that need a file's parser during one run
+(planning, counting, parsing) sniff it only once.
+"""
+
+import codecs
+import os
+import re
+from typing import Optional
+
+from .compression import magic_compression, open_binary
+
+
+# Bytes of (decompressed) content looked at
+SNIFF_BYTES = 4096
+
+# Verdicts kept before the cache is reset
+VERDICT_CACHE = 65536
+
+# Verdict for an empty file (nothing to parse, nothing to report)
+EMPTY = "empty"
+
+# Columns of Sysmon CSV exports; a header needs two of them
+SYSMON_COLUMNS = frozenset((
+    "utctime", "eventtime", "eventid", "image", "commandline", "parentimage",
+    "parentcommandline", "processguid", "processid", "sourceip", "destinationip",
+))
+
+# host ident authuser [timestamp] "request
+CLF_LINE = re.compile(r'\S+ \S+ \S+ \[[^\]]+\] "')
+
+# Root element name, after an optional declaration, comments and doctype
+XML_ROOT = re.compile(r'(?:\s+|<\?[^>]*\?>|<!--.*?-->|<!DOCTYPE[^>]*>)*<([\w:.-]+)', re.S)
+
+# (device, inode, size, mtime_ns) -> verdict
+_verdicts = {}
+
+
+def _decode(head: bytes) -> str:
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        # A cut-off last code unit is dropped by errors="ignore"
+        return head.decode("utf-16", errors="ignore")
+    return head.decode("utf-8", errors="ignore").lstrip("\ufeff")
+
+
+def sniff_text(text: str) -> Optional[str]:
+    """Parser name for a piece of leading content, or None if unrecognised."""
+    stripped = text.lstrip()
+    if not stripped:
+        return None
+
+    if stripped[0] == "<":
+        root = XML_ROOT.match(stripped)
+        if root and root.group(1).rsplit(":", 1)[-1] in ("Events", "Event"):
+            return "windows"
+
+    first_line = stripped.split("\n", 1)[0]
+
+    columns = {column.strip().strip('"').lower() for column in first_line.split(",")}
+    if len(columns & SYSMON_COLUMNS) >= 2:
+        return "sysmon"
+
+    if CLF_LINE.match(first_line):
+        return "web"
+
+    # Looser signs, as before content sniffing; only the first line, so a
+    # request for e.g. /tools/Sysmon64.exe further down can't decide it
+    lower = first_line.lower()
+    if "sysmon" in lower:
+        return "sysmon"
+
+    if "<event" in lower or "eventlog" in lower:
+        return "windows"
+
+    if "http" in lower or "get " in lower or "post " in lower:
+        return "web"
+
+    return None
+
+
+def read_prefix(file_path, size: int = SNIFF_BYTES) -> bytes:
+    """The first size bytes of a file's content (decompressed if needed)."""
+    with open(file_path, "rb", buffering=0) as f:
+        head = f.read(size)
+
+    if magic_compression(head) is None:
+        return head
+
+    with open_binary(file_path) as f:
+        return f.read(size)
+
+
+def sniff_file(file_path) -> Optional[str]:
+    """
+    Parser name for a file, EMPTY for an empty one, None if the content
+    isn't recognised. Raises OSError if the file can't be read.
+    """
+    stat = os.stat(file_path)
+    key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    try:
+        return _verdicts[key]
+    except KeyError:
+        pass
+
+    head = read_prefix(file_path) if stat.st_size else b""
+    verdict = sniff_text(_decode(head)) if head else EMPTY
+
+    if len(_verdicts) >= VERDICT_CACHE:
+        _verdicts.clear()
+    _verdicts[key] = verdict
+    return verdict
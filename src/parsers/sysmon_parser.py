@@ -1,44 +1,381 @@
 """
-Parses a Sysmon CSV file and returns a list of Event objects.
+Parses a Sysmon CSV file into Event objects.
+
+iter_sysmon_csv() yields events one row at a time so large exports can
+be streamed; parse_sysmon_csv() returns them all as a list.
+iter_sysmon_lines() parses data lines that arrive separately from their
+header (e.g. follow mode). iter_sysmon_batches() yields ColumnBatch
+objects instead (--batch).
+
+Rows are read with csv.reader: the columns normalization needs are
+located once per header (Layout) and picked out of each row by
+position, and the row list itself is kept as the raw values next to
+the shared header tuple. Rows with more or fewer cells than the header
+are read as csv.DictReader would. A row naming the columns again (see
+HEADER_MARKER) starts a new section with its own header, as in exports
+of several event types concatenated into one file; has_sections()
+tells whether a file has any, and is_self_contained() whether a byte
+range can be parsed on its own (no sections, no quoted field spanning
+lines).
 """
 
 import csv
-from typing import List
-from ..event import Event
+from functools import lru_cache
+from itertools import compress, count, islice, repeat
+from operator import contains, itemgetter
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from ..event import BATCH_ROWS, ColumnBatch, Event, EventSchema
+from ..timestamps import parse_iso
+from .ranges import READ_BUFFER, iter_lines, read_header
+from .compression import compression_of
+
+
+# Normalized keys every Sysmon event carries
+FIELDS = (
+    "event_id", "process_name", "process_path", "command_line", "parent_process",
+    "parent_command_line", "user", "src_ip", "dest_ip",
+)
+
+SCHEMA = EventSchema(
+    "sysmon", FIELDS,
+    interned=("event_id", "process_name", "process_path", "parent_process",
+              "parent_command_line", "user", "dest_ip"),
+    raw_interned=("EventID", "Image", "ParentImage", "ParentCommandLine", "User", "DestinationIp"),
+    clock=parse_iso,
+)
+
+# Source columns read per row, in the order Layout.project returns them
+PROJECTED = (
+    "UtcTime", "EventTime", "EventID", "Image", "CommandLine", "ParentImage",
+    "ParentCommandLine", "User", "SourceIp", "DestinationIp",
+)
+
+# A cell naming this column marks a header row, also mid-file (exports
+# of several event types concatenated, each with its own columns)
+HEADER_MARKER = "EventID"
+
+
+def iter_sysmon_csv(file_path: str, start: int = 0, end: Optional[int] = None,
+                    compact: bool = False) -> Iterator[Event]:
+    """
+    Yields one Event per CSV row. start/end restrict parsing to a
+    newline-aligned byte range; the header is always read from the top.
+    compact=True yields CompactEvent objects instead.
+    """
+    header_line, body_start = read_header(file_path)
+    lines = _body_lines(file_path, start, end, body_start)
+    return iter_sysmon_lines(lines, parse_header(header_line), compact)
+
+
+def iter_sysmon_batches(file_path: str, start: int = 0, end: Optional[int] = None,
+                        size: int = BATCH_ROWS) -> Iterator[ColumnBatch]:
+    """iter_sysmon_csv() as column batches of up to `size` rows."""
+    header_line, body_start = read_header(file_path)
+    lines = _body_lines(file_path, start, end, body_start)
+    return iter_sysmon_line_batches(lines, parse_header(header_line), size)
+
+
+def _body_lines(file_path, start, end, body_start):
+    if compression_of(file_path) is None:
+        return iter_lines(file_path, max(start, body_start), end)
+
+    # Offsets of compressed files are in compressed bytes (gzip
+    # members); the header is just the first line of the stream
+    lines = iter_lines(file_path, start, end)
+    if not start:
+        lines = islice(lines, 1, None)
+    return lines
+
+
+def parse_header(header_line: str) -> List[str]:
+    return next(csv.reader([header_line]), [])
+
+
+def is_header_row(row: Sequence[str]) -> bool:
+    """Whether a CSV row names the columns again (a new section of a concatenated export)."""
+    return HEADER_MARKER in row
+
+
+class Layout:
+    """Column positions of one header, resolved once for all its rows."""
+
+    __slots__ = ("keys", "width", "index", "positional", "padded", "project")
+
+    def __init__(self, fieldnames: Sequence[str]):
+        self.keys = tuple(fieldnames)
+        self.width = len(self.keys)
+
+        # Column of each name (the last one if a name repeats, as DictReader reads it)
+        self.index = {name: i for i, name in enumerate(self.keys)}
+
+        # Rows can be read by position unless a name repeats
+        self.positional = len(self.index) == self.width
+
+        # Columns this header lacks read a None appended past its last one
+        positions = [self.index.get(name, self.width) for name in PROJECTED]
+        self.padded = self.width in positions
+        self.project = itemgetter(*positions)
+
+
+@lru_cache(maxsize=64)
+def layout_for(fieldnames: Tuple[str, ...]) -> Layout:
+    return Layout(fieldnames)
+
+
+def iter_sysmon_lines(lines: Iterable[str], fieldnames: Sequence[str],
+                      compact: bool = False) -> Iterator[Event]:
+    """
+    Yields one Event per CSV data row, using the given header columns
+    until a row names the columns again.
+    """
+    layout = layout_for(tuple(fieldnames))
+    make = SCHEMA.make
+
+    for row in csv.reader(lines):
+        if not row:
+            # DictReader skips blank lines
+            continue
+
+        if is_header_row(row):
+            layout = layout_for(tuple(row))
+
+        elif len(row) == layout.width and layout.positional:
+            timestamp, values = _project(layout, row)
+            yield make(timestamp, values, layout.keys, row, compact)
+
+        else:
+            # Rows with missing/extra columns keep their own key layout
+            mapped = _dict_row(layout.keys, row)
+            timestamp, values = _normalize(mapped)
+            keys = layout.keys if layout.positional and len(mapped) == layout.width else tuple(mapped)
+            yield make(timestamp, values, keys, mapped.values(), compact)
+
+
+def _project(layout, row):
+    """(timestamp, values in FIELDS order) of a row with exactly the layout's columns."""
+    if layout.padded:
+        row.append(None)
+        projected = layout.project(row)
+        row.pop()
+    else:
+        projected = layout.project(row)
+
+    utc_time, event_time, event_id, image, command, parent, parent_command, user, src_ip, dest_ip = projected
+    image = image or ""
+
+    return utc_time or event_time or "N/A", (
+        event_id,
+        image,
+        image,
+        command or "",
+        parent or "",
+        parent_command or "",
+        user or "",
+        src_ip or "",
+        dest_ip or "",
+    )
+
+
+def _dict_row(keys, values):
+    """What csv.DictReader makes of a row (restkey / restval None)."""
+    row = dict(zip(keys, values))
+    width = len(keys)
+
+    if len(values) > width:
+        row[None] = values[width:]
+    elif len(values) < width:
+        for key in keys[len(values):]:
+            row[key] = None
+    return row
+
+
+def _normalize(row):
+    """(timestamp, values in FIELDS order) of a DictReader-style row."""
+    timestamp = row.get("UtcTime") or row.get("EventTime") or "N/A"
+
+    image = row.get("Image") or ""
+
+    return timestamp, (
+        row.get("EventID"),
+        image,
+        image,
+        row.get("CommandLine") or "",
+        row.get("ParentImage") or "",
+        row.get("ParentCommandLine") or "",
+        row.get("User") or "",
+        row.get("SourceIp") or "",
+        row.get("DestinationIp") or "",
+    )
+
+
+def iter_sysmon_line_batches(lines: Iterable[str], fieldnames: Sequence[str],
+                             size: int = BATCH_ROWS) -> Iterator[ColumnBatch]:
+    reader = csv.reader(lines)
+    layout = layout_for(tuple(fieldnames))
+
+    while True:
+        chunk = list(islice(reader, size))
+        if not chunk:
+            return
+
+        # DictReader skips blank lines
+        rows = list(filter(None, chunk))
+
+        # A row naming the columns again ends the batch's current section
+        begin = 0
+        for header in compress(count(), map(contains, rows, repeat(HEADER_MARKER))):
+            if header > begin:
+                yield _batch(rows[begin:header], layout)
+            layout = layout_for(tuple(rows[header]))
+            begin = header + 1
+
+        if begin < len(rows):
+            yield _batch(rows[begin:] if begin else rows, layout)
+
+
+def _batch(rows, layout):
+    width = layout.width
+    if layout.positional and all(len(row) == width for row in rows):
+        return _column_batch(rows, layout)
+    return _row_batch(rows, layout)
+
+
+def _column_batch(rows, layout):
+    """Batch of rows that all have exactly the header's columns, read by column."""
+    length = len(rows)
+    columns = list(zip(*rows))
+    index = layout.index
+
+    def column(name, missing):
+        i = index.get(name)
+        return columns[i] if i is not None else [missing] * length
+
+    utc_time = column("UtcTime", None)
+    if all(utc_time):
+        timestamps = utc_time
+    else:
+        timestamps = [utc or other or "N/A" for utc, other in zip(utc_time, column("EventTime", None))]
+
+    image = column("Image", "")
+
+    # Same order as FIELDS
+    normalized = (
+        column("EventID", None),
+        image,
+        image,
+        column("CommandLine", ""),
+        column("ParentImage", ""),
+        column("ParentCommandLine", ""),
+        column("User", ""),
+        column("SourceIp", ""),
+        column("DestinationIp", ""),
+    )
+
+    return ColumnBatch(SCHEMA, timestamps, normalized, [layout.keys] * length, rows)
+
+
+def _row_batch(rows, layout):
+    """Batch of rows read one by one with DictReader's rules for missing/extra columns."""
+    raw_keys = layout.keys
+    # With a repeated name a row's keys are never the header's (a long
+    # row's None restkey can make up for the one missing)
+    positional = layout.positional
+    timestamps, normalized, keys, values = [], [], [], []
+
+    for values_read in rows:
+        row = _dict_row(raw_keys, values_read)
+        timestamp, fields = _normalize(row)
+        timestamps.append(timestamp)
+        normalized.append(fields)
+        keys.append(raw_keys if positional and len(row) == len(raw_keys) else tuple(row))
+        values.append(tuple(row.values()))
+
+    return ColumnBatch(SCHEMA, timestamps, list(zip(*normalized)), keys, values)
+
+
+def has_sections(file_path, start: int = 0, end: Optional[int] = None) -> bool:
+    """
+    Whether a line in [start, end) past the header names the columns
+    again. Only such files need reading from the top: elsewhere the
+    first line's header is in force. Lines are only parsed where the
+    marker's bytes occur.
+    """
+    marker = HEADER_MARKER.encode()
+    return any(_has_header_line(block, marker) for block in _line_blocks(file_path, start, end))
+
+
+def is_self_contained(file_path, start: int = 0, end: Optional[int] = None) -> bool:
+    """
+    Whether the byte range [start, end) can be parsed on its own: no
+    line in it leaves a quoted field open (so every record is one line)
+    and none past the header names the columns again. Checked by the
+    worker of each range before the file is split at those ranges.
+    """
+    marker = HEADER_MARKER.encode()
+    for block in _line_blocks(file_path, start, end):
+        if _has_open_quote(block) or _has_header_line(block, marker):
+            return False
+    return True
+
+
+def _line_blocks(file_path, start, end):
+    """
+    Yields the lines in [start, end) (the header line left out) in
+    blocks of whole lines. start/end are byte offsets, or member offsets
+    for gzip files as in iter_lines().
+    """
+    if compression_of(file_path) is not None:
+        lines = iter_lines(file_path, start, end)
+        if not start:
+            lines = islice(lines, 1, None)
+        while True:
+            block = "".join(islice(lines, 8192))
+            if not block:
+                return
+            yield block.encode("utf-8")
+
+    pending = b""
+    with open(file_path, "rb") as f:
+        if start:
+            f.seek(start)
+        else:
+            f.readline()
+        pos = f.tell()
+
+        while end is None or pos < end:
+            data = f.read(READ_BUFFER if end is None else min(READ_BUFFER, end - pos))
+            if not data:
+                break
+            pos += len(data)
+
+            data = pending + data
+            cut = data.rfind(b"\n") + 1
+            pending = data[cut:]
+            yield data[:cut]
+
+    if pending:
+        yield pending
+
+
+def _has_open_quote(data):
+    """Whether a line of the block has an odd number of quotes."""
+    return any(map((1).__and__, map(bytes.count, data.split(b"\n"), repeat(b'"'))))
+
+
+def _has_header_line(data, marker):
+    found = data.find(marker)
+    while found != -1:
+        line_start = data.rfind(b"\n", 0, found) + 1
+        line_end = data.find(b"\n", found)
+        if line_end == -1:
+            line_end = len(data)
+
+        line = data[line_start:line_end].decode("utf-8", errors="replace")
+        if is_header_row(parse_header(line)):
+            return True
+        found = data.find(marker, line_end)
+    return False
 
 
 def parse_sysmon_csv(file_path: str) -> List[Event]:
-    
-    events = []
-
-    with open(file_path, newline="", encoding="utf-8") as csvfile:
-        reader = csv.DictReader(csvfile)
-
-        for row in reader:
-            # Extract timestamp and raw fields
-            timestamp = row.get("UtcTime") or row.get("EventTime") or "N/A"
-
-            raw = dict(row)
-
-            normalized = {
-                "event_id": row.get("EventID"),
-                "process_name": row.get("Image") or "",
-                "process_path": row.get("Image") or "",
-                "command_line": row.get("CommandLine") or "",
-                "parent_process": row.get("ParentImage") or "",
-                "parent_command_line": row.get("ParentCommandLine") or "",
-                "user": row.get("User") or "",
-                "src_ip": row.get("SourceIp") or "",
-                "dest_ip": row.get("DestinationIp") or "",
-            }
-
-            events.append(
-                Event(
-                    timestamp=timestamp,
-                    source="sysmon",
-                    raw=raw,
-                    normalized=normalized
-                )
-            )
-
-    return events
+    return list(iter_sysmon_csv(file_path))
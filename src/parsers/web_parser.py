@@ -1,14 +1,32 @@
 """
 Parses generic web server logs (Common Log Format / Combined Log Format).
-Returns a list of Event objects.
+
+iter_web_logs() yields Event objects line by line; parse_web_logs()
+returns them all as a list. iter_web_lines() does the same for lines
+that come from somewhere other than a file (e.g. follow mode).
+iter_web_batches() yields ColumnBatch objects instead (--batch).
 
 This parser focuses on Apache/Nginx style access logs.
 """
 
 import re
-from typing import List
-from ..event import Event
-
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+from ..event import BATCH_ROWS, ColumnBatch, Event, EventSchema
+from ..timestamps import parse_clf
+from .ranges import iter_lines
+
+
+# Normalized keys every web event carries
+FIELDS = ("src_ip", "method", "url", "protocol", "status", "user_agent", "referrer")
+
+SCHEMA = EventSchema(
+    "web", FIELDS,
+    interned=("src_ip", "method", "protocol", "user_agent", "referrer"),
+    raw_interned=("ip", "ident", "authuser", "timestamp", "status", "referrer", "agent"),
+    intern_timestamp=True,
+    clock=parse_clf,
+)
 
 # Common Log Format + optional fields (combined logs)
 LOG_PATTERN = re.compile(
@@ -22,6 +40,9 @@ LOG_PATTERN = re.compile(
     r'(?: "(?P<referrer>[^"]*)" "(?P<agent>[^"]*)")?'
 )
 
+# Raw field names, in LOG_PATTERN group order
+RAW_KEYS = tuple(LOG_PATTERN.groupindex)
+
 
 def split_request(req: str):
     
@@ -40,37 +61,74 @@ def split_request(req: str):
         return "", "", ""
 
 
+def iter_web_logs(file_path: str, start: int = 0, end: Optional[int] = None,
+                  compact: bool = False) -> Iterator[Event]:
+    """
+    Yields one Event per matching line. start/end restrict parsing to a
+    newline-aligned byte range (see parsers/ranges.py); compact=True
+    yields CompactEvent objects instead.
+    """
+    return iter_web_lines(iter_lines(file_path, start, end), compact)
+
+
+def iter_web_lines(lines: Iterable[str], compact: bool = False) -> Iterator[Event]:
+    """Yields one Event per matching access-log line."""
+    for line in lines:
+        match = LOG_PATTERN.search(line)
+        if not match:
+            continue
+
+        groups = match.groups()
+        ip, _, _, timestamp, request, status, _, referrer, agent = groups
+
+        method, path, protocol = split_request(request)
+
+        # Same order as FIELDS
+        normalized = (
+            ip,
+            method,
+            path,
+            protocol,
+            int(status),
+            agent,
+            referrer,
+        )
+
+        yield SCHEMA.make(timestamp, normalized, RAW_KEYS, groups, compact)
+
+
+def iter_web_batches(file_path: str, start: int = 0, end: Optional[int] = None,
+                     size: int = BATCH_ROWS) -> Iterator[ColumnBatch]:
+    """iter_web_logs() as column batches of up to `size` lines."""
+    return iter_web_line_batches(iter_lines(file_path, start, end), size)
+
+
+def iter_web_line_batches(lines: Iterable[str], size: int = BATCH_ROWS) -> Iterator[ColumnBatch]:
+    lines = iter(lines)
+    search = LOG_PATTERN.search
+
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+
+        rows = list(map(re.Match.groups, filter(None, map(search, chunk))))
+        if not rows:
+            continue
+
+        ip, _, _, timestamps, requests, status, _, referrer, agent = zip(*rows)
+
+        # Almost every request is "METHOD PATH PROTOCOL"; split_request() the rest
+        parts = list(map(str.split, requests))
+        if not all(len(request) == 3 for request in parts):
+            parts = [request if len(request) == 3 else split_request(text) for request, text in zip(parts, requests)]
+        method, path, protocol = zip(*parts)
+
+        # Same order as FIELDS
+        columns = (ip, method, path, protocol, list(map(int, status)), agent, referrer)
+
+        yield ColumnBatch(SCHEMA, timestamps, columns, [RAW_KEYS] * len(rows), rows)
+
+
 def parse_web_logs(file_path: str) -> List[Event]:
-    
-    events = []
-
-    with open(file_path, encoding="utf-8") as f:
-        for line in f:
-            match = LOG_PATTERN.search(line)
-            if not match:
-                continue
-
-            raw = match.groupdict()
-
-            method, path, protocol = split_request(raw.get("request", ""))
-
-            normalized = {
-                "src_ip": raw.get("ip", ""),
-                "method": method,
-                "url": path,
-                "protocol": protocol,
-                "status": int(raw.get("status", 0)),
-                "user_agent": raw.get("agent", ""),
-                "referrer": raw.get("referrer", ""),
-            }
-
-            events.append(
-                Event(
-                    timestamp=raw.get("timestamp", ""),
-                    source="web",
-                    raw=raw,
-                    normalized=normalized
-                )
-            )
-
-    return events
+    return list(iter_web_logs(file_path))
@@ -1,72 +1,226 @@
 """
 Parses a Windows Event Log XML exported from Event Viewer.
-Returns a list of Event objects.
+
+iter_wevt_xml() yields Event objects one <Event> at a time;
+parse_wevt_xml() returns them all as a list. iter_wevt_messages() does
+the same for XML text that comes from somewhere other than a file
+(e.g. events forwarded over syslog).
+
+The file is parsed incrementally: each <Event> element is converted as
+soon as its end tag arrives and is then dropped from the tree, so memory
+stays flat even on multi-GB exports. Tags are matched by local name, so
+exports carrying the Microsoft event namespace
+(http://schemas.microsoft.com/win/2004/08/events/event) work the same as
+plain ones, and files that are just concatenated <Event> fragments with
+no single root element are accepted too.
 """
 
+import codecs
+import re
 import xml.etree.ElementTree as ET
-from typing import List
-from ..event import Event
+from typing import Iterable, Iterator, List
+from ..event import Event, EventSchema
+from ..timestamps import parse_iso
+from .compression import open_binary, open_text
 
 
-def parse_wevt_xml(file_path: str) -> List[Event]:
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    events = []
-
-    for xml_event in root.findall(".//Event"):
-        # --- System section ---
-        system = xml_event.find("System")
-        timestamp = "N/A"
-        event_id = None
-
-        if system is not None:
-            time_el = system.find("TimeCreated")
-            timestamp = time_el.get("SystemTime") if time_el is not None else "N/A"
-
-            event_id_el = system.find("EventID")
-            event_id = event_id_el.text if event_id_el is not None else None
-
-        # --- EventData section ---
-        event_data = xml_event.find("EventData")
-        raw = {}
-        normalized = {
-            "event_id": event_id,
-            "timestamp": timestamp,
-            "user": "",
-            "logon_type": "",
-            "src_ip": "",
-            "process_name": "",
-            "process_id": "",
-            "command_line": "",
-        }
-
-        if event_data is not None:
-            for data in event_data.findall("Data"):
-                name = data.get("Name", "")
-                value = data.text or ""
-                raw[name] = value
-
-                # Map to normalized fields
-                if name == "TargetUserName":
-                    normalized["user"] = value
-                elif name == "LogonType":
-                    normalized["logon_type"] = value
-                elif name in ("IpAddress", "Ip"):
-                    normalized["src_ip"] = value
-                elif name in ("NewProcessName", "ProcessName"):
-                    normalized["process_name"] = value
-                elif name == "ProcessId":
-                    normalized["process_id"] = value
-                elif name == "CommandLine":
-                    normalized["command_line"] = value
-
-        events.append(
-            Event(
-                timestamp=timestamp,
-                source="windows_event",
-                raw=raw,
-                normalized=normalized
-            )
+# Size of each chunk fed to the incremental XML parser
+CHUNK_SIZE = 1024 * 1024
+
+# Stripped before feeding, since everything is wrapped in a synthetic root
+XML_DECLARATION = re.compile(r"<\?xml[^>]*\?>")
+
+WRAPPER_OPEN = "<EventSentinelRoot>"
+WRAPPER_CLOSE = "</EventSentinelRoot>"
+
+# Normalized keys every Windows event carries
+FIELDS = (
+    "event_id", "timestamp", "user", "logon_type", "src_ip",
+    "process_name", "process_id", "command_line",
+)
+
+SCHEMA = EventSchema(
+    "windows_event", FIELDS,
+    interned=("event_id", "timestamp", "user", "logon_type", "src_ip", "process_name"),
+    raw_interned=("TargetUserName", "LogonType", "IpAddress", "Ip", "ProcessName", "NewProcessName"),
+    intern_timestamp=True,
+    clock=parse_iso,
+)
+
+# Distinct EventData name layouts, shared between compact events
+_raw_key_layouts = {}
+
+
+def local_name(tag: str) -> str:
+    """'{namespace}Event' -> 'Event'"""
+    return tag.rsplit("}", 1)[-1] if tag[:1] == "{" else tag
+
+
+def find_child(element, name: str):
+    """Namespace-agnostic version of element.find(name)."""
+    for child in element:
+        if local_name(child.tag) == name:
+            return child
+    return None
+
+
+def event_from_element(xml_event, compact: bool = False) -> Event:
+    """Converts one <Event> element into an Event (or CompactEvent) object."""
+
+    # --- System section ---
+    system = find_child(xml_event, "System")
+    timestamp = "N/A"
+    event_id = None
+
+    if system is not None:
+        time_el = find_child(system, "TimeCreated")
+        timestamp = time_el.get("SystemTime") if time_el is not None else "N/A"
+
+        event_id_el = find_child(system, "EventID")
+        event_id = event_id_el.text if event_id_el is not None else None
+
+    # --- EventData section ---
+    event_data = find_child(xml_event, "EventData")
+    raw = {}
+    normalized = {
+        "event_id": event_id,
+        "timestamp": timestamp,
+        "user": "",
+        "logon_type": "",
+        "src_ip": "",
+        "process_name": "",
+        "process_id": "",
+        "command_line": "",
+    }
+
+    if event_data is not None:
+        for data in event_data:
+            if local_name(data.tag) != "Data":
+                continue
+
+            name = data.get("Name", "")
+            value = data.text or ""
+            raw[name] = value
+
+            # Map to normalized fields
+            if name == "TargetUserName":
+                normalized["user"] = value
+            elif name == "LogonType":
+                normalized["logon_type"] = value
+            elif name in ("IpAddress", "Ip"):
+                normalized["src_ip"] = value
+            elif name in ("NewProcessName", "ProcessName"):
+                normalized["process_name"] = value
+            elif name == "ProcessId":
+                normalized["process_id"] = value
+            elif name == "CommandLine":
+                normalized["command_line"] = value
+
+    if not compact:
+        return Event(
+            timestamp=timestamp,
+            source="windows_event",
+            raw=raw,
+            normalized=normalized,
+            epoch=parse_iso(timestamp)
         )
 
-    return events
+    raw_keys = tuple(raw)
+    raw_keys = _raw_key_layouts.setdefault(raw_keys, raw_keys)
+
+    return SCHEMA.make(timestamp, normalized.values(), raw_keys, raw.values(), compact=True)
+
+
+def _detect_encoding(head: bytes) -> str:
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    return "utf-8-sig"
+
+
+def _read_chunks(f):
+    """
+    Yields text chunks that always end right after a '>' so an XML
+    declaration can never be split between two chunks.
+    """
+    pending = ""
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+
+        chunk = pending + chunk
+        cut = chunk.rfind(">") + 1
+        pending = chunk[cut:]
+        if cut:
+            yield chunk[:cut]
+
+    if pending:
+        yield pending
+
+
+def iter_wevt_xml(file_path: str, compact: bool = False) -> Iterator[Event]:
+    with open_binary(file_path) as probe:
+        encoding = _detect_encoding(probe.read(4))
+
+    # Wrap the whole file in one synthetic root: a normal <Events> export
+    # simply becomes its only child, and bare concatenated <Event>
+    # fragments become well-formed siblings.
+    parser = ET.XMLPullParser(events=("start", "end"))
+    parser.feed(WRAPPER_OPEN)
+
+    # Open elements from the root down; used to detach finished events
+    stack = []
+
+    with open_text(file_path, encoding=encoding, errors="replace") as f:
+        for chunk in _read_chunks(f):
+            parser.feed(XML_DECLARATION.sub("", chunk))
+            yield from _drain(parser, stack, compact)
+
+    parser.feed(WRAPPER_CLOSE)
+    parser.close()
+    yield from _drain(parser, stack, compact)
+
+
+def _drain(parser, stack, compact) -> Iterator[Event]:
+    for action, element in parser.read_events():
+        if action == "start":
+            stack.append(element)
+            continue
+
+        stack.pop()
+        if local_name(element.tag) != "Event":
+            continue
+
+        event = event_from_element(element, compact)
+
+        # Drop the finished element so the tree never grows
+        element.clear()
+        if stack:
+            stack[-1].remove(element)
+
+        yield event
+
+
+def iter_wevt_messages(messages: Iterable[str], compact: bool = False) -> Iterator[Event]:
+    """
+    Yields Events from XML text that doesn't come from a file, e.g. one
+    forwarded <Event> per syslog message. Text that isn't well-formed
+    XML is skipped.
+    """
+    for text in messages:
+        try:
+            root = ET.fromstring(text)
+        except ET.ParseError:
+            continue
+
+        if local_name(root.tag) == "Event":
+            yield event_from_element(root, compact)
+            continue
+
+        for element in root.iter():
+            if local_name(element.tag) == "Event":
+                yield event_from_element(element, compact)
+
+
+def parse_wevt_xml(file_path: str) -> List[Event]:
+    return list(iter_wevt_xml(file_path))
@@ -0,0 +1,461 @@
+"""
+Per-file processing shared by the serial and parallel code paths.
+
+A file goes through: read sample -> choose parser -> parse -> (dedup) ->
+detect -> (correlate) -> report. process_file() does that for one file
+against a given Detector and Reporter. run_parallel() fans files out to
+a process pool where each worker fills its own Reporter; the partial
+reporters come back in input order and are merged, so the final summary
+is identical to a serial run.
+
+With --batch, web and Sysmon files are parsed, tagged and summarized in
+column batches instead (process_batches()); dedup needs single events
+and turns batching off.
+
+Large line-oriented files (web logs, Sysmon CSV without multi-line
+fields) are additionally cut into newline-aligned byte ranges so a
+single huge file is spread over all workers too (except with
+correlation or dedup on, whose windows need to see the whole file in
+order). Compressed inputs are decompressed while they are read; a big
+multi-member gzip file is cut at member starts instead.
+"""
+
+import os
+from time import perf_counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .parsers import PARSERS, STREAMING_PARSERS, BATCH_PARSERS, RANGE_CHECKS
+from .parsers.ranges import split_ranges, has_multiline_fields
+from .parsers.compression import compression_of, open_text
+from .parsers.sniff import sniff_file, sniff_text, EMPTY
+from .dedup import Deduplicator, DEDUP_WINDOW, parse_fields
+from .detector import Detector
+from .rulepacks import shared_packs
+from .correlation import Correlator
+from .profiling import Profiler
+from .reporter import Reporter
+from .sinks import SinkSpec
+from .color import color_text, Color
+
+
+# Files smaller than this are never split into byte ranges
+SHARD_MIN_BYTES = 16 * 1024 * 1024
+
+# Ranges per worker for a big file; >1 evens out uneven line density
+SHARDS_PER_WORKER = 4
+
+
+@dataclass
+class PipelineOptions:
+    """Run settings; picklable so worker processes can rebuild the pipeline."""
+    log_type: str = "auto"
+    keep_events: bool = True
+    compact: bool = False
+    keep_raw: bool = True
+    rule_cache: int = 0
+    correlate: bool = False
+    profile: bool = False
+    rare_threshold: int = 0
+    allowlist: tuple = ()
+    rule_packs: tuple = ()
+    # Key fields for --dedup (() = the default key), None = no deduplication
+    dedup: Optional[tuple] = None
+    dedup_window: int = DEDUP_WINDOW
+    top_k: int = 0
+    # Rows per column batch (--batch), 0 = one event at a time
+    batch: int = 0
+    sinks: Optional[SinkSpec] = None
+    # Rarity counted as events arrive (follow mode) instead of settled at the end
+    rare_live: bool = False
+
+    @classmethod
+    def from_args(cls, args):
+        streaming = args.stream or args.follow
+        return cls(
+            log_type=args.type,
+            keep_events=not args.stream,
+            compact=args.compact,
+            keep_raw=not args.no_raw,
+            rule_cache=args.rule_cache,
+            correlate=args.correlate,
+            profile=args.profile,
+            rare_threshold=args.rare_threshold,
+            allowlist=read_allowlist(args.allow, args.allowlist),
+            rule_packs=tuple(str(path) for path in args.rules or ()),
+            dedup=parse_fields(args.dedup) if args.dedup is not None else None,
+            dedup_window=args.dedup_window,
+            top_k=args.top,
+            batch=args.batch or 0,
+            rare_live=bool(args.follow or args.listen),
+            sinks=SinkSpec(
+                directory=args.output_path,
+                jsonl=args.output in ("jsonl", "all"),
+                # Without the event list, CSV is written while streaming
+                csv=streaming and args.output in ("csv", "both", "all"),
+                sqlite=args.output in ("sqlite", "all"),
+                alerts_only=args.alerts_only,
+                repeats=args.dedup is not None,
+            ),
+        )
+
+    def make_detector(self, profiler=None):
+        return Detector(
+            cache_size=self.rule_cache,
+            rare_threshold=self.rare_threshold if self.rare_live else 0,
+            allowlist=self.allowlist,
+            profiler=profiler,
+            rule_packs=shared_packs(self.rule_packs) if self.rule_packs else None,
+        )
+
+    def make_correlator(self):
+        return Correlator() if self.correlate else None
+
+    def make_deduplicator(self):
+        return Deduplicator(self.dedup, self.dedup_window) if self.dedup is not None else None
+
+    @property
+    def whole_files(self):
+        """Whether files must be read whole and in order (correlation and dedup windows)."""
+        return self.correlate or self.dedup is not None
+
+    def make_reporter(self):
+        reporter = Reporter(keep_events=self.keep_events, keep_raw=self.keep_raw, top_k=self.top_k,
+                            rare_threshold=0 if self.rare_live else self.rare_threshold)
+        reporter.repeats = self.dedup is not None
+        if self.profile:
+            reporter.profiler = Profiler()
+        return reporter
+
+    def make_partial_reporter(self):
+        """Reporter for one slice of the work; sink output goes to part files."""
+        reporter = self.make_reporter()
+        if self.sinks:
+            reporter.open_sinks(self.sinks, part=True)
+        return reporter
+
+
+# ------------------------------------------------------------
+# Helper: load the right parser
+# ------------------------------------------------------------
+def choose_parser_name(log_type, sample_line=None):
+    """
+    Returns the parser key ("sysmon", "windows", "web") for a CLI choice
+    or sample content, or None if it can't be determined.
+    """
+
+    if log_type != "auto":
+        return log_type if log_type in PARSERS else None
+
+    # Auto-detect from content
+    return sniff_text(sample_line) if sample_line else None
+
+
+def choose_parser(log_type, sample_line=None, parsers=PARSERS):
+    """
+    Selects the correct parser based on CLI choice or sample content.
+    Pass parsers=STREAMING_PARSERS to get the generator versions.
+    """
+    name = choose_parser_name(log_type, sample_line)
+    return parsers[name] if name else None
+
+
+def read_allowlist(cidrs=None, path=None):
+    """Allowlisted CIDRs from the command line plus an optional file (one per line, # comments)."""
+    allowlist = list(cidrs or ())
+
+    if path is not None:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    allowlist.append(line)
+
+    return tuple(allowlist)
+
+
+# ------------------------------------------------------------
+# Helper: read file lines
+# ------------------------------------------------------------
+def read_file_lines(path: Path, log=print):
+    try:
+        with open_text(path, encoding="utf-8", errors="ignore") as f:
+            return f.readlines()
+    except Exception as e:
+        log(color_text(f"[ERROR] Could not read file: {path} ({e})", Color.RED))
+        return []
+
+
+# ------------------------------------------------------------
+# Helper: run one file through the pipeline
+# ------------------------------------------------------------
+def resolve_parser_name(file_path, log_type, log=print):
+    """
+    Picks the parser for a file, logging why if it has to be skipped.
+    Content is sniffed from a short prefix, once per file version.
+    """
+    try:
+        verdict = sniff_file(file_path)
+    except (OSError, EOFError, ValueError) as e:
+        log(color_text(f"[ERROR] Could not read file: {file_path} ({e})", Color.RED))
+        return None
+
+    if verdict == EMPTY:
+        return None
+
+    # Choose parser (explicit or auto)
+    name = verdict if log_type == "auto" else choose_parser_name(log_type)
+
+    if name is None:
+        log(color_text("[!] Unknown log type; skipping file.", Color.YELLOW))
+
+    return name
+
+
+def process_file(file_path, options, detector, reporter, log=print):
+    """
+    Parses, tags and reports a single file.
+    Returns the number of events processed, or None if the file was skipped.
+    (process_with() is the same once the parser is known.)
+    """
+    start = perf_counter()
+    name = resolve_parser_name(file_path, options.log_type, log=log)
+    if reporter.profiler is not None:
+        reporter.profiler.add("sniff", perf_counter() - start, file_path=file_path)
+
+    if name is None:
+        return None
+
+    return process_with(name, file_path, options, detector, reporter)
+
+
+def process_with(parser_name, file_path, options, detector, reporter, byte_range=None):
+    """Parse -> dedup -> detect -> correlate -> report, one event at a time."""
+    if options.batch and options.dedup is None and parser_name in BATCH_PARSERS:
+        return process_batches(parser_name, file_path, options, detector, reporter, byte_range)
+
+    parser_func = STREAMING_PARSERS[parser_name]
+    events = parser_func(file_path, *(byte_range or ()), compact=options.compact)
+
+    profiler = reporter.profiler
+    if profiler is not None:
+        timer = profiler.file(file_path)
+        events = timer.layer("parse", events)
+
+    # Like correlation windows, dedup windows are per file
+    deduplicator = options.make_deduplicator()
+    if deduplicator is not None:
+        events = deduplicator.stream(events)
+        if profiler is not None:
+            events = timer.layer("dedup", events)
+
+    events = detector.stream(events)
+    if profiler is not None:
+        events = timer.layer("detect", events)
+
+    # Correlation windows are per file, so files can run in any process
+    correlator = options.make_correlator()
+    if correlator is not None:
+        events = correlator.stream(events)
+        if profiler is not None:
+            events = timer.layer("correlate", events)
+
+    if profiler is None:
+        count = reporter.add_events(events)
+    else:
+        start = perf_counter()
+        count = reporter.add_events(events)
+        timer.finish("report", count, perf_counter() - start)
+
+    if deduplicator is not None:
+        reporter.collapsed += deduplicator.collapsed
+    return count
+
+
+def process_batches(parser_name, file_path, options, detector, reporter, byte_range=None):
+    """process_with() for --batch: parse -> detect -> (correlate) -> report, a column batch at a time."""
+    batches = BATCH_PARSERS[parser_name](file_path, *(byte_range or ()), size=options.batch)
+
+    profiler = reporter.profiler
+    if profiler is not None:
+        timer = profiler.file(file_path)
+        batches = timer.layer("parse", batches, size=len)
+
+    tagged = ((batch, detector.tag_batch(batch)) for batch in batches)
+    if profiler is not None:
+        tagged = timer.layer("detect", tagged, size=lambda item: len(item[0]))
+
+    correlator = options.make_correlator()
+    start = perf_counter()
+
+    if correlator is None:
+        count = sum(reporter.add_batch(batch, tags, options.compact) for batch, tags in tagged)
+    else:
+        # Correlation windows need every event, in order
+        events = (event for batch, tags in tagged for event in batch.events(tags, options.compact))
+        events = correlator.stream(events)
+        if profiler is not None:
+            events = timer.layer("correlate", events)
+        count = reporter.add_events(events)
+
+    if profiler is not None:
+        timer.finish("report", count, perf_counter() - start)
+    return count
+
+
+def can_split(parser_name, file_path):
+    """Whether a file may be parsed as independent byte ranges."""
+    kind = compression_of(file_path)
+    # Of compressed files only multi-member gzip can be cut (at members)
+    if kind not in (None, "gzip"):
+        return False
+
+    if parser_name == "web":
+        return True
+    if parser_name == "sysmon":
+        # A quick look at the top; every range is checked in full before
+        # the file is actually split (see check_plans())
+        return not has_multiline_fields(file_path)
+    return False
+
+
+# ------------------------------------------------------------
+# Parallel execution
+# ------------------------------------------------------------
+def _process_file_task(task):
+    """Worker entry point: runs one file into a fresh Reporter."""
+    file_path, options = task
+
+    messages = []
+    reporter = options.make_partial_reporter()
+    detector = options.make_detector(reporter.profiler)
+    count = process_file(file_path, options, detector, reporter, log=messages.append)
+    reporter.close_sinks()
+
+    return count, messages, reporter
+
+
+def _process_range_task(task):
+    """Worker entry point: runs one byte range of a file into a fresh Reporter."""
+    file_path, parser_name, byte_range, options = task
+
+    reporter = options.make_partial_reporter()
+    detector = options.make_detector(reporter.profiler)
+    count = process_with(parser_name, file_path, options, detector, reporter, byte_range)
+    reporter.close_sinks()
+
+    return count, [], reporter
+
+
+def plan_file(file_path, log_type, workers, scan=None, split=True):
+    """
+    Returns (parser_name, byte ranges) to parse a file in, or None to
+    process it whole. Only big files of a splittable format are cut up,
+    and only if split is True.
+
+    scan=(parser_name, (start, end)) restricts parsing to that part of
+    the file (used by incremental re-scans); it is always honoured.
+    """
+    if scan is not None:
+        name, (start, end) = scan
+    else:
+        name, start, end = None, 0, None
+
+    try:
+        if end is None:
+            end = os.path.getsize(file_path)
+    except OSError:
+        return None
+
+    if not split or end - start < SHARD_MIN_BYTES:
+        return (name, [(start, end)]) if scan is not None else None
+
+    if name is None:
+        messages = []
+        name = resolve_parser_name(file_path, log_type, log=messages.append)
+        if name is None:
+            return None
+
+    if not can_split(name, file_path):
+        return (name, [(start, end)]) if scan is not None else None
+
+    shards = min(workers * SHARDS_PER_WORKER, (end - start) // SHARD_MIN_BYTES)
+    ranges = split_ranges(file_path, shards, start, end)
+    return (name, ranges) if len(ranges) > 1 or scan is not None else None
+
+
+def _check_task(task):
+    """Worker entry point: whether one byte range can be parsed on its own."""
+    file_path, parser_name, (start, end) = task
+    return RANGE_CHECKS[parser_name](file_path, start, end)
+
+
+def check_plans(pool, input_files, options, workers, scans):
+    """
+    Yields (file_path, plan_file() result) per input. Ranges of formats
+    in RANGE_CHECKS are checked in the pool first (all files' checks are
+    queued before any is waited for); a file with a range that can't be
+    parsed on its own is read in one piece instead.
+    """
+    plans = []
+    for file_path in input_files:
+        scan = scans.get(file_path)
+        # Correlation and dedup windows must see the whole file in order
+        plan = plan_file(file_path, options.log_type, workers, scan, split=not options.whole_files)
+
+        checks = None
+        if plan is not None and len(plan[1]) > 1 and plan[0] in RANGE_CHECKS:
+            name, ranges = plan
+            checks = [pool.submit(_check_task, (file_path, name, byte_range)) for byte_range in ranges]
+        plans.append((file_path, scan, plan, checks))
+
+    for file_path, scan, plan, checks in plans:
+        if checks is not None and not all(check.result() for check in checks):
+            plan = (scan[0], [scan[1]]) if scan is not None else None
+        yield file_path, plan
+
+
+def _submit(pool, file_path, plan, options):
+    if plan is None:
+        return [pool.submit(_process_file_task, (file_path, options))]
+
+    name, ranges = plan
+    return [
+        pool.submit(_process_range_task, (file_path, name, byte_range, options))
+        for byte_range in ranges
+    ]
+
+
+def run_parallel(input_files, options, workers, scans=None):
+    """
+    Processes files (and ranges of big files) in a process pool.
+
+    scans optionally maps a file to (parser_name, (start, end)) so only
+    that byte range of it is parsed.
+
+    Yields (file_path, count, messages, partial_reporter) per file in
+    input order, so callers can merge deterministically as results arrive.
+    """
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+
+    scans = scans or {}
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [
+            (file_path, _submit(pool, file_path, plan, options))
+            for file_path, plan in check_plans(pool, input_files, options, workers, scans)
+        ]
+
+        for file_path, futures in jobs:
+            count, messages, reporter = futures[0].result()
+
+            # Remaining ranges of the same file, merged in byte order
+            for future in futures[1:]:
+                part_count, _, part = future.result()
+                count += part_count
+                reporter.merge(part)
+
+            yield file_path, count, messages, reporter
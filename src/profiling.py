@@ -0,0 +1,207 @@
+"""
+Optional instrumentation for --profile.
+
+A Profiler collects:
+- per stage: wall time and events (sniff, parse, dedup, detect,
+  correlate, report, export)
+- per input file: events, wall time and the same stage breakdown
+- per rule: calls, hits (times it tagged an event) and cumulative time
+
+Stages of one file run interleaved (events stream parser -> detector ->
+reporter), so each layer is timed inclusively while its events are
+pulled through and the time of the layer below is subtracted. File
+reading happens inside the streaming parsers and counts as "parse".
+
+Nothing here is touched when profiling is off: the Detector keeps its
+plain rule table and process_with() takes its usual path.
+
+Profilers from worker processes merge like Reporters do.
+"""
+
+from time import perf_counter
+
+from .color import color_text, Color
+
+
+STAGE_ORDER = ("sniff", "parse", "dedup", "detect", "correlate", "report", "export")
+
+
+class Profiler:
+    def __init__(self):
+        # stage -> [seconds, events]
+        self.stages = {}
+        # file path (str) -> {"events", "seconds", "stages": {stage: seconds}}
+        self.files = {}
+        # rule name -> [calls, hits, seconds]
+        self.rules = {}
+
+    # ------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------
+    def add(self, stage, seconds, events=0, file_path=None):
+        totals = self.stages.setdefault(stage, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += events
+
+        if file_path is not None:
+            entry = self._file(file_path)
+            entry["stages"][stage] = entry["stages"].get(stage, 0.0) + seconds
+
+    def _file(self, file_path):
+        key = str(file_path)
+        entry = self.files.get(key)
+        if entry is None:
+            entry = self.files[key] = {"events": 0, "seconds": 0.0, "stages": {}}
+        return entry
+
+    def file(self, file_path):
+        """Starts timing the stage layers of one file (see FileTimer)."""
+        return FileTimer(self, file_path)
+
+    def wrap_rules(self, rule_table):
+        """Returns the rule table with every check counting its calls, hits and time."""
+        return tuple(rule._replace(check=self.timed_check(rule.name, rule.check)) for rule in rule_table)
+
+    def timed_check(self, name, check):
+        """Wraps one check (any arguments; truthy result = hit) in call/hit/time counters."""
+        stats = self.rules.setdefault(name, [0, 0, 0.0])
+
+        def timed(*args):
+            start = perf_counter()
+            result = check(*args)
+            stats[2] += perf_counter() - start
+            stats[0] += 1
+            if result:
+                stats[1] += 1
+            return result
+
+        return timed
+
+    def merge(self, other):
+        for stage, (seconds, events) in other.stages.items():
+            totals = self.stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += events
+
+        for key, theirs in other.files.items():
+            entry = self._file(key)
+            entry["events"] += theirs["events"]
+            entry["seconds"] += theirs["seconds"]
+            for stage, seconds in theirs["stages"].items():
+                entry["stages"][stage] = entry["stages"].get(stage, 0.0) + seconds
+
+        for name, (calls, hits, seconds) in other.rules.items():
+            stats = self.rules.setdefault(name, [0, 0, 0.0])
+            stats[0] += calls
+            stats[1] += hits
+            stats[2] += seconds
+
+    # ------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------
+    def _ordered_stages(self):
+        known = [stage for stage in STAGE_ORDER if stage in self.stages]
+        return known + sorted(stage for stage in self.stages if stage not in STAGE_ORDER)
+
+    def to_dict(self, cache_stats=None):
+        stats = {
+            "stages": {
+                stage: {"seconds": round(self.stages[stage][0], 6), "events": self.stages[stage][1]}
+                for stage in self._ordered_stages()
+            },
+            "files": {
+                path: {
+                    "events": entry["events"],
+                    "seconds": round(entry["seconds"], 6),
+                    "stages": {stage: round(seconds, 6) for stage, seconds in entry["stages"].items()},
+                }
+                for path, entry in self.files.items()
+            },
+            "rules": {
+                name: {"calls": calls, "hits": hits, "seconds": round(seconds, 6)}
+                for name, (calls, hits, seconds) in self.rules.items()
+            },
+        }
+        if cache_stats:
+            stats["rule_caches"] = cache_stats
+        return stats
+
+    def print_table(self):
+        print(color_text("\n=== Profile ===\n", Color.BRIGHT_YELLOW))
+
+        print(color_text(f"  {'stage':<12}{'seconds':>10}{'events':>12}{'events/s':>12}", Color.BRIGHT_BLUE))
+        for stage in self._ordered_stages():
+            seconds, events = self.stages[stage]
+            rate = f"{events / seconds:,.0f}" if events and seconds > 0 else "-"
+            print(f"  {stage:<12}{seconds:>10.3f}{events:>12}{rate:>12}")
+
+        if self.files:
+            print(color_text(f"\n  {'file':<40}{'events':>10}{'seconds':>10}  slowest stage", Color.BRIGHT_BLUE))
+            for path, entry in self.files.items():
+                slowest = max(entry["stages"].items(), key=lambda item: item[1], default=("-", 0.0))
+                name = path if len(path) <= 38 else "..." + path[-35:]
+                print(f"  {name:<40}{entry['events']:>10}{entry['seconds']:>10.3f}  {slowest[0]} ({slowest[1]:.3f}s)")
+
+        if self.rules:
+            print(color_text(f"\n  {'rule':<22}{'calls':>10}{'hits':>10}{'seconds':>10}{'us/call':>10}", Color.BRIGHT_BLUE))
+            ranked = sorted(self.rules.items(), key=lambda item: -item[1][2])
+            for name, (calls, hits, seconds) in ranked:
+                per_call = f"{seconds / calls * 1e6:.2f}" if calls else "-"
+                print(f"  {name:<22}{calls:>10}{hits:>10}{seconds:>10.3f}{per_call:>10}")
+
+        print()
+
+
+class FileTimer:
+    """
+    Times the stacked generator layers of one file. Register layers from
+    the innermost (parser) outwards, then call finish() with the event
+    count and the total time spent consuming the outermost layer. Each
+    layer counts the events it passed on (dedup passes on fewer).
+    """
+
+    def __init__(self, profiler, file_path):
+        self.profiler = profiler
+        self.file_path = file_path
+        # [stage, inclusive seconds, events], innermost first
+        self.layers = []
+
+    def layer(self, stage, events, size=None):
+        """size(item) is how many events an item holds (batches); 1 each by default."""
+        slot = [stage, 0.0, 0]
+        self.layers.append(slot)
+        return self._timed(events, slot, size)
+
+    def _timed(self, events, slot, size):
+        iterator = iter(events)
+        spent = 0.0
+        count = 0
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    event = next(iterator)
+                except StopIteration:
+                    spent += perf_counter() - start
+                    break
+                spent += perf_counter() - start
+                count += 1 if size is None else size(event)
+                yield event
+        finally:
+            slot[1] = spent
+            slot[2] = count
+
+    def finish(self, stage, count, total):
+        """Records all layers plus the consuming stage (e.g. report) for this file."""
+        profiler = self.profiler
+        inner = 0.0
+
+        for name, inclusive, events in self.layers:
+            profiler.add(name, inclusive - inner, events, self.file_path)
+            inner = inclusive
+
+        profiler.add(stage, total - inner, count, self.file_path)
+
+        entry = profiler._file(self.file_path)
+        entry["events"] += count
+        entry["seconds"] += total
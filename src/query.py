@@ -0,0 +1,161 @@
+"""
+The `query` command: answers questions from a report.sqlite written
+with --output sqlite (see sinks.SqliteSink) without re-reading any logs.
+
+    python main.py query reports/report.sqlite --command "-enc" --since 30d --group-by src_ip
+    python main.py query reports/report.sqlite --tag web_attack --ip 203.0.113.9
+    python main.py query reports/report.sqlite --sql "SELECT source, count(*) FROM events GROUP BY 1"
+
+Filters are combined with AND and map onto the sink's indexes: time
+ranges use the epoch index, --source / --ip their (column, epoch)
+indexes, --tag the detections index and --command / --url / --text the
+FTS5 index, so answers come back in milliseconds on large runs.
+"""
+
+import re
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .timestamps import to_epoch
+from .color import color_text, Color
+
+
+RELATIVE_TIME = re.compile(r"^(\d+)([smhd])$")
+UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Widest a text cell is printed
+MAX_CELL = 80
+
+
+def parse_time(text, now=None):
+    """Epoch seconds for an ISO date/time or a relative age like "30d" / "12h"; None if invalid."""
+    match = RELATIVE_TIME.match(text.strip())
+    if match:
+        now = time.time() if now is None else now
+        return int(now) - int(match.group(1)) * UNIT_SECONDS[match.group(2)]
+    return to_epoch(text)
+
+
+def fts_terms(text):
+    """
+    FTS5 query for user text: every whitespace-separated chunk must occur,
+    each as a phrase ("powershell.exe" = the tokens powershell, exe).
+    """
+    return " AND ".join('"' + chunk.replace('"', '""') + '"' for chunk in text.split())
+
+
+def build_query(args):
+    """Returns (sql, params) for the filter arguments."""
+    where = []
+    params = []
+
+    if args.since is not None:
+        where.append("e.epoch >= ?")
+        params.append(args.since)
+    if args.until is not None:
+        where.append("e.epoch < ?")
+        params.append(args.until)
+    if args.source:
+        where.append("e.source = ?")
+        params.append(args.source)
+    if args.ip:
+        where.append("e.src_ip = ?")
+        params.append(args.ip)
+    if args.user:
+        where.append("e.user = ?")
+        params.append(args.user)
+
+    matches = []
+    if args.command and args.command.split():
+        matches.append("command_line : (" + fts_terms(args.command) + ")")
+    if args.url and args.url.split():
+        matches.append("url : (" + fts_terms(args.url) + ")")
+    if args.text and args.text.split():
+        matches.append("(" + fts_terms(args.text) + ")")
+    if matches:
+        where.append("e.id IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)")
+        params.append(" AND ".join(matches))
+
+    joins = ""
+    if args.tag or args.group_by == "tag":
+        joins = " JOIN detections d ON d.event = e.id"
+        if args.tag:
+            where.append("d.tag = ?")
+            params.append(args.tag)
+
+    condition = (" WHERE " + " AND ".join(where)) if where else ""
+
+    if args.group_by:
+        column = "d.tag" if args.group_by == "tag" else f"e.{args.group_by}"
+        # An event carries each tag once, so the join never duplicates events;
+        # collapsed duplicates (--dedup) count as the records they stand for
+        sql = (f"SELECT {column}, sum(e.count), min(e.epoch), max(e.last_epoch) "
+               f"FROM events e{joins}{condition} GROUP BY {column} ORDER BY 2 DESC, 1 LIMIT ?")
+    else:
+        sql = (f"SELECT e.timestamp, e.source, e.src_ip, e.user, "
+               f"coalesce(e.command_line, e.url, e.process_name), e.detections, e.epoch, e.id "
+               f"FROM events e{joins}{condition} ORDER BY e.epoch, e.id LIMIT ?")
+
+    params.append(args.limit)
+    return sql, params
+
+
+def format_epoch(epoch):
+    if epoch is None:
+        return "-"
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def print_table(header, rows):
+    cells = [[("" if value is None else str(value))[:MAX_CELL] for value in row] for row in rows]
+    widths = [max([len(name)] + [len(row[i]) for row in cells]) for i, name in enumerate(header)]
+
+    print(color_text("  " + "  ".join(name.ljust(width) for name, width in zip(header, widths)), Color.BRIGHT_BLUE))
+    for row in cells:
+        print("  " + "  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def run(args):
+    path = Path(args.database)
+    if not path.exists():
+        print(color_text(f"[ERROR] No such database: {path}", Color.RED))
+        return
+
+    for name in ("since", "until"):
+        value = getattr(args, name)
+        if value is not None:
+            epoch = parse_time(value)
+            if epoch is None:
+                print(color_text(f"[ERROR] Can't read --{name} {value!r} (use e.g. 2025-01-31 or 30d)", Color.RED))
+                return
+            setattr(args, name, epoch)
+
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    start = time.perf_counter()
+
+    try:
+        if args.sql:
+            cursor = db.execute(args.sql)
+            header = [column[0] for column in cursor.description or ()]
+            rows = cursor.fetchmany(args.limit)
+        else:
+            sql, params = build_query(args)
+            rows = db.execute(sql, params).fetchall()
+
+            if args.group_by:
+                header = [args.group_by, "events", "first_seen", "last_seen"]
+                rows = [(value, count, format_epoch(first), format_epoch(last)) for value, count, first, last in rows]
+            else:
+                header = ["timestamp", "source", "src_ip", "user", "command_line / url", "detections"]
+                rows = [row[:6] for row in rows]
+    except sqlite3.Error as e:
+        print(color_text(f"[ERROR] Query failed: {e}", Color.RED))
+        return
+    finally:
+        elapsed = time.perf_counter() - start
+        db.close()
+
+    print_table(header, rows)
+    print(color_text(f"\n[+] {len(rows)} row(s) in {elapsed * 1000:.1f} ms", Color.GREEN))
@@ -1,21 +1,491 @@
 """
 Collects Event objects, summarizes them, prints colorized output,
 and exports results to JSON or CSV.
+
+Events can also be handed to streaming sinks (see sinks.py) as they
+arrive, so JSONL/CSV exports don't need the event list at all.
+
+Summary counts are in log records: an event standing for collapsed
+duplicates (see dedup.py) counts as all of them, and its last record's
+timestamp counts for last_seen.
+
+With top_k set, the most frequent source IPs, URLs, user agents,
+process names and detection tags are tracked too, in fixed memory per
+field (sketches.MisraGries), whatever the number of distinct values.
+
+add_batch() takes a whole ColumnBatch (--batch) and only makes events
+of the rows that need one; the others are summarized column by column.
+
+With rare_threshold set, rare_external_ip tags are only candidates while
+events come in (the Detector tags every external IP): their source IPs
+are counted, and settle_rarity() keeps the tags of those seen at most
+rare_threshold times in the whole run once everything was added. Top
+values count the kept tags; without retained events they come from the
+candidates' per-IP counts, spilled to temporary files past
+CANDIDATE_SPILL IPs so memory stays bounded.
 """
 
 import csv
 import json
-from collections import defaultdict
+import os
+import tempfile
+from collections import Counter, defaultdict
+from itertools import chain
+from operator import itemgetter
 from .color import color_text, Color
+from .timestamps import to_epoch
+from .profiling import Profiler
+from .rules import RARE_TAG, rare_sources
+from .sketches import Frequencies, MisraGries
 
 
 class Reporter:
-    
-    def __init__(self):
+
+    # Max number of sample events kept per (source, event_id) bucket
+    MAX_SAMPLES = 3
+
+    # Normalized fields with a top-K summary; detection tags get one as "tag"
+    TOP_FIELDS = ("src_ip", "url", "user_agent", "process_name")
+
+    # Candidate source IPs held in memory before they are spilled to a file
+    CANDIDATE_SPILL = 65536
+
+    def __init__(self, keep_events=True, keep_raw=True, top_k=0, rare_threshold=0):
+        # keep_events=False is the streaming mode: only the running summary
+        # below is kept, so memory stays flat no matter how big the input is.
+        self.keep_events = keep_events
+
+        # keep_raw=False strips raw fields from retained events once their
+        # sample (if any) has been taken
+        self.keep_raw = keep_raw
         self.events = []
+        self.summary = {}
+
+        # (source, event_id) -> [first epoch, last epoch]; first_seen/last_seen
+        # are chosen by these, so ordering doesn't depend on the string format
+        self.bounds = {}
+
+        # Streaming sinks; a partial reporter (worker / slice of a file)
+        # writes part files, collected in sink_parts once it is closed
+        self.sinks = []
+        self.sinks_part = False
+        self.sink_parts = []
+
+        # Set to a Profiler with --profile; merged like the summary
+        self.profiler = None
+
+        # With --dedup: the CSV export gets count / last_timestamp columns,
+        # and collapsed counts the records folded into earlier ones
+        self.repeats = False
+        self.collapsed = 0
+
+        # top_k > 0: field (or "tag") -> MisraGries of its values, top_k of them reported
+        self.top_k = top_k
+        self.top = {name: MisraGries() for name in self.TOP_FIELDS + ("tag",)} if top_k > 0 else {}
+
+        # rare_threshold > 0: rare_external_ip tags wait for settle_rarity();
+        # sources counts their source IPs, unsettled says some are pending,
+        # and candidates / candidate_files hold per-IP counts for top values
+        # when events aren't retained
+        self.rare_threshold = rare_threshold
+        self.sources = Frequencies() if rare_threshold > 0 else None
+        self.unsettled = False
+        self.candidates = {}
+        self.candidate_files = []
+
+    def add_event(self, event):
+        """Folds a single event into the running summary."""
+        key = (event.source, event.get("event_id", "unknown"))
+        entry = self.summary.get(key)
+
+        if entry is None:
+            entry = self.summary[key] = {
+                "count": 0,
+                "first_seen": None,
+                "last_seen": None,
+                "sample_events": []
+            }
+
+        # Increment count (in records) and widen first/last seen
+        repeat = event.repeat
+        if repeat is None:
+            entry["count"] += 1
+            self._update_seen(key, entry, event.epoch, event.timestamp, event.epoch, event.timestamp)
+        else:
+            entry["count"] += repeat.count
+            self._update_seen(key, entry, event.epoch, event.timestamp, repeat.last_epoch, repeat.last_timestamp)
+
+        if self.top:
+            self._count_top(event, 1 if repeat is None else repeat.count)
+
+        if self.rare_threshold and RARE_TAG in event.detections:
+            self._add_candidate(event.get("src_ip"), 1 if repeat is None else repeat.count)
+
+        # Store sample events (bounded)
+        if len(entry["sample_events"]) < self.MAX_SAMPLES:
+            entry["sample_events"].append(event.to_dict())
+
+        if self.sinks:
+            for sink in self.sinks:
+                sink.write(event)
+
+        if self.keep_events:
+            if not self.keep_raw:
+                event.drop_raw()
+            self.events.append(event)
+
+    def _update_seen(self, key, entry, first_epoch, first, last_epoch, last):
+        """
+        Widens an entry's first/last seen to include the given timestamps.
+        Parsed (epoch) timestamps always win; unparseable ones are only
+        compared as strings while the entry has no parsed timestamp yet.
+        """
+        bounds = self.bounds.get(key)
+        if bounds is None:
+            bounds = self.bounds[key] = [None, None]
+
+        # Within the same second the strings decide (fractions are not in the epoch)
+        if first_epoch is not None:
+            if bounds[0] is None or first_epoch < bounds[0] or (
+                first_epoch == bounds[0] and first < entry["first_seen"]
+            ):
+                bounds[0] = first_epoch
+                entry["first_seen"] = first
+        elif bounds[0] is None and (entry["first_seen"] is None or first < entry["first_seen"]):
+            entry["first_seen"] = first
+
+        if last_epoch is not None:
+            if bounds[1] is None or last_epoch > bounds[1] or (
+                last_epoch == bounds[1] and last > entry["last_seen"]
+            ):
+                bounds[1] = last_epoch
+                entry["last_seen"] = last
+        elif bounds[1] is None and (entry["last_seen"] is None or last > entry["last_seen"]):
+            entry["last_seen"] = last
+
+    def _count_top(self, event, count):
+        top = self.top
+        get = event.get
+
+        for name in self.TOP_FIELDS:
+            value = get(name)
+            if value:
+                top[name].add(value, count)
+
+        if event.detections:
+            add = top["tag"].add
+            # Pending rarity tags are counted once settled
+            pending = RARE_TAG if self.rare_threshold else None
+            for tag in event.detections:
+                if tag != pending:
+                    add(tag, count)
+
+    def _add_candidate(self, src_ip, count):
+        self.sources.add(src_ip, count)
+        self.unsettled = True
+
+        if self.top and not self.keep_events:
+            candidates = self.candidates
+            candidates[src_ip] = candidates.get(src_ip, 0) + count
+            if len(candidates) > self.CANDIDATE_SPILL:
+                self._spill_candidates()
+
+    def _spill_candidates(self):
+        # Candidates are valid IP addresses, so plain "ip<TAB>count" lines do
+        fd, path = tempfile.mkstemp(prefix="logtriage-candidates-", suffix=".tsv")
+        with open(fd, "w", encoding="utf-8") as f:
+            f.writelines(f"{src_ip}\t{count}\n" for src_ip, count in self.candidates.items())
+        self.candidate_files.append(path)
+        self.candidates = {}
+
+    def _candidate_counts(self):
+        """(src_ip, count) of every pending tag; deletes the spill files."""
+        yield from self.candidates.items()
+        for path in self.candidate_files:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    src_ip, count = line.split("\t")
+                    yield src_ip, int(count)
+            os.remove(path)
+        self.candidates = {}
+        self.candidate_files = []
+
+    def add_batch(self, batch, tags, compact=False):
+        """
+        add_events() for the rows of a ColumnBatch, tagged with tags (row
+        -> detections, see Detector.tag_batch); returns the number of rows.
+
+        Rows become events only where one is needed: all of them if events
+        are kept or a sink writes every event, otherwise just the tagged
+        rows (for alert sinks) and the summary's sample events. The rest
+        is counted per column.
+        """
+        if self.keep_events or any(not sink.alerts_only for sink in self.sinks):
+            return self.add_events(batch.events(tags, compact))
+
+        source = batch.schema.source
+        keys = batch.column("event_id")
+
+        # event_id -> its rows, in order of first appearance (None = every row)
+        if keys is None:
+            groups = {"unknown": None}
+        elif len(set(keys)) == 1:
+            groups = {keys[0]: None}
+        else:
+            groups = defaultdict(list)
+            for row, event_id in enumerate(keys):
+                groups[event_id].append(row)
+
+        for event_id, rows in groups.items():
+            key = (source, event_id)
+            entry = self.summary.get(key)
+
+            if entry is None:
+                entry = self.summary[key] = {
+                    "count": 0,
+                    "first_seen": None,
+                    "last_seen": None,
+                    "sample_events": []
+                }
+
+            timestamps, epochs = batch.timestamps, batch.epochs
+            if rows is None:
+                rows = range(len(batch))
+            elif len(rows) > 1:
+                pick = itemgetter(*rows)
+                timestamps, epochs = pick(timestamps), pick(epochs)
+            else:
+                timestamps, epochs = (timestamps[rows[0]],), (epochs[rows[0]],)
+
+            entry["count"] += len(rows)
+
+            # Same outcome as widening first/last seen row by row
+            if None in epochs:
+                parsed = [pair for pair in zip(epochs, timestamps) if pair[0] is not None]
+            else:
+                parsed = list(zip(epochs, timestamps))
+            if parsed:
+                (first_epoch, first), (last_epoch, last) = min(parsed), max(parsed)
+                self._update_seen(key, entry, first_epoch, first, last_epoch, last)
+            else:
+                self._update_seen(key, entry, None, min(timestamps), None, max(timestamps))
+
+            samples = entry["sample_events"]
+            for row in rows[:self.MAX_SAMPLES - len(samples)]:
+                samples.append(batch.event(row, tags.get(row), compact).to_dict())
+
+        if self.top:
+            for name in self.TOP_FIELDS:
+                column = batch.column(name)
+                if column is not None:
+                    add = self.top[name].add
+                    for value, count in Counter(column).items():
+                        if value:
+                            add(value, count)
+
+            add = self.top["tag"].add
+            pending = RARE_TAG if self.rare_threshold else None
+            for tag, count in Counter(chain.from_iterable(tags.values())).items():
+                if tag != pending:
+                    add(tag, count)
+
+        if self.rare_threshold:
+            src_ips = batch.column("src_ip")
+            for row, detections in tags.items():
+                if RARE_TAG in detections:
+                    self._add_candidate(src_ips[row], 1)
+
+        if self.sinks:
+            for row, detections in tags.items():
+                event = batch.event(row, detections, compact)
+                for sink in self.sinks:
+                    sink.write(event)
+
+        return len(batch)
 
     def add_events(self, events):
-        self.events.extend(events)
+        """Consumes any iterable of events; returns how many were added."""
+        count = 0
+        for event in events:
+            self.add_event(event)
+            count += 1
+        return count
+
+
+    def merge(self, other):
+        """
+        Folds another Reporter's results into this one, as if its events
+        had been added here after everything seen so far.
+        """
+        for key, theirs in other.summary.items():
+            entry = self.summary.get(key)
+
+            if entry is None:
+                self.summary[key] = {
+                    "count": theirs["count"],
+                    "first_seen": theirs["first_seen"],
+                    "last_seen": theirs["last_seen"],
+                    "sample_events": list(theirs["sample_events"])
+                }
+                if key in other.bounds:
+                    self.bounds[key] = list(other.bounds[key])
+                continue
+
+            entry["count"] += theirs["count"]
+
+            first, last = other.bounds.get(key, (None, None))
+            if theirs["first_seen"] is not None:
+                self._update_seen(key, entry, first, theirs["first_seen"], last, theirs["last_seen"])
+
+            room = self.MAX_SAMPLES - len(entry["sample_events"])
+            if room > 0:
+                entry["sample_events"].extend(theirs["sample_events"][:room])
+
+        if self.keep_events:
+            self.events.extend(other.events)
+
+        self.collapsed += other.collapsed
+
+        if other.sources is not None:
+            if self.sources is None:
+                self.sources = Frequencies()
+            self.sources.merge(other.sources)
+        self.unsettled = self.unsettled or other.unsettled
+
+        if other.candidates:
+            candidates = self.candidates
+            for src_ip, count in other.candidates.items():
+                candidates[src_ip] = candidates.get(src_ip, 0) + count
+            if len(candidates) > self.CANDIDATE_SPILL:
+                self._spill_candidates()
+        self.candidate_files.extend(other.candidate_files)
+
+        for name, summary in self.top.items():
+            theirs = other.top.get(name)
+            if theirs is not None:
+                summary.merge(theirs)
+
+        if other.profiler is not None:
+            if self.profiler is None:
+                self.profiler = Profiler()
+            self.profiler.merge(other.profiler)
+
+        # Sink output of the other reporter goes after ours
+        if self.sinks:
+            for parts in other.sink_parts:
+                for sink, part in zip(self.sinks, parts):
+                    sink.absorb(part)
+        else:
+            self.sink_parts.extend(other.sink_parts)
+
+
+    # ------------------------------------------------------------
+    # Rarity
+    # ------------------------------------------------------------
+    def settle_rarity(self, rare=None):
+        """
+        Decides the pending rare_external_ip tags once every event was
+        added: tags of source IPs rare(ip) accepts stay (by default those
+        seen at most rare_threshold times per sources), the others are
+        taken off retained events, sample events, top values and the open
+        sinks. Sinks are settled even without pending tags of our own, as
+        they may hold merged part files that had some.
+        """
+        if not self.rare_threshold:
+            return
+        if rare is None:
+            rare = rare_sources(self.sources, self.rare_threshold)
+
+        if self.unsettled:
+            kept = 0
+            for event in self.events:
+                detections = event.detections
+                if RARE_TAG in detections:
+                    if rare(event.get("src_ip")):
+                        kept += event.count
+                    else:
+                        event.detections = [tag for tag in detections if tag != RARE_TAG]
+
+            if self.top and not self.keep_events:
+                kept = sum(count for src_ip, count in self._candidate_counts() if rare(src_ip))
+            if kept and self.top:
+                self.top["tag"].add(RARE_TAG, kept)
+
+            for entry in self.summary.values():
+                for sample in entry["sample_events"]:
+                    detections = sample["detections"]
+                    if RARE_TAG in detections and not rare(sample["normalized"].get("src_ip")):
+                        sample["detections"] = [tag for tag in detections if tag != RARE_TAG]
+
+            self.unsettled = False
+
+        for sink in self.sinks:
+            sink.settle(RARE_TAG, rare)
+
+
+    # ------------------------------------------------------------
+    # Streaming sinks
+    # ------------------------------------------------------------
+    def open_sinks(self, spec, part=False):
+        """Starts writing every added event to the sinks described by spec (a SinkSpec)."""
+        self.sinks = spec.open(part=part)
+        self.sinks_part = part
+
+    def flush_sinks(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close_sinks(self):
+        """
+        Closes the sinks. A partial reporter keeps its part files in
+        sink_parts for merge(); otherwise the written paths are returned.
+        """
+        results = [sink.close() for sink in self.sinks]
+        self.sinks = []
+
+        if self.sinks_part:
+            self.sink_parts.append(results)
+            return []
+
+        return [path for paths in results for path in paths]
+
+
+    def to_state(self):
+        """
+        JSON-friendly snapshot of the summary (retained events are not
+        included); settle_rarity() must have run. Source IP counts are
+        included, so a rebuilt Reporter still adds to rarity when merged.
+        """
+        state = {
+            "summary": [
+                [source, event_id, entry]
+                for (source, event_id), entry in self.summary.items()
+            ]
+        }
+        if self.top:
+            state["top"] = {name: summary.to_state() for name, summary in self.top.items()}
+        if self.sources is not None and self.sources.total:
+            state["sources"] = self.sources.to_state()
+        return state
+
+    @classmethod
+    def from_state(cls, state, keep_events=False, keep_raw=True):
+        """Rebuilds a Reporter from to_state() output."""
+        reporter = cls(keep_events=keep_events, keep_raw=keep_raw)
+
+        for source, event_id, entry in state.get("summary", []):
+            key = (source, event_id)
+            reporter.summary[key] = entry
+            # The kept strings re-parse to the same epochs
+            reporter.bounds[key] = [to_epoch(entry["first_seen"]), to_epoch(entry["last_seen"])]
+
+        # Checkpoints written without --top have none; merging them adds nothing
+        reporter.top = {name: MisraGries.from_state(top) for name, top in state.get("top", {}).items()}
+
+        if "sources" in state:
+            reporter.sources = Frequencies.from_state(state["sources"])
+
+        return reporter
 
 
     def summarize_events(self):
@@ -25,33 +495,21 @@ class Reporter:
         - first_seen
         - last_seen
         - sample_events (list of dicts)
-        """
-        summary = defaultdict(lambda: {
-            "count": 0,
-            "first_seen": None,
-            "last_seen": None,
-            "sample_events": []
-        })
-
-        for event in self.events:
-            key = (event.source, event.normalized.get("event_id", "unknown"))
-            entry = summary[key]
-
-            # Increment count
-            entry["count"] += 1
-
-            # First/last seen timestamps
-            if entry["first_seen"] is None or event.timestamp < entry["first_seen"]:
-                entry["first_seen"] = event.timestamp
-
-            if entry["last_seen"] is None or event.timestamp > entry["last_seen"]:
-                entry["last_seen"] = event.timestamp
 
-            # Store sample events (max 3)
-            if len(entry["sample_events"]) < 3:
-                entry["sample_events"].append(event.to_dict())
+        The summary is maintained incrementally by add_event().
+        """
+        return self.summary
 
-        return summary
+    def top_values(self):
+        """
+        field (or "tag") -> {"total", "error", "top": [(value, count), ...]}
+        for the fields seen, top_k values each. Counts may be up to
+        error below the true ones (0 = exact).
+        """
+        return {
+            name: {"total": summary.total, "error": summary.error, "top": summary.most_common(self.top_k)}
+            for name, summary in self.top.items() if summary.total
+        }
 
 
     # ------------------------------------------------------------
@@ -82,6 +540,25 @@ class Reporter:
 
             print()
 
+        if self.top_k:
+            self.print_top()
+
+    def print_top(self):
+        top = self.top_values()
+        if not top:
+            return
+
+        print(color_text(f"=== Top {self.top_k} Values ===\n", Color.BRIGHT_YELLOW))
+
+        for name, data in top.items():
+            print(color_text(f"[{name}] {data['total']} events", Color.BRIGHT_BLUE))
+            width = len(str(data["top"][0][1])) if data["top"] else 0
+            for value, count in data["top"]:
+                print(f"  {count:>{width}}  {value}")
+            if data["error"]:
+                print(color_text(f"  (counts may be up to {data['error']} too low)", Color.CYAN))
+            print()
+
     # ------------------------------------------------------------
     # Export JSON
     # ------------------------------------------------------------
@@ -99,41 +576,81 @@ class Reporter:
         print(color_text(f"[+] JSON report saved to {filepath}", Color.GREEN))
 
     # ------------------------------------------------------------
-    # Export CSV
+    # Export top values
     # ------------------------------------------------------------
-   
-    import csv
+    def export_top(self, filepath):
+        if not self.top_k:
+            return
+
+        top = {
+            name: {
+                "total": data["total"],
+                "error": data["error"],
+                "top": [{"value": value, "count": count} for value, count in data["top"]],
+            }
+            for name, data in self.top_values().items()
+        }
+
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(top, f, indent=4, default=str)
+
+        print(color_text(f"[+] Top values saved to {filepath}", Color.GREEN))
+
+    # ------------------------------------------------------------
+    # Export profile stats
+    # ------------------------------------------------------------
+    def export_stats(self, filepath, cache_stats=None):
+        if self.profiler is None:
+            return
 
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.profiler.to_dict(cache_stats), f, indent=4)
+
+        print(color_text(f"[+] Profile stats saved to {filepath}", Color.GREEN))
+
+    # ------------------------------------------------------------
+    # Export CSV
+    # ------------------------------------------------------------
     def export_csv(self, filepath):
-        
-        all_events = self.events  
+        all_events = self.events
+
+        if not self.keep_events:
+            print(color_text("[!] CSV export needs the full event list; use the streaming CSV writer instead.", Color.YELLOW))
+            return
 
         if not all_events:
             print("[!] No events to export.")
             return
 
-        # Dynamically collect all normalized keys across events
+        # Collect all normalized keys across events (once per schema for compact events)
         normalized_keys = set()
+        seen_schemas = set()
         for e in all_events:
-            normalized_keys.update(e.normalized.keys())
+            schema = e.schema
+            if schema is None:
+                normalized_keys.update(e.normalized.keys())
+            elif id(schema) not in seen_schemas:
+                seen_schemas.add(id(schema))
+                normalized_keys.update(schema.fields)
+
+        keys = sorted(normalized_keys)
 
         # Build headers
-        headers = ["timestamp", "source"] + sorted(normalized_keys) + ["detections"]
+        headers = ["timestamp", "source"] + keys + ["detections"]
+        if self.repeats:
+            headers += ["count", "last_timestamp"]
 
         with open(filepath, "w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerow(headers)
 
             for e in all_events:
-                row = [
-                    e.timestamp,
-                    e.source
-                ]
-                for key in sorted(normalized_keys):
-                    row.append(e.normalized.get(key, ""))
+                get = e.get
+                row = [e.timestamp, e.source]
+                row.extend(get(key, "") for key in keys)
                 row.append(";".join(e.detections))
+                if self.repeats:
+                    row.extend((e.count, e.last_timestamp))
                 writer.writerow(row)
 
         print(color_text(f"[+] CSV report saved to {filepath}", Color.GREEN))
-
-
@@ -0,0 +1,765 @@
+"""
+Declarative rule packs: Sigma-style detection rules in YAML or JSON,
+loaded with --rules and run by the Detector next to the built-in rules.
+
+    title: Encoded PowerShell
+    tag: encoded_powershell          # detection tag (default: slug of the title)
+    logsource: {category: process_creation}
+    detection:
+      selection:
+        Image|endswith: '\\powershell.exe'
+        CommandLine|contains: [' -enc ', ' -encodedcommand ']
+      filter:
+        User: 'NT AUTHORITY\\SYSTEM'
+      condition: selection and not filter
+
+A file holds one rule, several YAML documents, or a JSON object / list
+(or {"rules": [...]}). Supported:
+- field modifiers: contains, startswith, endswith, re, all, cased
+  (string matches are case-insensitive unless cased); a list of values
+  means any of them (all of them with |all), null means empty
+- conditions: and / or / not, parentheses, "1 of sel_*", "all of them"
+- field names: the normalized ones (command_line, url, ...) or the
+  common Sigma / Sysmon / Windows / web names in FIELD_ALIASES
+- logsource: category / product / service narrow the sources a rule
+  runs on (see LOGSOURCES); anything else runs on every source
+
+Compilation: every rule is reduced to groups of literals, one of each
+group having to occur in some field for the rule to match (e.g. Image
+ends with "\\powershell.exe" and CommandLine contains " -enc " or
+" -encodedcommand "); regexes contribute the fixed text of their
+pattern. Per source, the literals of each field are merged
+into one trie-shaped regex, so a single scan of a field value finds
+every candidate rule; only those (and the few rules without a usable
+literal) are then evaluated in full. A pack of hundreds of rules costs
+a handful of scans per event, not hundreds of checks.
+
+RulePacks watches its files: reload_if_changed() recompiles the packs
+when a file changed and swaps the new rule set in with one assignment,
+so follow / listen modes pick up edits without restarting. A pack that
+fails to load leaves the previous rules in place.
+"""
+
+import fnmatch
+import json
+import re
+import time
+from pathlib import Path
+
+from .color import color_text, Color
+
+try:
+    import yaml
+except ImportError:  # JSON packs work without PyYAML
+    yaml = None
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
+RULE_SUFFIXES = (".yml", ".yaml", ".json")
+
+# Seconds between checks of the rule files for changes
+RELOAD_INTERVAL = 2.0
+
+# Sigma / source field names -> normalized fields
+FIELD_ALIASES = {
+    "EventID": "event_id",
+    "Image": "process_path",
+    "OriginalFileName": "process_name",
+    "CommandLine": "command_line",
+    "ParentImage": "parent_process",
+    "ParentCommandLine": "parent_command_line",
+    "User": "user",
+    "TargetUserName": "user",
+    "SubjectUserName": "user",
+    "LogonType": "logon_type",
+    "SourceIp": "src_ip",
+    "IpAddress": "src_ip",
+    "DestinationIp": "dest_ip",
+    "NewProcessName": "process_name",
+    "ProcessId": "process_id",
+    "c-ip": "src_ip",
+    "cs-method": "method",
+    "c-uri": "url",
+    "c-uri-query": "url",
+    "cs-uri-query": "url",
+    "cs-uri-stem": "url",
+    "cs-version": "protocol",
+    "sc-status": "status",
+    "c-useragent": "user_agent",
+    "cs-user-agent": "user_agent",
+    "cs-referrer": "referrer",
+    "cs-referer": "referrer",
+}
+
+# Normalized fields a source keeps under another name: Windows 4688
+# events carry the full image path (NewProcessName) in process_name
+SOURCE_ALIASES = {
+    "windows_event": {"process_path": "process_name"},
+}
+
+# logsource value -> Event.source values the rule applies to
+LOGSOURCES = {
+    "process_creation": ("sysmon", "windows_event"),
+    "network_connection": ("sysmon",),
+    "sysmon": ("sysmon",),
+    "security": ("windows_event",),
+    "webserver": ("web",),
+    "proxy": ("web",),
+    "apache": ("web",),
+    "nginx": ("web",),
+}
+
+MODIFIERS = frozenset(("contains", "startswith", "endswith", "re", "all", "cased"))
+
+CONDITION_TOKEN = re.compile(r"\s*(\(|\)|[^\s()]+)")
+
+
+class RulePackError(ValueError):
+    """A rule file that can't be read or compiled."""
+
+
+# ------------------------------------------------------------
+# Field tests
+# ------------------------------------------------------------
+class FieldTest:
+    """One "field|modifiers: values" entry of a selection."""
+
+    def __init__(self, key, values):
+        name, *modifiers = key.split("|")
+        unknown = set(modifiers) - MODIFIERS
+        if unknown:
+            raise RulePackError(f"unsupported modifier(s) {', '.join(sorted(unknown))} in {key!r}")
+
+        self.field = FIELD_ALIASES.get(name, name)
+        self.match_all = "all" in modifiers
+        self.cased = "cased" in modifiers
+        self.op = next((m for m in modifiers if m in ("contains", "startswith", "endswith", "re")), "equals")
+
+        if not isinstance(values, list):
+            values = [values]
+        if not values:
+            raise RulePackError(f"no values for {key!r}")
+
+        # null / empty string match a missing or empty field
+        self.empty = any(value is None or value == "" for value in values)
+        strings = [value if isinstance(value, str) else _text(value) for value in values
+                   if value is not None and value != ""]
+
+        if self.op == "re":
+            try:
+                self.values = [re.compile(value) for value in strings]
+            except re.error as e:
+                raise RulePackError(f"bad regex in {key!r}: {e}") from None
+        else:
+            self.values = strings if self.cased else [value.lower() for value in strings]
+
+        self.check = self._compile()
+
+    def _compile(self):
+        values = self.values
+        op = self.op
+
+        if op == "equals" and not self.match_all:
+            members = frozenset(values)
+            test = members.__contains__
+        elif op == "re":
+            combine = all if self.match_all else any
+            test = lambda text: combine(pattern.search(text) is not None for pattern in values)
+        elif op == "contains":
+            combine = all if self.match_all else any
+            test = lambda text: combine(value in text for value in values)
+        elif op == "startswith" and not self.match_all:
+            prefixes = tuple(values)
+            test = lambda text: text.startswith(prefixes)
+        elif op == "endswith" and not self.match_all:
+            suffixes = tuple(values)
+            test = lambda text: text.endswith(suffixes)
+        else:
+            method = {"equals": str.__eq__, "startswith": str.startswith, "endswith": str.endswith}[op]
+            test = lambda text: all(method(text, value) for value in values)
+
+        # Regexes and cased matches see the original text, the rest lowercase
+        original = op == "re" or self.cased
+        empty = self.empty
+
+        def check(texts, lowered, i):
+            text = texts[i]
+            if not text:
+                return empty
+            if not values:
+                return False
+            return test(text if original else lowered[i])
+
+        return check
+
+    def literals(self):
+        """
+        Lowercase strings one of which occurs in the field whenever the
+        test passes, or None if there is no such guarantee.
+        """
+        if self.empty or not self.values:
+            return None
+
+        if self.op == "re":
+            required = [_regex_literals(pattern) for pattern in self.values]
+            if self.match_all:
+                required = [literals for literals in required if literals is not None]
+                return _best(required) if required else None
+            if any(literals is None for literals in required):
+                return None
+            return [literal for literals in required for literal in literals]
+
+        values = [value.lower() for value in self.values]
+        if self.match_all:
+            return [max(values, key=len)]
+        return values
+
+
+def _best(requirements):
+    """The most selective requirement: longest shortest literal, then fewest literals."""
+    return max(requirements, key=lambda literals: (min(map(len, literals)), -len(literals)))
+
+
+# Non-ASCII letters re.IGNORECASE matches with ASCII ones that lower()
+# doesn't map back: dotless i, long s, and the dot "İ".lower() leaves
+# after its "i". Applied to scanned text and literals alike
+CASE_FOLDS = str.maketrans({"\u0131": "i", "\u017f": "s", "\u0307": None})
+
+
+def _regex_literals(pattern):
+    """
+    Lowercase literals one of which occurs in every string the regex
+    matches (from its parse tree), or None if none can be derived.
+    """
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    return _sequence_literals(list(parsed))
+
+
+def _sequence_literals(items):
+    requirements = []
+    run = []
+
+    def end_run():
+        text = "".join(run)
+        run.clear()
+        # Non-ASCII text may lowercase differently in context; keep ASCII pieces
+        pieces = [piece.lower() for piece in re.split(r"[^\x00-\x7f]", text) if piece]
+        if pieces:
+            requirements.append([max(pieces, key=len)])
+
+    for op, av in items:
+        name = str(op)
+        if name == "LITERAL":
+            run.append(chr(av))
+            continue
+        end_run()
+
+        if name == "SUBPATTERN":
+            found = _sequence_literals(list(av[-1]))
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") and av[0] >= 1:
+            found = _sequence_literals(list(av[2]))
+        elif name == "ATOMIC_GROUP":
+            found = _sequence_literals(list(av))
+        elif name == "BRANCH":
+            branches = [_sequence_literals(list(branch)) for branch in av[1]]
+            found = None if any(b is None for b in branches) else [l for b in branches for l in b]
+        else:
+            found = None
+
+        if found:
+            requirements.append(found)
+
+    end_run()
+    return _best(requirements) if requirements else None
+
+
+def _text(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+# ------------------------------------------------------------
+# Conditions
+# ------------------------------------------------------------
+class Selection:
+    """Named detection item: a map (tests AND-ed) or a list of maps (OR-ed)."""
+
+    def __init__(self, name, body):
+        self.name = name
+        maps = body if isinstance(body, list) else [body]
+        if not maps or not all(isinstance(item, dict) and item for item in maps):
+            raise RulePackError(f"selection {name!r} must be a field map or a list of field maps "
+                                f"(keyword lists are not supported)")
+        self.alternatives = [[FieldTest(key, values) for key, values in item.items()] for item in maps]
+
+    def fields(self):
+        return {test.field for tests in self.alternatives for test in tests}
+
+    def requirement(self):
+        """
+        Literal groups a match needs: each group is a list of (field,
+        literal) pairs, one of which must occur. [] requires nothing.
+        """
+        per_map = []
+        for tests in self.alternatives:
+            groups = []
+            for test in tests:
+                literals = test.literals()
+                if literals is not None:
+                    groups.append([(test.field, literal) for literal in literals])
+            per_map.append(groups)
+
+        if len(per_map) == 1:
+            return per_map[0]
+        # Any of several maps: one group, the union of each map's best one
+        if not all(per_map):
+            return []
+        return [[pair for groups in per_map for pair in _best_group(groups)]]
+
+    def compile(self, positions):
+        alternatives = [
+            [(test.check, positions[test.field]) for test in tests]
+            for tests in self.alternatives
+        ]
+
+        if len(alternatives) == 1:
+            checks = alternatives[0]
+            if len(checks) == 1:
+                check, i = checks[0]
+                return lambda texts, lowered: check(texts, lowered, i)
+            return lambda texts, lowered: all(check(texts, lowered, i) for check, i in checks)
+
+        return lambda texts, lowered: any(
+            all(check(texts, lowered, i) for check, i in checks) for checks in alternatives
+        )
+
+
+def parse_condition(text, selections):
+    """
+    Parses a condition into a nested tuple tree:
+    ("sel", name) / ("not", node) / ("and", [nodes]) / ("or", [nodes]).
+    """
+    if "|" in text:
+        raise RulePackError("aggregations in conditions (| count() ...) are not supported")
+
+    tokens = CONDITION_TOKEN.findall(text)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        token = peek()
+        if token is None:
+            raise RulePackError(f"condition {text!r} ends unexpectedly")
+        position += 1
+        return token
+
+    def expression():
+        nodes = [conjunction()]
+        while peek() == "or":
+            take()
+            nodes.append(conjunction())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def conjunction():
+        nodes = [negation()]
+        while peek() == "and":
+            take()
+            nodes.append(negation())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def negation():
+        if peek() == "not":
+            take()
+            return ("not", negation())
+        return atom()
+
+    def atom():
+        token = take()
+        if token == "(":
+            node = expression()
+            if take() != ")":
+                raise RulePackError(f"unbalanced parentheses in condition {text!r}")
+            return node
+
+        if token in ("1", "any", "all") and peek() == "of":
+            take()
+            pattern = take()
+            names = list(selections) if pattern == "them" else fnmatch.filter(selections, pattern)
+            if not names:
+                raise RulePackError(f"{pattern!r} matches no selection in condition {text!r}")
+            nodes = [("sel", name) for name in names]
+            return nodes[0] if len(nodes) == 1 else ("and" if token == "all" else "or", nodes)
+
+        if token not in selections:
+            raise RulePackError(f"unknown selection {token!r} in condition {text!r}")
+        return ("sel", token)
+
+    node = expression()
+    if peek() is not None:
+        raise RulePackError(f"unexpected {peek()!r} in condition {text!r}")
+    return node
+
+
+def _requirement(node, selections):
+    """Literal groups a condition needs (see Selection.requirement)."""
+    kind, value = node
+    if kind == "sel":
+        return selections[value].requirement()
+    if kind == "not":
+        return []
+
+    parts = [_requirement(child, selections) for child in value]
+    if kind == "and":
+        return [group for part in parts for group in part]
+
+    # or: one group, the union of every operand's best one
+    if not all(parts):
+        return []
+    return [[pair for part in parts for pair in _best_group(part)]]
+
+
+def _best_group(groups):
+    """The most selective group: longest shortest literal, then fewest pairs."""
+    return max(groups, key=lambda group: (min(len(literal) for _, literal in group), -len(group)))
+
+
+def _compile_node(node, selections, positions):
+    kind, value = node
+    if kind == "sel":
+        return selections[value].compile(positions)
+    if kind == "not":
+        inner = _compile_node(value, selections, positions)
+        return lambda texts, lowered: not inner(texts, lowered)
+
+    children = [_compile_node(child, selections, positions) for child in value]
+    if kind == "and":
+        return lambda texts, lowered: all(child(texts, lowered) for child in children)
+    return lambda texts, lowered: any(child(texts, lowered) for child in children)
+
+
+# ------------------------------------------------------------
+# Rules and rule sets
+# ------------------------------------------------------------
+class PackRule:
+    """One loaded rule: its tag, condition tree and literal requirement."""
+
+    def __init__(self, document, origin):
+        if not isinstance(document, dict):
+            raise RulePackError(f"{origin}: a rule must be a mapping")
+
+        self.title = str(document.get("title") or "")
+        self.tag = str(document.get("tag") or _slug(self.title) or "")
+        if not self.tag:
+            raise RulePackError(f"{origin}: rule needs a tag or a title")
+        self.origin = f"{origin} ({self.tag})"
+
+        detection = document.get("detection")
+        if not isinstance(detection, dict) or "condition" not in detection:
+            raise RulePackError(f"{self.origin}: detection with a condition is required")
+
+        try:
+            self.selections = {
+                name: Selection(name, body) for name, body in detection.items()
+                if name not in ("condition", "timeframe")
+            }
+            condition = detection["condition"]
+            if isinstance(condition, list):
+                condition = " or ".join(f"({item})" for item in condition)
+            self.condition = parse_condition(str(condition), self.selections)
+        except RulePackError as e:
+            raise RulePackError(f"{self.origin}: {e}") from None
+
+        self.sources = _logsources(document.get("logsource"))
+        self.required = _requirement(self.condition, self.selections)
+        self.fields = set().union(*(selection.fields() for selection in self.selections.values()))
+
+    def applies_to(self, source, available):
+        """Whether the rule can ever match events of this source."""
+        if self.sources is not None and source not in self.sources:
+            return False
+        if available is not None:
+            # A missing field never holds a required literal
+            aliases = SOURCE_ALIASES.get(source, {})
+            return all(any(aliases.get(field, field) in available for field, _ in group)
+                       for group in self.required)
+        return True
+
+    def compile(self, positions):
+        return _compile_node(self.condition, self.selections, positions)
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def _logsources(logsource):
+    if not isinstance(logsource, dict):
+        return None
+    sources = None
+    for key in ("category", "service", "product"):
+        mapped = LOGSOURCES.get(str(logsource.get(key, "")).lower())
+        if mapped is not None:
+            sources = set(mapped) if sources is None else sources & set(mapped)
+    return sources
+
+
+class SourceMatcher:
+    """A rule set compiled for one source: literal scanners plus full checks."""
+
+    def __init__(self, rules, source, available, positions=None):
+        from .rules import _make_getter
+
+        rules = [rule for rule in rules if rule.applies_to(source, available)]
+        fields = sorted(set().union(*(rule.fields for rule in rules))) if rules else []
+        index = {field: i for i, field in enumerate(fields)}
+
+        # Rule field -> the name this source stores it under
+        aliases = SOURCE_ALIASES.get(source, {})
+        stored = [aliases.get(field, field) for field in fields]
+
+        self.empty = not rules
+        self.getter = _make_getter(stored, available, positions) if fields else None
+        self.tags = [rule.tag for rule in rules]
+        self.checks = [rule.compile(index) for rule in rules]
+
+        # Rules without literal groups are checked on every event, the
+        # others once every one of their groups has a literal present
+        self.always = [i for i, rule in enumerate(rules) if not rule.required]
+        self.needed = [len(rule.required) for rule in rules]
+        self.group_rule = []
+
+        # field -> literal -> group numbers
+        literals = {}
+        for i, rule in enumerate(rules):
+            for group in rule.required:
+                number = len(self.group_rule)
+                self.group_rule.append(i)
+                for field, literal in group:
+                    if available is None or aliases.get(field, field) in available:
+                        literal = literal.translate(CASE_FOLDS)
+                        literals.setdefault(field, {}).setdefault(literal, set()).add(number)
+
+        self.scanners = [(index[field], *_scanner(by_literal)) for field, by_literal in sorted(literals.items())]
+
+    def match(self, row):
+        """Tags of the rules matching one normalized row, in load order."""
+        if self.empty:
+            return ()
+
+        values = self.getter(row)
+        texts = [None if value is None else (value if isinstance(value, str) else _text(value))
+                 for value in values]
+        lowered = [text.lower() if text else text for text in texts]
+
+        hits = set()
+        for i, scan, groups_for in self.scanners:
+            text = lowered[i]
+            if text:
+                if not text.isascii():
+                    text = text.translate(CASE_FOLDS)
+                for literal in scan(text):
+                    hits |= groups_for[literal]
+
+        candidates = list(self.always)
+        if hits:
+            counts = {}
+            group_rule = self.group_rule
+            for group in hits:
+                rule = group_rule[group]
+                counts[rule] = counts.get(rule, 0) + 1
+            needed = self.needed
+            candidates.extend(rule for rule, count in counts.items() if count == needed[rule])
+
+        checks = self.checks
+        return [self.tags[i] for i in sorted(candidates) if checks[i](texts, lowered)]
+
+
+def _scanner(by_literal):
+    """
+    (scan, groups_for): scan(text) returns the literals found in text, at
+    each position the longest one; groups_for[literal] includes the
+    groups of every literal that is a prefix of it (found at the same spot).
+    """
+    groups_for = {}
+    for literal in by_literal:
+        groups = set()
+        for other, numbers in by_literal.items():
+            if literal.startswith(other):
+                groups |= numbers
+        groups_for[literal] = groups
+
+    pattern = re.compile("(?=(" + _trie_pattern(sorted(by_literal)) + "))", re.S)
+    finditer = pattern.finditer
+
+    def scan(text):
+        return {match.group(1) for match in finditer(text)}
+
+    return scan, groups_for
+
+
+def _trie_pattern(literals):
+    """Regex matching any of the literals, shaped like a trie (longest match first)."""
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        ends = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            # Greedy: longer literals are tried before this one
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class RuleSet:
+    """Loaded rules, compiled per source on first use."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.matchers = {}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def matcher_for(self, source, available, positions=None, key=None):
+        key = source if key is None else key
+        matcher = self.matchers.get(key)
+        if matcher is None:
+            matcher = self.matchers[key] = SourceMatcher(self.rules, source, available, positions)
+        return matcher
+
+
+# ------------------------------------------------------------
+# Loading and reloading
+# ------------------------------------------------------------
+def rule_files(paths):
+    """Rule files under the given files / directories, in a stable order."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in RULE_SUFFIXES and p.is_file()))
+        else:
+            files.append(path)
+    return files
+
+
+def read_documents(path):
+    """The rule documents of one file."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        raise RulePackError(f"{path}: {e}") from None
+
+    if path.suffix.lower() == ".json":
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise RulePackError(f"{path}: invalid JSON ({e})") from None
+        if isinstance(data, dict) and "rules" in data:
+            data = data["rules"]
+        return data if isinstance(data, list) else [data]
+
+    if yaml is None:
+        raise RulePackError(f"{path}: YAML rule files need PyYAML (pip install pyyaml); JSON files work without it")
+    try:
+        return [document for document in yaml.safe_load_all(text) if document is not None]
+    except yaml.YAMLError as e:
+        mark = getattr(e, "problem_mark", None)
+        where = f" at line {mark.line + 1}" if mark is not None else ""
+        problem = getattr(e, "problem", None) or str(e).splitlines()[0]
+        raise RulePackError(f"{path}: invalid YAML{where} ({problem})") from None
+
+
+def load_rules(paths):
+    """Compiles every rule in the given files / directories into a RuleSet."""
+    rules = []
+    for path in rule_files(paths):
+        for number, document in enumerate(read_documents(path), 1):
+            if isinstance(document, dict) and document.get("enabled") is False:
+                continue
+            rules.append(PackRule(document, f"{path}#{number}"))
+    return RuleSet(rules)
+
+
+def _signature(paths):
+    files = rule_files(paths)
+    signature = []
+    for path in files:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        signature.append((str(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+class RulePacks:
+    """The rule packs of a run; reload_if_changed() swaps in edited packs."""
+
+    def __init__(self, paths):
+        self.paths = tuple(str(path) for path in paths)
+        self.signature = _signature(self.paths)
+        self.rules = load_rules(self.paths)
+        self.checked = time.monotonic()
+
+    def reload_if_changed(self, log=print, interval=RELOAD_INTERVAL):
+        """
+        Recompiles the packs if a file was added, removed or modified
+        (checked at most every interval seconds). Returns True if new
+        rules are in effect.
+        """
+        now = time.monotonic()
+        if now - self.checked < interval:
+            return False
+        self.checked = now
+
+        signature = _signature(self.paths)
+        if signature == self.signature:
+            return False
+        self.signature = signature
+
+        try:
+            rules = load_rules(self.paths)
+        except RulePackError as e:
+            log(color_text(f"[!] Rule packs not reloaded, keeping the previous rules: {e}", Color.YELLOW))
+            return False
+
+        # One assignment: events see either the old or the new rules, never a mix
+        self.rules = rules
+        log(color_text(f"[+] Reloaded rule packs: {len(rules)} rule(s)", Color.BRIGHT_BLUE))
+        return True
+
+
+# RulePacks per list of paths, shared by all Detectors of a process (so
+# per-file Detectors in worker processes compile the packs only once)
+_shared = {}
+
+
+def shared_packs(paths):
+    """The process-wide RulePacks for these paths, loaded on first use."""
+    key = tuple(str(path) for path in paths)
+    packs = _shared.get(key)
+    if packs is None:
+        packs = _shared[key] = RulePacks(key)
+    return packs
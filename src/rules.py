@@ -1,10 +1,42 @@
 """
 This module contains the regex-based detection rules
 and rule functions used against normalized logs in detector.py
+
+Each rule is written once as a check_* function that takes plain field
+values. RULES lists them together with the normalized fields they read,
+and compile_plan() turns that list into a per-source plan: only rules
+whose fields the source actually produces, with the field lookups
+prebuilt. The event-level functions (failed_login(event), ...) are kept
+for ad-hoc use.
+
+Rules marked cacheable are pure functions of their field values, so
+with_cache() can memoize them in bounded LRU caches; repeated values
+(scheduled-task command lines, health-check URLs, ...) then skip the
+regexes entirely.
+
+rare_external_ip classifies addresses with a CIDR trie (cidr.py).
+Rarity - only external sources seen at most a threshold number of times
+- is decided once the run's counts are known: the rule tags every
+external IP, the reporter counts them as they go by and
+Reporter.settle_rarity() drops the tags of frequent ones (see
+rare_sources()). Follow mode can't wait for the end, so with_rarity()
+counts as it checks instead.
+
+compile_batch_plan() and matching_rows() evaluate rules over a whole
+ColumnBatch (--batch, see event.py): each distinct value of a column is
+checked once, and only if the rule's prefilter, one scan over all those
+values joined together, found what the rule needs in it.
 """
 
 import re
 import os
+from collections import namedtuple
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate, chain, compress, repeat
+from operator import itemgetter
+
+from .cidr import NON_EXTERNAL, is_external
 
 # --- Regex patterns ---
 failed_login_pattern = re.compile(
@@ -31,63 +63,384 @@ web_traversal_pattern = re.compile(
     r"\.\./\.\./|\.\.\\\.\.\\"
 )
 
-# --- Rule functions ---
+# --- Linear-time matching ---
+# The patterns with ".*" gaps backtrack quadratically (web_sqli_pattern
+# cubically) on long values that contain the pieces but don't match. The
+# checks match them as pieces in order instead: the earliest match of
+# each piece leaves the most room for the next one, so this finds a match
+# exactly when the pattern does, in a few linear scans.
+failed_login_pieces = (
+    re.compile(r"failed|invalid", re.IGNORECASE),
+    re.compile(r"login", re.IGNORECASE),
+)
 
-def failed_login(event):
-    return any(
-        failed_login_pattern.search(str(value))
-        for value in (event.normalized.get("message"), event.normalized.get("description"))
-        if value
-    )
+suspicious_process_pieces = (
+    re.compile(r"powershell\.exe|cmd\.exe|wscript\.exe", re.IGNORECASE),
+    re.compile(r"-enc", re.IGNORECASE),
+)
 
-def suspicious_process(event):
+web_sqli_pieces = (
+    re.compile(r"\bor\b|\band\b", re.IGNORECASE),
+    re.compile(r"[=<>]"),
+    re.compile(r"\b\d\b|['\"%]"),
+)
+
+# Literal prefilters: a value can only match if it contains one literal
+# of every group (lowercase, checked with `in` on the lowercased value),
+# so most values never reach a regex
+FAILED_LOGIN_LITERALS = (("failed", "invalid"), ("login",))
+SUSPICIOUS_PROCESS_LITERALS = (("powershell.exe", "cmd.exe", "wscript.exe"), ("-enc",))
+WEB_SQLI_LITERALS = (("or", "and"), ("=", "<", ">"))
+WEB_RCE_LITERALS = ((";", "||", "&&"), ("wget", "curl", "sh"))
+WEB_TRAVERSAL_LITERALS = ("../../", "..\\..\\")
+
+# --- Matching helpers ---
+
+def _has_literals(value, groups):
+    """False if value lacks every literal of some group, i.e. can't match."""
+    # re.IGNORECASE also folds a few non-ASCII letters (dotless i, long s)
+    # onto ASCII ones, which lower() doesn't; only prefilter ASCII values
+    if not value.isascii():
+        return True
+
+    value = value.lower()
+    for group in groups:
+        for literal in group:
+            if literal in value:
+                break
+        else:
+            return False
+    return True
+
+def _search_pieces(pieces, value):
+    """True if the pieces match one after another within one line of value."""
+    # "." in the original patterns doesn't cross newlines
+    for line in value.split("\n") if "\n" in value else (value,):
+        position = 0
+        for piece in pieces:
+            match = piece.search(line, position)
+            if match is None:
+                break
+            position = match.end()
+        else:
+            return True
+    return False
+
+# --- Constants ---
+BINARY_WHITELIST = frozenset(["explorer.exe", "cmd.exe", "powershell.exe", "svchost.exe"])
+
+
+# --- Value-level checks ---
+
+def check_failed_login(message, description):
+    for value in (message, description):
+        if value:
+            value = str(value)
+            if _has_literals(value, FAILED_LOGIN_LITERALS) and _search_pieces(failed_login_pieces, value):
+                return True
+    return False
+
+def check_suspicious_process(parent_process, process_name, command_line):
     """Detects suspicious encoded commands in common LOLBins."""
-    return any(
-        suspicious_process_pattern.search(value)
-        for value in (event.normalized.get("parent_process"), 
-                      event.normalized.get("process_name"), 
-                      event.normalized.get("command_line"))
-        if value
-    )
+    for value in (parent_process, process_name, command_line):
+        if value and _has_literals(value, SUSPICIOUS_PROCESS_LITERALS) \
+                and _search_pieces(suspicious_process_pieces, value):
+            return True
+    return False
 
-def suspicious_binary(event):
-    process_path = event.normalized.get("process_name", "").lower()
-    process_name = os.path.basename(process_path)
+def check_suspicious_binary(process_path):
+    process_name = os.path.basename((process_path or "").lower())
 
-    whitelist = ["explorer.exe", "cmd.exe", "powershell.exe", "svchost.exe"]
-    
     if not process_name:
         return False
 
-    if process_name.endswith(".exe") and process_name not in whitelist:
-        #if parent_process in ["cmd.exe", "powershell.exe", "explorer.exe"]:
+    return process_name.endswith(".exe") and process_name not in BINARY_WHITELIST
+
+def check_base64_command(command_line):
+    return base64_pattern.search(command_line or "") is not None
+
+def check_rare_external_ip(src_ip):
+    """External (non-private, non-reserved) IPs; with_rarity() adds the frequency part."""
+    return is_external(src_ip)
+
+def check_web_attack(request, url):
+    target = request or url or ""
+
+    if any(literal in target for literal in WEB_TRAVERSAL_LITERALS):
+        return True
+
+    if _has_literals(target, WEB_SQLI_LITERALS) and _search_pieces(web_sqli_pieces, target):
+        return True
+
+    return _has_literals(target, WEB_RCE_LITERALS) and web_rce_pattern.search(target) is not None
+
+# --- Batch prefilters ---
+# A prefilter picks the values that may match out of all distinct values
+# a batch has for a rule's fields: it scans them joined by newlines in one
+# go and maps what it finds back to the values, so the check only runs on
+# those. Values must be strings (TypeError / AttributeError otherwise).
+
+def _joined(values):
+    """(text, starts): values joined by newlines, and where each one starts."""
+    starts = list(accumulate((len(value) + 1 for value in values[:-1]), initial=0))
+    return "\n".join(values), starts
+
+def _owners(pattern, text, starts):
+    """Indexes of the values with a match of pattern (one search per value found)."""
+    owners = []
+    match = pattern.search(text)
+    while match is not None:
+        i = bisect_right(starts, match.start()) - 1
+        owners.append(i)
+        if i + 1 == len(starts):
+            break
+        match = pattern.search(text, starts[i + 1])
+    return owners
+
+def _literal_prefilter(*alternatives):
+    """Values must hold one literal of every group of some alternative (as in _has_literals)."""
+    alternatives = [[tuple(group) for group in groups] for groups in alternatives]
+    patterns = {group: re.compile("|".join(map(re.escape, group)))
+                for groups in alternatives for group in groups}
+
+    def select(values):
+        # Like _has_literals, only ASCII values are prefiltered
+        others = [value for value in values if not value.isascii()]
+        values = [value for value in values if value.isascii()]
+        text, starts = _joined(values)
+        text = text.lower()
+
+        selected = set()
+        for groups in alternatives:
+            # Scan for the rarest group, then look for the others in what it found
+            first = min(groups, key=lambda group: sum(text.count(literal) for literal in group))
+            owners = _owners(patterns[first], text, starts)
+            for group in groups:
+                if group is not first and owners:
+                    lowered = [values[i].lower() for i in owners]
+                    owners = [i for i, value in zip(owners, lowered) if any(literal in value for literal in group)]
+            selected.update(owners)
+
+        return others + [values[i] for i in sorted(selected)]
+
+    return select
+
+def _pattern_prefilter(pattern):
+    """Values with a match of pattern (which must not match across a newline)."""
+    def select(values):
+        values = list(values)
+        text, starts = _joined(values)
+        return [values[i] for i in _owners(pattern, text, starts)]
+
+    return select
+
+# --- Rule table (order = order of tags on an event) ---
+
+# prefilter: see above (None = none). stateful: the check depends on the
+# values it saw before (live rarity counting), so batches must run it on
+# every record, in order
+Rule = namedtuple("Rule", ["name", "fields", "check", "cacheable", "prefilter", "stateful"],
+                  defaults=[False, None, False])
+
+# Tag of the rule rarity applies to (see with_rarity(), rare_sources())
+RARE_TAG = "rare_external_ip"
+
+RULES = (
+    # 1. Failed logins
+    Rule("failed_login", ("message", "description"), check_failed_login,
+         prefilter=_literal_prefilter(FAILED_LOGIN_LITERALS)),
+    # 2. Suspicious parent-child processes
+    Rule("suspicious_process", ("parent_process", "process_name", "command_line"), check_suspicious_process, True,
+         prefilter=_literal_prefilter(SUSPICIOUS_PROCESS_LITERALS)),
+    # 3. Base64 encoded commands
+    Rule("base64_command", ("command_line",), check_base64_command, True,
+         prefilter=_pattern_prefilter(base64_pattern)),
+    # 4. Rare external IPs
+    Rule(RARE_TAG, ("src_ip",), check_rare_external_ip),
+    # 5. Web attack patterns (SQLi, traversal, RCE)
+    Rule("web_attack", ("request", "url"), check_web_attack, True,
+         prefilter=_literal_prefilter((WEB_TRAVERSAL_LITERALS,), WEB_SQLI_LITERALS, WEB_RCE_LITERALS)),
+    # 6. Suspicious binary
+    Rule("suspicious_binary", ("process_name",), check_suspicious_binary, True),
+)
+
+
+def with_cache(rules=RULES, maxsize=65536):
+    """
+    Returns (rules, caches): a copy of the rule table where every
+    cacheable check is wrapped in an LRU cache of at most maxsize entries
+    keyed on its field values, and a dict of rule name -> cached check
+    (each has .cache_info() for hit/miss stats).
+    """
+    cached_rules = []
+    caches = {}
+
+    for rule in rules:
+        if rule.cacheable and maxsize > 0:
+            check = caches[rule.name] = lru_cache(maxsize=maxsize)(rule.check)
+            rule = rule._replace(check=check)
+        cached_rules.append(rule)
+
+    return tuple(cached_rules), caches
+
+def with_rarity(rules, counts, threshold, trie=NON_EXTERNAL):
+    """
+    Returns a copy of the rule table where rare_external_ip fires for
+    external IPs outside trie. With counts (sketches.Frequencies) every
+    external IP is counted as it is checked and only fires while seen at
+    most threshold times so far (follow mode); counts=None keeps every
+    external IP and the check stays pure, hence cacheable.
+    """
+    live = counts is not None
+
+    def check(src_ip):
+        if trie.lookup(src_ip) is not False:
+            return False
+        if not live:
             return True
-    
-    return False
+        return counts.add(src_ip) <= threshold
+
+    return tuple(
+        rule._replace(check=check, cacheable=not live, stateful=live) if rule.name == RARE_TAG else rule
+        for rule in rules
+    )
+
+def rare_sources(counts, threshold):
+    """Whether a source IP was seen at most threshold times per counts (sketches.Frequencies)."""
+    estimate = counts.estimate
+
+    def rare(src_ip):
+        return estimate(src_ip) <= threshold
+
+    return rare
+
+
+# A compiled rule: getter(row) returns the argument tuple for check, where
+# row is the normalized dict, or the values tuple of a CompactEvent
+PlanEntry = namedtuple("PlanEntry", ["name", "getter", "check"])
+
+
+def _make_getter(fields, available, positions=None):
+    if positions is not None:
+        # Tuple-backed rows: look fields up by index, missing ones read as None
+        if all(f in positions for f in fields):
+            keys = [positions[f] for f in fields]
+        else:
+            return lambda values: [values[positions[f]] if f in positions else None for f in fields]
+    elif available is not None and all(f in available for f in fields):
+        keys = list(fields)
+    else:
+        # Unknown schema or partial coverage: missing fields read as None
+        return lambda normalized: [normalized.get(f) for f in fields]
+
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda row: (row[key],)
+    return itemgetter(*keys)
+
+
+def compile_plan(available_fields=None, rules=RULES, positions=None):
+    """
+    Builds the list of rules to run for one source.
+
+    available_fields is the set of normalized keys the source always
+    produces; rules reading none of them are dropped. None means the
+    schema is unknown, so every rule is kept with safe .get() lookups.
+    positions (field -> index) compiles getters for tuple-backed rows.
+    """
+    if positions is not None:
+        available_fields = positions
+
+    available = frozenset(available_fields) if available_fields is not None else None
+    plan = []
+
+    for rule in rules:
+        if available is not None and not available.intersection(rule.fields):
+            continue
+        plan.append(PlanEntry(rule.name, _make_getter(rule.fields, available, positions), rule.check))
+
+    return tuple(plan)
 
 
+# A rule compiled for ColumnBatch rows: positions index the batch's columns,
+# None for fields the schema lacks (read as None)
+BatchEntry = namedtuple("BatchEntry", ["name", "positions", "check", "prefilter", "stateful"])
+
+
+def compile_batch_plan(positions, rules=RULES):
+    """compile_plan() for column batches of a schema with the given field -> index map."""
+    return tuple(
+        BatchEntry(rule.name, tuple(positions.get(f) for f in rule.fields), rule.check, rule.prefilter, rule.stateful)
+        for rule in rules if any(f in positions for f in rule.fields)
+    )
+
+
+def matching_rows(entry, columns, rows):
+    """Ascending numbers of the rows (of `rows`) whose values the entry's check accepts."""
+    args = [repeat(None, rows) if i is None else columns[i] for i in entry.positions]
+
+    if entry.stateful:
+        return list(compress(range(rows), map(entry.check, *args)))
+
+    if len(args) == 1:
+        values = args[0]
+        distinct = set(values)
+        parts = distinct
+    else:
+        values = list(zip(*args))
+        distinct = set(values)
+        parts = set(chain.from_iterable(distinct))
+
+    if entry.prefilter is not None:
+        try:
+            selected = entry.prefilter([value for value in parts if value])
+        except (TypeError, AttributeError):
+            # Not all strings; check every value
+            selected = None
+
+        if selected is not None:
+            if len(args) == 1:
+                distinct = selected
+            else:
+                selected = set(selected)
+                distinct = [value for value in distinct if not selected.isdisjoint(value)]
+
+    check = entry.check
+    if len(args) == 1:
+        hits = {value for value in distinct if check(value)}
+    else:
+        hits = {value for value in distinct if check(*value)}
+
+    if not hits:
+        return []
+    return list(compress(range(rows), map(hits.__contains__, values)))
+
+# --- Rule functions ---
+
+def failed_login(event):
+    return check_failed_login(event.get("message"), event.get("description"))
+
+def suspicious_process(event):
+    """Detects suspicious encoded commands in common LOLBins."""
+    return check_suspicious_process(
+        event.get("parent_process"),
+        event.get("process_name"),
+        event.get("command_line"),
+    )
+
+def suspicious_binary(event):
+    return check_suspicious_binary(event.get("process_name", ""))
 
 def base64_command(event):
-    return base64_pattern.search(event.normalized.get("command_line") or "") is not None
+    return check_base64_command(event.get("command_line"))
 
 def rare_external_ip(event):
-    """Very simple heuristic: External (non-RFC1918) IPs."""
-    if not event.normalized.get("src_ip"):
-        return False
-    
-    # RFC1918 private IP ranges
-    private_ranges = ("10.", "172.16.", "192.168.")
-    
-    return not event.normalized.get("src_ip").startswith(private_ranges)
+    """
+    External source IPs: outside the private / reserved ranges (and any
+    allowlist) of the CIDR trie. Which of them are rare is only known at
+    the end of a run (see rare_sources()).
+    """
+    return check_rare_external_ip(event.get("src_ip"))
 
 def web_attack(event):
-    
-    request = event.normalized.get("request") or ""
-    url = event.normalized.get("url") or ""
-
-    return (
-        web_sqli_pattern.search(request or url)
-        or web_rce_pattern.search(request or url)
-        or web_traversal_pattern.search(request or url)
-    )
-
+    return check_web_attack(event.get("request"), event.get("url"))
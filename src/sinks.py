@@ -0,0 +1,432 @@
+"""
+Streaming output writers.
+
+Sinks receive every event as it leaves the Detector and write it out
+immediately, so exports never need the full event list in memory:
+- JsonLinesSink: one JSON object per line (optionally alerts only)
+- CsvSink: one CSV per source with a fixed header taken from that
+  source's normalized field schema
+- SqliteSink: an indexed SQLite database for re-querying a run later
+  (see query.py)
+
+Worker processes write to private "part" files instead of the final
+outputs. The main process absorbs the parts in input order, so the final
+files are byte-for-byte what a serial run would produce.
+
+settle() takes a tag back off the events written so far where a
+predicate on their source IP says so (rarity is only decided at the end
+of a run, see Reporter.settle_rarity); it rewrites the final outputs in
+place, before they are closed.
+"""
+
+import contextlib
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from .parsers import SOURCE_FIELDS
+
+
+# Output buffer for sink files
+WRITE_BUFFER = 1024 * 1024
+
+# Events per executemany() / transaction in the SQLite sink
+SQLITE_BATCH = 5000
+
+
+class JsonLinesSink:
+    """Writes one JSON object per event (or per alerting event)."""
+
+    def __init__(self, path, alerts_only=False, part=False):
+        self.path = Path(path)
+        self.alerts_only = alerts_only
+        self.part = part
+        # Part files are created on first write, so skipped inputs leave nothing behind
+        self.file = None if part else self._open()
+
+    def _open(self):
+        return open(self.path, "w", encoding="utf-8", buffering=WRITE_BUFFER)
+
+    def write(self, event):
+        if self.alerts_only and not event.detections:
+            return
+        if self.file is None:
+            self.file = self._open()
+        self.file.write(json.dumps(event.to_dict(), default=str))
+        self.file.write("\n")
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        """Closes the file; returns what absorb() needs (part files) or the written paths."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        elif self.part:
+            return None
+
+        return self.path if self.part else [self.path]
+
+    def absorb(self, part_path):
+        """Appends a worker's part file and deletes it."""
+        if part_path is None:
+            return
+        self.file.flush()
+        with open(part_path, encoding="utf-8") as part:
+            shutil.copyfileobj(part, self.file, WRITE_BUFFER)
+        os.remove(part_path)
+
+    def settle(self, tag, keep):
+        """Takes tag off the written events whose src_ip keep() rejects (see module docstring)."""
+        if self.file is None or self.part:
+            return
+        self.file.close()
+
+        settled = self.path.with_name(f".{self.path.name}.settle")
+        with open(self.path, encoding="utf-8") as lines, \
+                open(settled, "w", encoding="utf-8", buffering=WRITE_BUFFER) as out:
+            for line in lines:
+                if tag in line:
+                    event = json.loads(line)
+                    detections = event["detections"]
+                    if tag in detections and not keep(event["normalized"].get("src_ip")):
+                        event["detections"] = [name for name in detections if name != tag]
+                        if self.alerts_only and not event["detections"]:
+                            continue
+                        line = json.dumps(event) + "\n"
+                out.write(line)
+
+        os.replace(settled, self.path)
+        self.file = open(self.path, "a", encoding="utf-8", buffering=WRITE_BUFFER)
+
+
+class CsvSink:
+    """Writes one <prefix>_<source>.csv per source, each with a fixed header."""
+
+    # Every event is written (see JsonLinesSink)
+    alerts_only = False
+
+    def __init__(self, directory, prefix="report", part=None, repeats=False):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.part = part
+        # With --dedup: count / last_timestamp columns after detections
+        self.repeats = repeats
+        # source -> (file, csv writer, field list)
+        self.outputs = {}
+
+    def path_for(self, source):
+        name = f"{self.prefix}_{source}.csv"
+        if self.part:
+            name = f".{name}.{self.part}"
+        return self.directory / name
+
+    def _open(self, source, fields):
+        f = open(self.path_for(source), "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER)
+        writer = csv.writer(f)
+
+        # Parts are headerless; the final file writes the header once
+        if not self.part:
+            extra = ["count", "last_timestamp"] if self.repeats else []
+            writer.writerow(["timestamp", "source"] + list(fields) + ["detections"] + extra)
+
+        output = self.outputs[source] = (f, writer, fields)
+        return output
+
+    def write(self, event):
+        source = event.source
+        output = self.outputs.get(source)
+
+        if output is None:
+            fields = SOURCE_FIELDS.get(source)
+            if fields is None:
+                # Unknown source: the header is fixed by its first event
+                fields = sorted(event.normalized)
+            fields = tuple(key for key in fields if key not in ("timestamp", "source"))
+            output = self._open(source, fields)
+
+        _, writer, fields = output
+        get = event.get
+
+        row = [event.timestamp, source]
+        row.extend(get(key, "") for key in fields)
+        row.append(";".join(event.detections))
+        if self.repeats:
+            row.extend((event.count, event.last_timestamp))
+        writer.writerow(row)
+
+    def flush(self):
+        for f, _, _ in self.outputs.values():
+            f.flush()
+
+    def close(self):
+        """Closes all files; returns what absorb() needs (part files) or the written paths."""
+        for f, _, _ in self.outputs.values():
+            f.close()
+
+        if self.part:
+            return {source: (self.path_for(source), fields) for source, (_, _, fields) in self.outputs.items()}
+        return [self.path_for(source) for source in self.outputs]
+
+    def absorb(self, parts):
+        """Appends a worker's part files (one per source) and deletes them."""
+        for source, (part_path, fields) in parts.items():
+            output = self.outputs.get(source) or self._open(source, fields)
+            output[0].flush()
+            with open(part_path, encoding="utf-8", newline="") as part:
+                shutil.copyfileobj(part, output[0], WRITE_BUFFER)
+            os.remove(part_path)
+
+    def settle(self, tag, keep):
+        """Takes tag off the written rows whose src_ip keep() rejects (see module docstring)."""
+        if self.part:
+            return
+
+        for source, (f, _, fields) in list(self.outputs.items()):
+            # Sources without a src_ip column can't have the tag
+            if "src_ip" not in fields:
+                continue
+            f.close()
+
+            # Columns: timestamp, source, fields..., detections
+            src_ip = 2 + fields.index("src_ip")
+            column = 2 + len(fields)
+
+            path = self.path_for(source)
+            settled = path.with_name(f".{path.name}.settle")
+            with open(path, encoding="utf-8", newline="") as rows, \
+                    open(settled, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER) as out:
+                reader = csv.reader(rows)
+                writer = csv.writer(out)
+                writer.writerow(next(reader))
+                for row in reader:
+                    detections = row[column].split(";")
+                    if tag in detections and not keep(row[src_ip]):
+                        row[column] = ";".join(name for name in detections if name != tag)
+                    writer.writerow(row)
+
+            os.replace(settled, path)
+            f = open(path, "a", newline="", encoding="utf-8", buffering=WRITE_BUFFER)
+            self.outputs[source] = (f, csv.writer(f), fields)
+
+
+class SqliteSink:
+    """
+    Writes every event into an SQLite database (WAL mode, batched
+    inserts). Indexes and the full-text index over command lines and
+    URLs are built once when the sink is closed, which is much faster
+    than maintaining them row by row.
+
+    Tables:
+    - events: one row per event; the common normalized fields as
+      columns, epoch for time ranges, count and last_epoch (records the
+      event stands for and the last one's time, see dedup.py), the full
+      event as JSON in data
+    - detections: (event, tag), one row per detection tag of an event
+    - events_fts: FTS5 index over events.command_line and events.url
+    """
+
+    # Every event is written (see JsonLinesSink)
+    alerts_only = False
+
+    COLUMNS = ("timestamp", "epoch", "source", "event_id", "user", "src_ip", "dest_ip",
+               "process_name", "command_line", "url", "status", "detections", "count", "last_epoch", "data")
+
+    # Normalized fields stored in their own column (after timestamp, epoch, source)
+    FIELD_COLUMNS = COLUMNS[3:-4]
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT, epoch INTEGER, source TEXT,
+            event_id TEXT, user TEXT, src_ip TEXT, dest_ip TEXT,
+            process_name TEXT, command_line TEXT, url TEXT, status TEXT,
+            detections TEXT, count INTEGER, last_epoch INTEGER, data TEXT
+        );
+        CREATE TABLE IF NOT EXISTS detections (
+            event INTEGER NOT NULL REFERENCES events (id),
+            tag TEXT NOT NULL
+        );
+    """
+
+    INDEXES = """
+        CREATE INDEX IF NOT EXISTS events_epoch ON events (epoch);
+        CREATE INDEX IF NOT EXISTS events_source ON events (source, epoch);
+        CREATE INDEX IF NOT EXISTS events_src_ip ON events (src_ip, epoch);
+        CREATE INDEX IF NOT EXISTS detections_tag ON detections (tag, event);
+        CREATE INDEX IF NOT EXISTS detections_event ON detections (event);
+        CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+            command_line, url, content='events', content_rowid='id'
+        );
+        INSERT INTO events_fts (events_fts) VALUES ('rebuild');
+    """
+
+    def __init__(self, path, part=False):
+        self.path = Path(path)
+        self.part = part
+        self.rows = []
+        self.tags = []
+        self.next_id = 1
+        self.db = None if part else self._open()
+
+    def _open(self):
+        # A new run replaces the previous database
+        for suffix in ("", "-wal", "-shm"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(f"{self.path}{suffix}")
+
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")
+        db.executescript(self.SCHEMA)
+        return db
+
+    def write(self, event):
+        row_id = self.next_id
+        self.next_id += 1
+
+        get = event.get
+        row = [row_id, event.timestamp, event.epoch, event.source]
+        row.extend(get(column) or None for column in self.FIELD_COLUMNS)
+        row.append(";".join(event.detections))
+        row.append(event.count)
+        row.append(event.last_epoch)
+        row.append(json.dumps(event.to_dict(), default=str))
+        self.rows.append(row)
+
+        for tag in event.detections:
+            self.tags.append((row_id, tag))
+
+        if len(self.rows) >= SQLITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.db is None:
+            # Part databases are created on first write, like JSONL parts
+            self.db = self._open()
+
+        placeholders = ", ".join("?" * (len(self.COLUMNS) + 1))
+        with self.db:
+            self.db.executemany(f"INSERT INTO events (id, {', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                                self.rows)
+            self.db.executemany("INSERT INTO detections (event, tag) VALUES (?, ?)", self.tags)
+        self.rows = []
+        self.tags = []
+
+    def close(self):
+        """Writes what is pending; returns what absorb() needs (part files) or the written paths."""
+        self.flush()
+
+        if self.db is None:
+            return None
+
+        if not self.part:
+            self.db.executescript(self.INDEXES)
+            self.db.execute("PRAGMA optimize")
+            # Fold the WAL back into the main file so it can be copied alone
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        self.db.close()
+        self.db = None
+        return self.path if self.part else [self.path]
+
+    def absorb(self, part_path):
+        """Appends a worker's part database (ids shifted after ours) and deletes it."""
+        if part_path is None:
+            return
+        self.flush()
+
+        offset = self.next_id - 1
+        columns = ", ".join(self.COLUMNS)
+        self.db.execute("ATTACH DATABASE ? AS part", (str(part_path),))
+        with self.db:
+            self.db.execute(f"INSERT INTO events (id, {columns}) "
+                            f"SELECT id + ?, {columns} FROM part.events ORDER BY id", (offset,))
+            self.db.execute("INSERT INTO detections (event, tag) "
+                            "SELECT event + ?, tag FROM part.detections ORDER BY rowid", (offset,))
+        self.next_id = self.db.execute("SELECT coalesce(max(id), 0) + 1 FROM events").fetchone()[0]
+        self.db.execute("DETACH DATABASE part")
+
+        for suffix in ("", "-wal", "-shm"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(f"{part_path}{suffix}")
+
+    def settle(self, tag, keep):
+        """Takes tag off the written events whose src_ip keep() rejects (see module docstring)."""
+        if self.part:
+            return
+        self.flush()
+
+        # Walked in rowid ranges, so rows aren't updated under an open cursor
+        # (and without the indexes, which are only built on close)
+        last = 0
+        while True:
+            rows = self.db.execute(
+                "SELECT detections.rowid, events.id, events.src_ip, events.detections, events.data "
+                "FROM detections JOIN events ON events.id = detections.event "
+                "WHERE detections.rowid > ? AND detections.tag = ? ORDER BY detections.rowid LIMIT ?",
+                (last, tag, SQLITE_BATCH),
+            ).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+
+            updates = []
+            dropped = []
+            for rowid, row_id, src_ip, detections, data in rows:
+                if keep(src_ip):
+                    continue
+                event = json.loads(data)
+                event["detections"] = [name for name in event["detections"] if name != tag]
+                remaining = ";".join(name for name in detections.split(";") if name != tag)
+                updates.append((remaining, json.dumps(event), row_id))
+                dropped.append((rowid,))
+
+            with self.db:
+                self.db.executemany("UPDATE events SET detections = ?, data = ? WHERE id = ?", updates)
+                self.db.executemany("DELETE FROM detections WHERE rowid = ?", dropped)
+
+
+@dataclass
+class SinkSpec:
+    """Which streaming outputs to write; picklable for worker processes."""
+    directory: Path
+    jsonl: bool = False
+    csv: bool = False
+    sqlite: bool = False
+    alerts_only: bool = False
+    # Collapsed duplicates get count / last_timestamp CSV columns (--dedup)
+    repeats: bool = False
+
+    def __bool__(self):
+        return self.jsonl or self.csv or self.sqlite
+
+    def open(self, part=False):
+        """
+        Opens the sinks. part=True opens private part files for a worker;
+        their close() results are handed to the main sinks' absorb().
+        """
+        tag = uuid.uuid4().hex if part else None
+        sinks = []
+
+        if self.jsonl:
+            name = "report.jsonl" if tag is None else f".report.jsonl.{tag}"
+            sinks.append(JsonLinesSink(self.directory / name, self.alerts_only, part))
+
+        if self.csv:
+            sinks.append(CsvSink(self.directory, part=tag, repeats=self.repeats))
+
+        if self.sqlite:
+            name = "report.sqlite" if tag is None else f".report.sqlite.{tag}"
+            sinks.append(SqliteSink(self.directory / name, part))
+
+        return sinks
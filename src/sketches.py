@@ -0,0 +1,304 @@
+"""
+Fixed-memory frequency counting for high-cardinality values (IPs, ...).
+
+CountMinSketch keeps `depth` rows of `width` counters. A value hashes to
+one counter per row, adding increments those counters, and the smallest
+of them is an upper bound on the value's true count. Memory is fixed
+(depth * width * 4 bytes) no matter how many distinct values are seen.
+
+estimate() corrects for the noise every counter picks up from the rest
+of the stream (count-mean-min), so small counts - which is what rarity
+scoring asks about - stay meaningful on large inputs.
+
+The sketch is linear: merge() adds two sketches counter by counter and
+gives exactly the sketch of the combined stream, so per-worker sketches
+merge into the same result as a serial run. Hashing is CRC32-based, so
+it is identical in every process (unlike hash() on strings).
+
+A small top-K of the heaviest values is tracked alongside.
+
+MisraGries answers the other question, which values are most frequent,
+for fields with too many distinct values to count exactly (URLs, user
+agents, ...): it keeps at most `capacity` counters, and once new values
+have doubled that, every counter gives up the (capacity + 1)-th largest
+count and those that reach zero are dropped. Every value's count is then
+too low by at most `error`, the total given up per counter, which never
+exceeds total / (capacity + 1). Summaries merge (add the
+counters, then cut back to capacity) with the same guarantee, so
+per-worker or per-file summaries combine into one.
+
+Frequencies counts values exactly while there are few distinct ones and
+moves them into a CountMinSketch once there are more than EXACT_LIMIT.
+The switch depends only on how many distinct values were added, so
+merged per-worker (or per-file) counts switch exactly when a serial run
+would. Both kinds save to JSON-friendly state, the sketch's table
+compressed.
+"""
+
+import base64
+import sys
+import zlib
+from array import array
+from zlib import crc32
+
+
+DEFAULT_WIDTH = 1 << 18
+DEFAULT_DEPTH = 4
+DEFAULT_TOP_K = 10
+
+# Counters per MisraGries summary
+DEFAULT_CAPACITY = 1024
+
+# Distinct values Frequencies counts exactly before using a sketch
+EXACT_LIMIT = 16384
+
+# Second hash seed (double hashing: row i uses h1 + i * h2)
+_SEED = 0x9E3779B9
+
+
+class CountMinSketch:
+    def __init__(self, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH, top_k=DEFAULT_TOP_K):
+        self.width = width
+        self.depth = depth
+        self._rows = range(depth)
+        self.table = array("I", bytes(4 * width * depth))
+        self.total = 0
+
+        # Heavy-hitter candidates: value -> count estimate, at most top_k
+        self.top_k = top_k
+        self.top = {}
+        self._floor = 0
+
+    def _cells(self, value):
+        data = value.encode("utf-8", "replace")
+        h1 = crc32(data)
+        h2 = crc32(data, _SEED) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in self._rows]
+
+    def add(self, value, count=1):
+        """Counts value; returns its new (upper bound) count."""
+        table = self.table
+        upper = None
+
+        for cell in self._cells(value):
+            table[cell] += count
+            current = table[cell]
+            if upper is None or current < upper:
+                upper = current
+        self.total += count
+
+        if upper > self._floor and self.top_k or value in self.top:
+            self._track(value, upper)
+        return upper
+
+    def upper(self, value):
+        """Count-min estimate: never below the true count."""
+        table = self.table
+        return min(table[cell] for cell in self._cells(value))
+
+    def estimate(self, value):
+        """
+        Noise-corrected count: each counter is reduced by its expected
+        share of everything else, the median over rows is taken and then
+        capped by the count-min upper bound.
+        """
+        table = self.table
+        total = self.total
+        spread = self.width - 1
+
+        counts = [table[cell] for cell in self._cells(value)]
+        corrected = sorted(c - (total - c) / spread for c in counts)
+
+        middle = len(corrected) // 2
+        median = corrected[middle] if len(corrected) % 2 else (corrected[middle - 1] + corrected[middle]) / 2
+
+        return max(0, min(min(counts), round(median)))
+
+    def _track(self, value, count):
+        top = self.top
+        top[value] = count
+
+        if len(top) > self.top_k:
+            del top[min(top, key=top.get)]
+
+        # Until the top-K is full, anything qualifies
+        self._floor = min(top.values()) if len(top) >= self.top_k else 0
+
+    def merge(self, other):
+        """Adds another sketch of the same shape into this one."""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Can't merge sketches of different shapes")
+
+        if not other.total:
+            return
+
+        # Counter-wise addition done as one big-integer addition over the
+        # packed tables (32-bit lanes; counts never overflow a lane)
+        order = sys.byteorder
+        total = int.from_bytes(self.table.tobytes(), order) + int.from_bytes(other.table.tobytes(), order)
+        table = array("I")
+        table.frombytes(total.to_bytes(len(self.table) * self.table.itemsize, order))
+        self.table = table
+        self.total += other.total
+
+        # Re-rank the union of both candidate sets against the merged counts
+        candidates = set(self.top) | set(other.top)
+        self.top = {}
+        self._floor = 0
+        for value in sorted(candidates):
+            self._track(value, self.upper(value))
+
+    def most_common(self, n=None):
+        """[(value, count estimate), ...] of the heaviest tracked values."""
+        ranked = sorted(self.top.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n] if n is not None else ranked
+
+    def to_state(self):
+        # Mostly empty counters: the packed table compresses well
+        table = self.table
+        if sys.byteorder != "little":
+            table = array("I", table)
+            table.byteswap()
+        packed = base64.b64encode(zlib.compress(table.tobytes(), 1)).decode("ascii")
+        return {"width": self.width, "depth": self.depth, "total": self.total,
+                "top": [[value, count] for value, count in self.most_common()], "table": packed}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state["width"], state["depth"])
+        table = array("I")
+        table.frombytes(zlib.decompress(base64.b64decode(state["table"])))
+        if sys.byteorder != "little":
+            table.byteswap()
+        sketch.table = table
+        sketch.total = state["total"]
+        for value, count in state["top"]:
+            sketch._track(value, count)
+        return sketch
+
+
+class Frequencies:
+    def __init__(self):
+        # value -> count until more than EXACT_LIMIT values, then the sketch
+        self.exact = {}
+        self.sketch = None
+        self.total = 0
+
+    def add(self, value, count=1):
+        """Counts value; returns its new count (an upper bound once sketched)."""
+        self.total += count
+        if self.sketch is not None:
+            return self.sketch.add(value, count)
+
+        exact = self.exact
+        current = exact[value] = exact.get(value, 0) + count
+        if len(exact) > EXACT_LIMIT:
+            self._sketch()
+        return current
+
+    def _sketch(self):
+        sketch = CountMinSketch()
+        for value, count in self.exact.items():
+            sketch.add(value, count)
+        self.sketch = sketch
+        self.exact = {}
+
+    def estimate(self, value):
+        if self.sketch is not None:
+            return self.sketch.estimate(value)
+        return self.exact.get(value, 0)
+
+    def merge(self, other):
+        """Adds other's counts into this one."""
+        if other.sketch is not None:
+            if self.sketch is None:
+                self._sketch()
+            self.sketch.merge(other.sketch)
+            self.total += other.total
+            return
+
+        for value, count in other.exact.items():
+            self.add(value, count)
+
+    def most_common(self, n=None):
+        """[(value, count), ...] heaviest first (estimates once sketched)."""
+        if self.sketch is not None:
+            return self.sketch.most_common(n)
+        ranked = sorted(self.exact.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n] if n is not None else ranked
+
+    def to_state(self):
+        if self.sketch is not None:
+            return {"total": self.total, "sketch": self.sketch.to_state()}
+        return {"total": self.total, "exact": [[value, count] for value, count in self.exact.items()]}
+
+    @classmethod
+    def from_state(cls, state):
+        counts = cls()
+        counts.total = state["total"]
+        if "sketch" in state:
+            counts.sketch = CountMinSketch.from_state(state["sketch"])
+        else:
+            counts.exact = {value: count for value, count in state["exact"]}
+        return counts
+
+
+class MisraGries:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        # value -> count, too low by at most error; up to 2 * capacity
+        # entries between cuts, at most capacity after one
+        self.counts = {}
+        self.total = 0
+        self.error = 0
+
+    def add(self, value, count=1):
+        self.total += count
+        counts = self.counts
+        counts[value] = counts.get(value, 0) + count
+
+        # Cutting in batches keeps adds O(1) amortized
+        if len(counts) > 2 * self.capacity:
+            self._cut()
+
+    def merge(self, other):
+        """Adds another summary into this one (capacity stays this one's)."""
+        counts = self.counts
+        for value, count in other.counts.items():
+            counts[value] = counts.get(value, 0) + count
+        self.total += other.total
+        self.error += other.error
+        self._cut()
+
+    def _cut(self):
+        """
+        Back to capacity: every counter gives up the (capacity + 1)-th
+        largest count, which at least capacity + 1 counters can afford,
+        so error stays within total / (capacity + 1).
+        """
+        counts = self.counts
+        if len(counts) <= self.capacity:
+            return
+
+        cut = sorted(counts.values(), reverse=True)[self.capacity]
+        self.error += cut
+        self.counts = {value: count - cut for value, count in counts.items() if count > cut}
+
+    def most_common(self, n=None):
+        """[(value, count), ...] heaviest first; true counts are up to error higher."""
+        self._cut()
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n] if n is not None else ranked
+
+    def to_state(self):
+        counts = [[value, count] for value, count in self.most_common()]
+        return {"capacity": self.capacity, "total": self.total, "error": self.error, "counts": counts}
+
+    @classmethod
+    def from_state(cls, state):
+        summary = cls(state["capacity"])
+        summary.total = state["total"]
+        summary.error = state["error"]
+        summary.counts = {value: count for value, count in state["counts"]}
+        return summary
@@ -0,0 +1,179 @@
+"""
+Timestamp normalization: log timestamp strings -> integer epoch seconds (UTC).
+
+Parsers keep the original string for display and attach the epoch value
+to every event, so ordering and min/max (first_seen / last_seen) are
+plain integer comparisons that work across days, months and time zones.
+
+Hand-rolled fast paths cover the formats the parsers produce:
+- parse_clf: Apache/Nginx "03/Jan/2025:14:50:11 +0000"
+- parse_iso: Sysmon UtcTime "2025-01-03 14:32:11.123" and Windows
+  SystemTime "2025-01-03T14:32:11.1234567Z" (fractions are dropped,
+  an optional "+hh", "+hh:mm" or "+hhmm" offset is applied)
+Both memoize results in a small cache, since consecutive lines usually
+share the same second (parse_iso keys it by that second, as fractions
+make nearly every string unique). Anything else, out-of-range dates
+such as "2024-02-30" included, goes through to_epoch(), a slower
+generic parser; unparseable values ("N/A", "") give None.
+"""
+
+from datetime import datetime, timezone
+
+
+# Max distinct timestamp strings remembered per format
+CACHE_SIZE = 4096
+
+MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
+}
+
+# Days per month outside leap years
+MONTH_DAYS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+_clf_cache = {}
+_iso_cache = {}
+# First 19 characters ("2025-01-03 14:32:11") -> epoch before the zone offset
+_iso_seconds = {}
+
+# Cache marker, so unparseable strings are cached (as None) too
+_MISSING = object()
+
+
+def days_from_civil(year, month, day):
+    """Days since 1970-01-01 for a proleptic Gregorian date (no datetime objects)."""
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _epoch(year, month, day, hour, minute, second):
+    """Epoch seconds of a UTC date and time; ValueError if a field is out of range."""
+    if not (1 <= month <= 12 and 1 <= day <= _month_days(year, month)
+            and 0 <= hour <= 23 and 0 <= minute <= 59 and 0 <= second <= 59):
+        raise ValueError("date or time out of range")
+    return ((days_from_civil(year, month, day) * 24 + hour) * 60 + minute) * 60 + second
+
+
+def _month_days(year, month):
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+    return MONTH_DAYS[month - 1]
+
+
+def _offset(zone):
+    """Seconds east of UTC of a "+hh", "+hh:mm" or "+hhmm" zone (ValueError otherwise)."""
+    digits = zone[1:]
+    if len(digits) == 5 and digits[2] == ":":
+        digits = digits[:2] + digits[3:]
+    if zone[0] not in "+-" or len(digits) not in (2, 4) or not (digits.isascii() and digits.isdigit()):
+        raise ValueError(f"bad zone offset {zone!r}")
+
+    hours, minutes = int(digits[:2]), int(digits[2:] or 0)
+    if hours > 23 or minutes > 59:
+        raise ValueError(f"bad zone offset {zone!r}")
+    offset = hours * 3600 + minutes * 60
+    return offset if zone[0] == "+" else -offset
+
+
+def _remember(cache, key, value):
+    if len(cache) >= CACHE_SIZE:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+def parse_clf(text):
+    """'03/Jan/2025:14:50:11 +0000' -> epoch seconds (None if unparseable)."""
+    epoch = _clf_cache.get(text, _MISSING)
+    if epoch is not _MISSING:
+        return epoch
+
+    try:
+        if text[2] != "/" or text[6] != "/" or text[11] != ":":
+            return _remember(_clf_cache, text, to_epoch(text))
+
+        epoch = _epoch(
+            int(text[7:11]), MONTHS[text[3:6]], int(text[0:2]),
+            int(text[12:14]), int(text[15:17]), int(text[18:20]),
+        )
+
+        # Zone offset: local time minus offset is UTC
+        zone = text[21:26]
+        if zone and zone != "+0000":
+            offset = int(zone[1:3]) * 3600 + int(zone[3:5]) * 60
+            epoch = epoch - offset if zone[0] == "+" else epoch + offset
+
+    except (IndexError, KeyError, ValueError, TypeError):
+        return _remember(_clf_cache, text, to_epoch(text))
+
+    return _remember(_clf_cache, text, epoch)
+
+
+def parse_iso(text):
+    """'2025-01-03 14:32:11.123' / '2025-01-03T14:32:11.1234567Z' -> epoch seconds."""
+    epoch = _iso_cache.get(text, _MISSING)
+    if epoch is not _MISSING:
+        return epoch
+
+    try:
+        if text[4] != "-" or text[7] != "-" or text[13] != ":":
+            return _remember(_iso_cache, text, to_epoch(text))
+
+        second = text[:19]
+        epoch = _iso_seconds.get(second)
+        if epoch is None:
+            epoch = _remember(_iso_seconds, second, _epoch(
+                int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                int(text[11:13]), int(text[14:16]), int(text[17:19]),
+            ))
+
+        # Skip fractional seconds; what's left is "", "Z" or an offset
+        zone = text[19:].lstrip(".0123456789")
+        if zone and zone != "Z":
+            epoch -= _offset(zone)
+
+    except (IndexError, ValueError, TypeError):
+        return _remember(_iso_cache, text, to_epoch(text))
+
+    return epoch
+
+
+def to_epoch(text):
+    """
+    Generic (slow) path: tries the fast formats by shape, then ISO 8601
+    via datetime. Naive times are taken as UTC. Returns None on failure.
+    """
+    if not text or type(text) is not str:
+        return None
+
+    text = text.strip()
+
+    if len(text) >= 20 and text[2:3] == "/" and text[11:12] == ":":
+        try:
+            stamp = datetime.strptime(text, "%d/%b/%Y:%H:%M:%S %z")
+        except ValueError:
+            return None
+        return int(stamp.timestamp())
+
+    # fromisoformat() rejects more than 6 fraction digits and "Z" on older Pythons
+    iso = text.replace("Z", "+00:00")
+    dot = iso.find(".")
+    if dot != -1:
+        end = dot + 1
+        while end < len(iso) and iso[end].isdigit():
+            end += 1
+        iso = iso[:dot] + iso[end:]
+
+    try:
+        stamp = datetime.fromisoformat(iso)
+    except ValueError:
+        return None
+
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return int(stamp.timestamp())
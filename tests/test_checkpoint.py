@@ -0,0 +1,112 @@
+"""
+Checkpointed runs against reading every input from scratch.
+
+Each file's entry holds its own summary, samples, top values and source
+IP counts; a run's report merges those of its inputs, so re-reading,
+resuming or dropping files must leave the report what a fresh run over
+the current inputs gives.
+"""
+
+import os
+import shutil
+
+import pytest
+
+from src.checkpoint import CheckpointStore, scan_inputs
+from src.pipeline import PipelineOptions, process_file
+from src.rules import RARE_TAG
+
+SAMPLES = os.path.join(os.path.dirname(__file__), "..", "sample_logs")
+
+LINE = '{ip} - - [03/Jan/2025:14:50:{second:02d} +0000] "GET /index.html HTTP/1.1" 200 512 "-" "Mozilla/5.0"\n'
+
+
+def checkpointed(paths, store_path, **settings):
+    """A --checkpoint run over paths (as main() does it); returns the report."""
+    options = PipelineOptions(top_k=10, **settings)
+    reporter = options.make_reporter()
+    store = CheckpointStore(store_path)
+
+    for _, _, count, file_reporter in scan_inputs(paths, options, store, options.make_detector()):
+        if count is not None:
+            reporter.merge(file_reporter)
+
+    store.forget_missing(paths)
+    store.save()
+    reporter.settle_rarity()
+    return reporter
+
+
+def fresh(paths, **settings):
+    options = PipelineOptions(top_k=10, **settings)
+    reporter = options.make_reporter()
+    detector = options.make_detector()
+    for path in paths:
+        process_file(path, options, detector, reporter, log=lambda message: None)
+    reporter.settle_rarity()
+    return reporter
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def report(reporter):
+    return reporter.summary, reporter.top_values()
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    paths = []
+    for name in ("windows_events.xml", "web_access.log", "sysmon_sample.csv"):
+        shutil.copy(os.path.join(SAMPLES, name), tmp_path / name)
+        paths.append(tmp_path / name)
+    return paths
+
+
+def test_rescanned_file_replaces_its_share(tmp_path, inputs):
+    store_path = tmp_path / "checkpoint.json"
+    expected = report(fresh(inputs))
+
+    for _ in range(3):
+        touch(inputs[0])
+        assert report(checkpointed(inputs, store_path)) == expected
+
+
+def test_unchanged_files_are_reused(tmp_path, inputs):
+    store_path = tmp_path / "checkpoint.json"
+    first = report(checkpointed(inputs, store_path))
+    assert report(checkpointed(inputs, store_path)) == first == report(fresh(inputs))
+
+
+def test_missing_files_drop_out(tmp_path, inputs):
+    store_path = tmp_path / "checkpoint.json"
+    checkpointed(inputs, store_path)
+
+    assert report(checkpointed(inputs[1:], store_path)) == report(fresh(inputs[1:]))
+    assert str(inputs[0]) not in CheckpointStore(store_path).files
+
+
+def test_rarity_counts_earlier_runs(tmp_path):
+    path = tmp_path / "access.log"
+    store_path = tmp_path / "checkpoint.json"
+    settings = {"log_type": "web", "rare_threshold": 2}
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(LINE.format(ip=ip, second=n) for n, ip in enumerate(["45.33.32.1", "45.33.32.1", "45.33.32.2"]))
+    first = checkpointed([path], store_path, **settings)
+    assert dict(first.top["tag"].most_common()) == {RARE_TAG: 3}
+
+    # 45.33.32.1 is seen a third time: the new line isn't rare, earlier tags stay
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(LINE.format(ip=ip, second=n) for n, ip in enumerate(["45.33.32.1", "45.33.32.3"], 10))
+    second = checkpointed([path], store_path, **settings)
+    assert dict(second.top["tag"].most_common()) == {RARE_TAG: 4}
+    assert second.sources.estimate("45.33.32.1") == 3
+
+    # Replaced by a copy (a new inode), it is read again from the start and counts once
+    shutil.copy(path, tmp_path / "copy.log")
+    os.replace(tmp_path / "copy.log", path)
+    third = checkpointed([path], store_path, **settings)
+    assert report(third) == report(fresh([path], **settings))
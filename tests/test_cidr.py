@@ -0,0 +1,45 @@
+"""CIDR trie lookups against the ipaddress module."""
+
+import ipaddress
+import itertools
+
+import pytest
+
+from src.cidr import NON_EXTERNAL, is_external
+
+OCTETS = ["0", "1", "01", "00", "10", "127", "168", "172", "192", "255", "256", "999", "1000",
+          "", " 1", "1 ", "+1", "-1", "1_0", "0x1", "1e1", "٣", "²"]
+
+
+def reference(address):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return None
+    return any(ip in ipaddress.ip_network(cidr) for cidr in ("10.0.0.0/8", "127.0.0.0/8", "192.168.0.0/16"))
+
+
+@pytest.mark.parametrize("first", ["10", "127", "192", "8", "1_0", " 10"])
+def test_ipv4_octets_as_ipaddress_reads_them(first):
+    for rest in itertools.product(OCTETS, repeat=3):
+        address = ".".join((first,) + rest)
+        found = NON_EXTERNAL.lookup(address)
+        expected = reference(address)
+        if expected is None:
+            assert found is None, repr(address)
+        elif expected:
+            assert found is True, repr(address)
+
+
+@pytest.mark.parametrize("address", ["1_0.0.0.1", " 8.8.8.8", "8.8.8.8 ", "8.8.8.08", "8.8.8.٣", "8.8.8.256"])
+def test_malformed_addresses_are_not_external(address):
+    assert NON_EXTERNAL.lookup(address) is None
+    assert not is_external(address)
+
+
+@pytest.mark.parametrize("address, external", [
+    ("8.8.8.8", True), ("10.1.2.3", False), ("172.16.0.1", False), ("172.32.0.1", True),
+    ("100.64.0.1", False), ("::ffff:10.0.0.1", False), ("2001:4860::8888", True),
+])
+def test_classification(address, external):
+    assert is_external(address) is external
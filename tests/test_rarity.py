@@ -0,0 +1,168 @@
+"""
+Rarity settled at the end of a run against counting first.
+
+rare_external_ip tags every external IP while events come in and
+Reporter.settle_rarity() keeps the tags of sources seen at most
+rare_threshold times; the result must be what tagging with the finished
+counts gives, in serial and merged partial reporters alike, in events,
+samples, top values and every sink.
+"""
+
+import csv
+import json
+import random
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from src.pipeline import PipelineOptions, process_file
+from src.rules import RARE_TAG
+from src.sinks import SinkSpec
+from src.sketches import EXACT_LIMIT, Frequencies
+
+THRESHOLD = 2
+
+LINE = '{ip} - - [03/Jan/2025:14:50:{second:02d} +0000] "GET {url} HTTP/1.1" 200 512 "-" "Mozilla/5.0"\n'
+
+
+def web_log(path, seed, lines=300):
+    generator = random.Random(seed)
+    ips = ["10.0.0.5", "192.168.1.9"] + [f"45.33.32.{n}" for n in range(40)]
+    urls = ["/index.html", "/login", "/../../etc/passwd", "/?id=1 or 1=1"]
+    ips_written = []
+    with open(path, "w", encoding="utf-8") as f:
+        for n in range(lines):
+            ip = generator.choice(ips[:12]) if generator.random() < 0.7 else generator.choice(ips)
+            ips_written.append(ip)
+            f.write(LINE.format(ip=ip, second=n % 60, url=generator.choice(urls)))
+    return Counter(ip for ip in ips_written if ip.startswith("45."))
+
+
+def run(paths, output, partial=False, **settings):
+    """Runs paths into one reporter, or (partial=True) one partial reporter per file merged like workers' are."""
+    options = PipelineOptions(log_type="web", rare_threshold=THRESHOLD, top_k=10,
+                              sinks=SinkSpec(output, jsonl=True, csv=True, sqlite=True), **settings)
+    output.mkdir()
+    reporter = options.make_reporter()
+    reporter.open_sinks(options.sinks)
+
+    detector = options.make_detector()
+    for path in paths:
+        if partial:
+            part = options.make_partial_reporter()
+            process_file(path, options, detector, part, log=lambda message: None)
+            part.close_sinks()
+            reporter.merge(part)
+        else:
+            process_file(path, options, detector, reporter, log=lambda message: None)
+
+    reporter.settle_rarity()
+    reporter.close_sinks()
+    return reporter
+
+
+def rare_ips(counts):
+    return {ip for ip, count in counts.items() if count <= THRESHOLD}
+
+
+@pytest.fixture
+def logs(tmp_path):
+    first, second = tmp_path / "a.log", tmp_path / "b.log"
+    counts = web_log(first, seed=1) + web_log(second, seed=2)
+    return [first, second], counts
+
+
+@pytest.mark.parametrize("settings", [{}, {"keep_events": False}, {"batch": 64}, {"keep_events": False, "batch": 64}])
+@pytest.mark.parametrize("partial", [False, True])
+def test_tags_only_rare_sources(tmp_path, logs, settings, partial):
+    paths, counts = logs
+    rare = rare_ips(counts)
+    assert rare and rare != set(counts)
+
+    reporter = run(paths, tmp_path / "out", partial, **settings)
+
+    for event in reporter.events:
+        assert (RARE_TAG in event.detections) == (event.get("src_ip") in rare)
+
+    for entry in reporter.summary.values():
+        for sample in entry["sample_events"]:
+            assert (RARE_TAG in sample["detections"]) == (sample["normalized"]["src_ip"] in rare)
+
+    tags = dict(reporter.top["tag"].most_common())
+    assert tags.get(RARE_TAG, 0) == sum(counts[ip] for ip in rare)
+
+    with open(tmp_path / "out" / "report.jsonl", encoding="utf-8") as f:
+        for line in f:
+            event = json.loads(line)
+            assert (RARE_TAG in event["detections"]) == (event["normalized"]["src_ip"] in rare)
+
+    with open(tmp_path / "out" / "report_web.csv", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            assert (RARE_TAG in row["detections"].split(";")) == (row["src_ip"] in rare)
+
+    db = sqlite3.connect(tmp_path / "out" / "report.sqlite")
+    tagged = {ip for ip, in db.execute("SELECT DISTINCT src_ip FROM events JOIN detections ON event = id "
+                                       "WHERE tag = ?", (RARE_TAG,))}
+    assert tagged == rare
+    for detections, data in db.execute("SELECT detections, data FROM events"):
+        assert detections.split(";") == (json.loads(data)["detections"] or [""])
+
+
+@pytest.mark.parametrize("settings", [{}, {"keep_events": False}, {"batch": 64}])
+def test_merged_partials_match_serial(tmp_path, logs, settings):
+    paths, _ = logs
+    serial = run(paths, tmp_path / "serial", **settings)
+    merged = run(paths, tmp_path / "merged", partial=True, **settings)
+
+    assert merged.summary == serial.summary
+    assert merged.top_values() == serial.top_values()
+    for name in ("report.jsonl", "report_web.csv"):
+        assert (tmp_path / "merged" / name).read_bytes() == (tmp_path / "serial" / name).read_bytes()
+
+
+def test_spilled_candidates_count_like_kept_ones(tmp_path, logs, monkeypatch):
+    paths, _ = logs
+    kept = run(paths, tmp_path / "kept", keep_events=False)
+
+    monkeypatch.setattr("src.reporter.Reporter.CANDIDATE_SPILL", 3)
+    spilled = run(paths, tmp_path / "spilled", keep_events=False, batch=16)
+
+    assert spilled.top_values() == kept.top_values()
+    assert not spilled.candidate_files
+
+
+def test_frequencies_switch_like_a_serial_count():
+    generator = random.Random(7)
+    half = EXACT_LIMIT * 3 // 4
+    values = [str(generator.randrange(2 * half)) for _ in range(8 * half)]
+
+    serial = Frequencies()
+    for value in values:
+        serial.add(value)
+
+    # Neither part alone has enough distinct values to switch
+    parts = [Frequencies(), Frequencies()]
+    for value in values:
+        parts[int(value) >= half].add(value)
+    assert parts[0].sketch is None and parts[1].sketch is None
+    merged = Frequencies()
+    merged.merge(parts[0])
+    merged.merge(parts[1])
+
+    assert serial.sketch is not None and merged.sketch is not None
+    assert merged.sketch.table == serial.sketch.table
+    assert merged.total == serial.total
+    assert all(merged.estimate(value) == serial.estimate(value) for value in values[:500])
+
+
+@pytest.mark.parametrize("distinct", [10, EXACT_LIMIT + 10])
+def test_frequencies_state_round_trip(distinct):
+    counts = Frequencies()
+    for n in range(distinct):
+        counts.add(f"198.51.100.{n}", n % 5 + 1)
+
+    restored = Frequencies.from_state(json.loads(json.dumps(counts.to_state())))
+    assert restored.total == counts.total
+    assert all(restored.estimate(f"198.51.100.{n}") == counts.estimate(f"198.51.100.{n}") for n in range(0, distinct, 7))
+    assert restored.most_common(3) == counts.most_common(3)
@@ -0,0 +1,66 @@
+"""Rule packs against the sources LOGSOURCES maps them to."""
+
+import pytest
+
+from src.detector import Detector
+from src.parsers.sysmon_parser import iter_sysmon_csv
+from src.parsers.wevt_parser import iter_wevt_messages
+from src.rulepacks import RulePacks
+
+RULE = """
+title: Encoded PowerShell
+tag: encoded_powershell
+logsource: {category: process_creation}
+detection:
+  selection:
+    Image|endswith: '\\powershell.exe'
+    CommandLine|contains: ' -enc '
+  condition: selection
+"""
+
+# Security 4688 (process creation): the image path is in NewProcessName
+EVENT_4688 = """<Event xmlns="http://schemas.microsoft.com/win/2004/08/events/event">
+  <System>
+    <EventID>4688</EventID>
+    <TimeCreated SystemTime="2024-03-01T10:00:00.000Z"/>
+  </System>
+  <EventData>
+    <Data Name="SubjectUserName">alice</Data>
+    <Data Name="NewProcessName">C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe</Data>
+    <Data Name="ProcessId">0x1a4</Data>
+    <Data Name="CommandLine">powershell.exe -nop -enc SQBFAFgA</Data>
+  </EventData>
+</Event>"""
+
+SYSMON_CSV = (
+    "UtcTime,EventID,Image,CommandLine,ParentImage,User\n"
+    "2024-03-01 10:00:00.000,1,C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe,"
+    "powershell.exe -nop -enc SQBFAFgA,C:\\Windows\\explorer.exe,CORP\\alice\n"
+)
+
+
+@pytest.fixture
+def detector(tmp_path):
+    path = tmp_path / "rules.yml"
+    path.write_text(RULE, encoding="utf-8")
+    return Detector(rule_packs=RulePacks([path]))
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_image_rule_matches_4688(detector, compact):
+    event, = iter_wevt_messages([EVENT_4688], compact=compact)
+    assert "encoded_powershell" in detector.tag(event).detections
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_image_rule_needs_the_image(detector, compact):
+    other = EVENT_4688.replace("powershell.exe</Data>", "cmd.exe</Data>")
+    event, = iter_wevt_messages([other], compact=compact)
+    assert "encoded_powershell" not in detector.tag(event).detections
+
+
+def test_image_rule_matches_sysmon(detector, tmp_path):
+    path = tmp_path / "sysmon.csv"
+    path.write_text(SYSMON_CSV, encoding="utf-8")
+    event, = iter_sysmon_csv(str(path))
+    assert "encoded_powershell" in detector.tag(event).detections
@@ -0,0 +1,119 @@
+"""
+The rule checks against the single regexes they replaced.
+
+check_failed_login, check_suspicious_process and check_web_attack match
+literal prefilters and ordered pieces instead of one regex with ".*"
+gaps; they must give the regexes' verdict on every value. The batch
+prefilters must keep every value the checks accept.
+"""
+
+import random
+import re
+
+import pytest
+
+from src import rules
+
+# The patterns as they were before the rewrite
+FAILED_LOGIN = re.compile(r"(failed|invalid).*login", re.IGNORECASE)
+SUSPICIOUS_PROCESS = re.compile(r"(powershell\.exe|cmd\.exe|wscript\.exe).*?-enc", re.IGNORECASE)
+WEB_SQLI = re.compile(r"(\bor\b|\band\b).*(=|<|>).*(\b\d\b|'|\"|\%)", re.IGNORECASE)
+WEB_RCE = re.compile(r"(;|\|\||&&)\s*(wget|curl|bash|sh)", re.IGNORECASE)
+WEB_TRAVERSAL = re.compile(r"\.\./\.\./|\.\.\\\.\.\\")
+
+
+def failed_login(message, description):
+    return any(FAILED_LOGIN.search(str(value)) for value in (message, description) if value)
+
+
+def suspicious_process(parent_process, process_name, command_line):
+    return any(SUSPICIOUS_PROCESS.search(value) for value in (parent_process, process_name, command_line) if value)
+
+
+def web_attack(request, url):
+    target = request or url or ""
+    return bool(WEB_SQLI.search(target) or WEB_RCE.search(target) or WEB_TRAVERSAL.search(target))
+
+
+CASES = [
+    "", " ",
+    # Case
+    "FAILED LOGIN", "Invalid Login attempt", "fAiLeD to LoGiN",
+    "PowerShell.EXE -ENC abc", "CMD.exe /c -Enc", "WSCRIPT.EXE-enc",
+    "id=1 OR 1=1", "x AND y>'", "; WGET http://x", "&& Curl x", "|| BASH", "; SH",
+    # Piece order
+    "login failed", "login invalid", "-enc powershell.exe", "-enc cmd.exe",
+    "1=1 or", "= or 1", "x or 1 =", "'= and", "wget;", "curl &&",
+    # Overlapping and adjacent literals
+    "failedlogin", "invalidlogin", "failed-invalid-login", "loginfailedlogin",
+    "cmd.exe-enc", "powershell.exe-encodedcommand", "cmd.exe powershell.exe -en c",
+    "or=1", "or= 1", "and<%", "or>\"", "a or=b", "orand=1", "for=1", "or_=1", "x or =1",
+    "or=or=", "and 1=", "or =x'", "x or 1=1a", "x or a=12",
+    ";sh", ";wgets", "||curl", "&&&&sh", "| sh", "& sh", ";\tbash", ";  wget",
+    "../../etc/passwd", "..\\..\\windows", "../..", "..\\..", "..././../",
+    # Newlines: "." never crosses one
+    "failed\nlogin", "failed login\nx", "x\nfailed login", "powershell.exe\n-enc",
+    "or\n=1", "or =\n1", "or =1\n", "; \nwget", ";\nsh", "../\n../",
+    # Non-ASCII: IGNORECASE folds a few letters lower() doesn't
+    "faıled login", "FAİLED login", "ınvalıd logın", "powerſhell.exe -enc",
+    "powershell.exe -ENC K", "oR 1=1 é", "éé failed login", "; ſh", "; wgét",
+    # Word boundaries around "or" / "and" / digits
+    "door=1", "or=10", "or=a1", "Or=1_", "band=1", "and=1 ", "(or)=(1)",
+]
+
+TOKENS = [
+    "failed", "invalid", "login", "FAILED", "LoGiN", "fail", "ed", "log", "in",
+    "powershell.exe", "cmd.exe", "wscript.exe", "PowerShell.EXE", "-enc", "-ENC", "-en", "c", ".exe",
+    "or", "and", "OR", "And", "for", "=", "<", ">", "'", "\"", "%", "1", "42", "a",
+    ";", "||", "&&", "|", "&", "wget", "curl", "bash", "sh", "SH",
+    "../", "..", "/", "..\\", "\\",
+    " ", " ", " ", "\t", "\n", "_", "-", "ı", "ſ", "é",
+]
+
+
+def fuzz_values(count, seed):
+    generator = random.Random(seed)
+    return ["".join(generator.choice(TOKENS) for _ in range(generator.randint(1, 12))) for _ in range(count)]
+
+
+VALUES = CASES + fuzz_values(20000, seed=16)
+
+
+def test_failed_login_matches_regex():
+    for value in VALUES:
+        assert rules.check_failed_login(value, None) == failed_login(value, None), repr(value)
+        assert rules.check_failed_login(None, value) == failed_login(None, value), repr(value)
+
+
+@pytest.mark.parametrize("value", [None, 0, 17, "", "ok"])
+def test_failed_login_other_values(value):
+    assert rules.check_failed_login(value, "failed login") == failed_login(value, "failed login")
+    assert rules.check_failed_login(value, value) == failed_login(value, value)
+
+
+def test_suspicious_process_matches_regex():
+    for value in VALUES:
+        for args in ((value, None, None), (None, value, None), (None, None, value), ("", "", value)):
+            assert rules.check_suspicious_process(*args) == suspicious_process(*args), repr(value)
+
+
+def test_web_attack_matches_regex():
+    for value in VALUES:
+        for args in ((value, None), (None, value), ("", value), (value, "or 1=1")):
+            assert rules.check_web_attack(*args) == web_attack(*args), repr(args)
+
+
+def test_pieces_split_across_values_dont_match():
+    assert not rules.check_failed_login("failed", "login")
+    assert not rules.check_suspicious_process("powershell.exe", None, "-enc")
+    assert not rules.check_web_attack("or", "=1")
+
+
+@pytest.mark.parametrize("name", ["failed_login", "suspicious_process", "web_attack"])
+def test_prefilter_keeps_every_match(name):
+    rule = next(rule for rule in rules.RULES if rule.name == name)
+    arity = len(rule.fields)
+    accepted = [value for value in VALUES if value and rule.check(*([value] + [None] * (arity - 1)))]
+
+    selected = set(rule.prefilter([value for value in set(VALUES) if value]))
+    assert selected.issuperset(accepted)
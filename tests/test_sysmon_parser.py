@@ -0,0 +1,162 @@
+"""
+The Sysmon CSV reader against csv.DictReader.
+
+Rows are read with csv.reader and picked out by column position, in
+rows and in column batches; the events must be what DictReader rows
+give: None restval for short rows, a None restkey list for long rows,
+the last of repeated column names, blank lines skipped and a restated
+header starting a new section.
+"""
+
+import csv
+import io
+import random
+
+import pytest
+
+from src.parsers.sysmon_parser import HEADER_MARKER, iter_sysmon_line_batches, iter_sysmon_lines
+
+HEADER = ["UtcTime", "EventID", "Image", "CommandLine", "ParentImage", "User", "SourceIp"]
+
+
+class Rows:
+    """csv.reader that remembers the last row it read (for DictReader)."""
+
+    def __init__(self, lines):
+        self.reader = csv.reader(lines)
+        self.last = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.last = next(self.reader)
+        return self.last
+
+    @property
+    def line_num(self):
+        return self.reader.line_num
+
+
+def expected(lines, fieldnames):
+    """(timestamp, normalized, raw) per data row, read with csv.DictReader."""
+    reader = csv.DictReader([], fieldnames=list(fieldnames))
+    reader.reader = rows = Rows(lines)
+
+    for row in reader:
+        if HEADER_MARKER in rows.last:
+            reader.fieldnames = rows.last
+            continue
+
+        image = row.get("Image") or ""
+        normalized = {
+            "event_id": row.get("EventID"),
+            "process_name": image,
+            "process_path": image,
+            "command_line": row.get("CommandLine") or "",
+            "parent_process": row.get("ParentImage") or "",
+            "parent_command_line": row.get("ParentCommandLine") or "",
+            "user": row.get("User") or "",
+            "src_ip": row.get("SourceIp") or "",
+            "dest_ip": row.get("DestinationIp") or "",
+        }
+        yield row.get("UtcTime") or row.get("EventTime") or "N/A", normalized, row
+
+
+def read_rows(lines, fieldnames, compact):
+    return [(event.timestamp, event.normalized, event.raw)
+            for event in iter_sysmon_lines(lines, fieldnames, compact)]
+
+
+def read_batches(lines, fieldnames, size, compact=False):
+    return [(event.timestamp, event.normalized, event.raw)
+            for batch in iter_sysmon_line_batches(lines, fieldnames, size)
+            for event in batch.events({}, compact)]
+
+
+def csv_lines(rows):
+    """CSV lines of rows (None = a blank line)."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    for row in rows:
+        if row is None:
+            out.write("\n")
+        else:
+            writer.writerow(row)
+    return out.getvalue().splitlines(keepends=True)
+
+
+ROW = ["2024-03-01 10:00:00.000", "1", "C:\\Windows\\System32\\cmd.exe", "cmd /c whoami",
+       "C:\\Windows\\explorer.exe", "CORP\\alice", "10.0.0.5"]
+
+CASES = {
+    "exact": (HEADER, [ROW, ROW]),
+    "short rows": (HEADER, [ROW[:3], ROW[:1], ROW]),
+    "long rows": (HEADER, [ROW + ["extra"], ROW + ["a", "b"], ROW]),
+    "duplicate columns": (HEADER + ["Image", "User"], [ROW + ["D:\\other.exe", ""], ROW + ["x"], ROW[:5]]),
+    "duplicate columns, long row": (HEADER + ["Image"], [ROW + ["b.exe", "extra"], ROW + ["b.exe"]]),
+    "missing columns": (["EventID", "CommandLine"], [["3", "ping"], ["3"], ["3", "ping", "more"]]),
+    "no timestamp columns": (["EventID", "Image"], [["1", "a.exe"]]),
+    "empty timestamp": (HEADER, [[""] + ROW[1:], ROW]),
+    "blank lines": (HEADER, [None, ROW, None, None, ROW[:2], None]),
+    "blank cells": (HEADER, [[""] * len(HEADER), [""]]),
+    "quoted newlines": (HEADER, [ROW[:3] + ["cmd /c \"a,b\"\nnext line"] + ROW[4:], ROW]),
+    "restated header": (HEADER, [ROW, ["EventID", "UtcTime", "Image"], ["3", "2024-03-01 11:00:00.000", "b.exe"],
+                                 ["3"], HEADER, ROW]),
+    "restated header with duplicates": (HEADER, [ROW, ["EventID", "Image", "Image"], ["3", "a.exe", "b.exe"],
+                                                 ["3", "a.exe"]]),
+    "header only": (HEADER, [HEADER]),
+}
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_rows_match_dict_reader(name, compact):
+    fieldnames, rows = CASES[name]
+    lines = csv_lines(rows)
+    assert read_rows(lines, fieldnames, compact) == list(expected(lines, fieldnames))
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 1000])
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_batches_match_dict_reader(name, size):
+    fieldnames, rows = CASES[name]
+    lines = csv_lines(rows)
+    assert read_batches(lines, fieldnames, size) == list(expected(lines, fieldnames))
+
+
+COLUMNS = ["UtcTime", "EventTime", "EventID", "Image", "CommandLine", "ParentImage",
+           "ParentCommandLine", "User", "SourceIp", "DestinationIp", "Computer", "Hashes"]
+
+VALUES = ["", "x", "cmd.exe", "a,b", "q\"q", "2024-01-01 00:00:00.000", "4", "10.0.0.1", "line\nbreak", " "]
+
+
+def random_file(generator):
+    header = generator.sample(COLUMNS, generator.randint(1, len(COLUMNS)))
+    if generator.random() < 0.2:
+        header.append(generator.choice(header))
+    if HEADER_MARKER in header and generator.random() < 0.3:
+        header.remove(HEADER_MARKER)
+
+    rows = []
+    for _ in range(generator.randint(0, 30)):
+        roll = generator.random()
+        if roll < 0.05:
+            rows.append(None)
+        elif roll < 0.1:
+            rows.append(generator.sample(COLUMNS, generator.randint(1, 6)) + [HEADER_MARKER])
+        else:
+            width = len(header) + (generator.choice([-2, -1, 1, 2]) if generator.random() < 0.2 else 0)
+            rows.append([generator.choice(VALUES) for _ in range(max(width, 1))])
+    return header, csv_lines(rows)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_random_files_match_dict_reader(seed):
+    generator = random.Random(seed)
+    fieldnames, lines = random_file(generator)
+    reference = list(expected(lines, fieldnames))
+
+    assert read_rows(lines, fieldnames, compact=False) == reference
+    assert read_rows(lines, fieldnames, compact=True) == reference
+    assert read_batches(lines, fieldnames, generator.randint(1, 9)) == reference
@@ -0,0 +1,39 @@
+"""The timestamp fast paths against the generic parser."""
+
+import pytest
+
+from src.timestamps import parse_clf, parse_iso, to_epoch
+
+
+@pytest.mark.parametrize("text, epoch", [
+    ("2024-01-15T10:00:00Z", 1705312800),
+    ("2024-01-15 10:00:00.123", 1705312800),
+    ("2024-01-15T10:00:00.1234567Z", 1705312800),
+    ("2024-01-15T10:00:00+05", 1705294800),
+    ("2024-01-15T10:00:00+05:00", 1705294800),
+    ("2024-01-15T10:00:00+0500", 1705294800),
+    ("2024-01-15T10:00:00.5-01:30", 1705318200),
+    ("2024-02-29 10:00:00", 1709200800),
+])
+def test_parse_iso(text, epoch):
+    assert parse_iso(text) == epoch
+    assert to_epoch(text) == epoch
+
+
+@pytest.mark.parametrize("text", [
+    "2024-13-45T10:00:00Z", "2024-00-10 10:00:00", "2024-02-30 10:00:00", "2023-02-29 10:00:00",
+    "2024-04-31 10:00:00", "2024-01-00 10:00:00", "2024-01-15 24:00:00", "2024-01-15 10:60:00",
+    "2024-01-15 10:00:61", "2024-01-15T10:00:00+5", "2024-01-15T10:00:00+05:3", "2024-01-15T10:00:00+0a",
+])
+def test_parse_iso_falls_back_on_invalid_stamps(text):
+    assert parse_iso(text) == to_epoch(text)
+
+
+@pytest.mark.parametrize("text", ["30/Feb/2024:10:00:00 +0000", "31/Apr/2024:10:00:00 +0000",
+                                  "29/Feb/2023:10:00:00 +0000", "15/Jan/2024:25:00:00 +0000"])
+def test_parse_clf_falls_back_on_invalid_stamps(text):
+    assert parse_clf(text) is None
+
+
+def test_parse_clf_offset():
+    assert parse_clf("15/Jan/2024:10:00:00 +0530") == to_epoch("15/Jan/2024:10:00:00 +0530") == 1705293000